@@ -0,0 +1,6 @@
+"""
+MailBuddy Benchmarks
+
+Performance benchmarks for MailBuddy components. Run from the repository root,
+e.g. ``python -m benchmarks.bench_fetch``.
+"""
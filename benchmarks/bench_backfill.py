@@ -0,0 +1,52 @@
+"""
+Backfill Benchmark
+
+Parse + decode + triage throughput of BulkProcessor over a corpus of
+real-world-shaped raw messages, in-process and with growing process pools.
+
+Usage:
+    python -m benchmarks.bench_backfill [--per-kind 250] [--chunk-size 64] [--max-workers N]
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.corpus import build_corpus
+from utils.bulk_processing import BulkProcessor
+
+
+def run(messages: list, workers: int, chunk_size: int) -> float:
+    """Process every message once; return the elapsed seconds."""
+    processor = BulkProcessor(["alex@example.net"], workers=workers, chunk_size=chunk_size)
+    start = time.perf_counter()
+    count = sum(1 for _ in processor.process(messages))
+    elapsed = time.perf_counter() - start
+    assert count == len(messages)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--per-kind', type=int, default=250, help='Messages of each corpus kind')
+    parser.add_argument('--chunk-size', type=int, default=64, help='Messages per submitted task')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help='Largest pool size')
+    args = parser.parse_args()
+    
+    messages = [raw for kind in build_corpus(args.per_kind).values() for raw in kind]
+    size_mb = sum(len(raw) for raw in messages) / 1024 / 1024
+    
+    baseline = run(messages, 1, args.chunk_size)
+    print(f"Messages: {len(messages)} ({size_mb:.1f} MB), CPUs: {os.cpu_count()}")
+    print(f"  in-process:    {baseline:7.2f} s  {len(messages) / baseline:8.0f} msg/s")
+    
+    workers = 2
+    while workers <= args.max_workers:
+        elapsed = run(messages, workers, args.chunk_size)
+        print(f"  {workers:2d} processes:  {elapsed:7.2f} s  {len(messages) / elapsed:8.0f} msg/s"
+              f"  speedup {baseline / elapsed:4.1f}x")
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
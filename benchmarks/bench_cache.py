@@ -0,0 +1,58 @@
+"""
+Message Cache Benchmark
+
+Measures reopening a folder with and without the local message cache against
+a fake IMAP server with simulated latency.
+
+Usage:
+    python -m benchmarks.bench_cache [--messages 500] [--latency-ms 30]
+"""
+
+import argparse
+import imaplib
+import time
+from unittest.mock import patch
+
+from tests.fake_imap_server import FakeIMAPServer, make_message
+from utils.email_folder_manager import EmailFolderManager
+from utils.message_cache import MessageCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=500, help='Messages in the folder')
+    parser.add_argument('--latency-ms', type=float, default=30.0, help='Simulated RTT per command')
+    args = parser.parse_args()
+    
+    with FakeIMAPServer(latency=args.latency_ms / 1000.0) as server:
+        for i in range(1, args.messages + 1):
+            server.add_message(make_message(i, body="Lorem ipsum dolor sit amet. " * 40), folder="Archive")
+        
+        with patch('utils.email_folder_manager.imaplib.IMAP4_SSL', imaplib.IMAP4):
+            cache = MessageCache(":memory:")
+            manager = EmailFolderManager(server.username, server.password, server.host, server.port,
+                                         cache=cache)
+            manager.connect()
+            
+            start = time.perf_counter()
+            manager.fetch_recent_emails("Archive", limit=args.messages)
+            cold = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            emails = manager.fetch_recent_emails("Archive", limit=args.messages)
+            warm = time.perf_counter() - start
+            manager.disconnect()
+    
+    uids = [int(e['uid']) for e in emails]
+    start = time.perf_counter()
+    cache.get_many(manager.cache_account, "Archive", emails[0]['uidvalidity'], uids)
+    local = time.perf_counter() - start
+    
+    print(f"Folder of {len(emails)} messages, simulated RTT: {args.latency_ms:.0f} ms")
+    print(f"  cold open (network):        {cold * 1000:8.1f} ms")
+    print(f"  warm open (cache + flags):  {warm * 1000:8.1f} ms")
+    print(f"  local cache read only:      {local * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Classifier Benchmark
+
+Trains the learned triage backend on half of the synthetic corpus (each
+corpus kind is a folder), then reports its hold-out accuracy and the time
+to score a batch of messages in one call, next to the keyword rules.
+Requires NumPy.
+
+Usage:
+    python -m benchmarks.bench_classifier [--per-kind 50] [--batch 10000]
+"""
+
+import argparse
+import time
+
+from benchmarks.corpus import build_corpus
+from utils.bulk_processing import parse_raw_message
+from utils.mailbuddy_triage import TriageTask
+from utils.triage_classifier import TriageClassifier
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--per-kind', type=int, default=50, help='Messages of each corpus kind')
+    parser.add_argument('--batch', type=int, default=10000, help='Messages scored in one batch')
+    args = parser.parse_args()
+
+    train, test = [], []
+    for kind, messages in build_corpus(args.per_kind).items():
+        emails = [(parse_raw_message(raw), kind) for raw in messages]
+        train += emails[::2]
+        test += emails[1::2]
+
+    classifier = TriageClassifier()
+    start = time.perf_counter()
+    classifier.learn([email for email, _ in train], [kind for _, kind in train])
+    train_time = time.perf_counter() - start
+
+    predictions = classifier.predict([email for email, _ in test])
+    decided = [(p[0], kind) for p, (_, kind) in zip(predictions, test) if p is not None]
+    correct = sum(1 for predicted, kind in decided if predicted == kind)
+
+    batch = [test[i % len(test)][0] for i in range(args.batch)]
+    start = time.perf_counter()
+    classifier.scores(batch)
+    score_time = time.perf_counter() - start
+
+    triage = TriageTask([])
+    start = time.perf_counter()
+    for email in batch:
+        triage.run(email)
+    rules_time = time.perf_counter() - start
+
+    print(f"Trained on {len(train)} messages in {train_time * 1000:.0f} ms")
+    print(f"  hold-out: {len(decided)}/{len(test)} decided, "
+          f"{correct / len(decided) if decided else 0:.1%} of those correct")
+    print(f"  scoring {args.batch} messages in one batch: {score_time * 1000:8.1f} ms")
+    print(f"  keyword rules, one by one:               {rules_time * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Fetch Benchmark
+
+Compares per-message FETCH round trips with the batched FETCH path of
+EmailFolderManager against a local fake IMAP server with simulated latency,
+then compares full and header-only fetches of a folder of PDF invoices.
+
+Usage:
+    python -m benchmarks.bench_fetch [--messages 20] [--latency-ms 30] [--attachment-kb 512]
+"""
+
+import argparse
+import email
+import imaplib
+import time
+from unittest.mock import patch
+
+from tests.fake_imap_server import FakeIMAPServer, make_message, make_message_with_attachment
+from utils.email_folder_manager import EmailFolderManager
+
+
+def fetch_one_by_one(manager: EmailFolderManager, folder: str, limit: int) -> list:
+    """The previous implementation: one FETCH per message."""
+    manager.mail.select(folder, readonly=True)
+    _, message_numbers = manager.mail.search(None, 'ALL')
+    msg_ids = message_numbers[0].split()[-limit:]
+    msg_ids.reverse()
+    
+    emails = []
+    for msg_id in msg_ids:
+        _, msg_data = manager.mail.fetch(msg_id, '(RFC822)')
+        msg = email.message_from_bytes(msg_data[0][1])
+        emails.append({
+            'id': msg_id.decode(),
+            'subject': manager.decode_mime_header(msg.get('Subject', 'No Subject')),
+            'sender': manager.decode_mime_header(msg.get('From', 'Unknown')),
+            'date': msg.get('Date', ''),
+            'body': manager.get_email_body(msg),
+            'message_id': msg.get('Message-ID', '')
+        })
+    return emails
+
+
+def timed(func, *args, repeat: int = 3) -> float:
+    """Best wall-clock time of several runs, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_transfer(server: FakeIMAPServer, func, *args) -> tuple:
+    """Time one call and count the bytes the server sent for it."""
+    before = server.bytes_sent
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start, server.bytes_sent - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=20, help='Messages to fetch')
+    parser.add_argument('--latency-ms', type=float, default=30.0, help='Simulated RTT per command')
+    parser.add_argument('--attachment-kb', type=int, default=512, help='Invoice attachment size')
+    args = parser.parse_args()
+    
+    with FakeIMAPServer(latency=args.latency_ms / 1000.0) as server:
+        for i in range(1, args.messages + 1):
+            server.add_message(make_message(i, body="Lorem ipsum dolor sit amet. " * 40))
+        
+        with patch('utils.email_folder_manager.imaplib.IMAP4_SSL', imaplib.IMAP4):
+            manager = EmailFolderManager(server.username, server.password, server.host, server.port)
+            manager.connect()
+            
+            sequential = timed(fetch_one_by_one, manager, "INBOX", args.messages)
+            batched = timed(manager.fetch_recent_emails, "INBOX", args.messages)
+            
+            # Batched records also carry uid/uidvalidity/flags; compare the common fields
+            baseline = fetch_one_by_one(manager, "INBOX", args.messages)
+            batched_emails = manager.fetch_recent_emails("INBOX", args.messages)
+            assert baseline == [{key: e[key] for key in b} for b, e in zip(baseline, batched_emails)]
+            manager.disconnect()
+    
+    print(f"Messages: {args.messages}, simulated RTT: {args.latency_ms:.0f} ms")
+    print(f"  one FETCH per message: {sequential * 1000:8.1f} ms")
+    print(f"  batched FETCH:         {batched * 1000:8.1f} ms")
+    print(f"  speedup:               {sequential / batched:8.1f}x")
+    
+    with FakeIMAPServer(latency=args.latency_ms / 1000.0) as server:
+        for i in range(1, args.messages + 1):
+            server.add_message(make_message_with_attachment(i, args.attachment_kb * 1024))
+        
+        with patch('utils.email_folder_manager.imaplib.IMAP4_SSL', imaplib.IMAP4):
+            manager = EmailFolderManager(server.username, server.password, server.host, server.port)
+            manager.connect()
+            manager.fetch_recent_emails("INBOX", args.messages, True)  # warm server-side parse cache
+            
+            full_time, full_bytes = measure_transfer(
+                server, manager.fetch_recent_emails, "INBOX", args.messages
+            )
+            header_time, header_bytes = measure_transfer(
+                server, manager.fetch_recent_emails, "INBOX", args.messages, True
+            )
+            records = manager.fetch_recent_emails("INBOX", args.messages, True)
+            body_time, body_bytes = measure_transfer(
+                server, lambda: [record['body'] for record in records]
+            )
+            manager.disconnect()
+    
+    print(f"\nInvoices: {args.messages} x {args.attachment_kb} KB attachment")
+    print(f"  full RFC822 fetch:  {full_time * 1000:8.1f} ms  {full_bytes / 1024:10.1f} KB")
+    print(f"  header-only fetch:  {header_time * 1000:8.1f} ms  {header_bytes / 1024:10.1f} KB")
+    print(f"  + load all bodies:  {body_time * 1000:8.1f} ms  {body_bytes / 1024:10.1f} KB (text parts only)")
+
+
+if __name__ == '__main__':
+    main()
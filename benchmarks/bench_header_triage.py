@@ -0,0 +1,86 @@
+"""
+Header Triage Benchmark
+
+Bytes downloaded and time per triaged message when every message is fetched
+in full before triage, versus header-only fetches where TriageTask loads a
+body only when the sender, signal headers and subject cannot decide.
+
+With the default rules the OTP rule's digit pattern keeps almost every body
+in play; ``--header-first`` uses the rules as ``header_rules_first`` would
+write them to the rule file, so bulk mail is filed from its headers.
+
+Usage:
+    python -m benchmarks.bench_header_triage [--per-kind 10] [--latency-ms 0]
+                                             [--kinds newsletter,receipt] [--header-first]
+"""
+
+import argparse
+import imaplib
+import json
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from benchmarks.corpus import KINDS, build_corpus
+from tests.fake_imap_server import FakeIMAPServer
+from utils.email_folder_manager import EmailFolderManager
+from utils.mailbuddy_triage import TriageTask
+from utils.triage_rules import DEFAULT_RULES, RuleSource, header_rules_first
+
+KNOWN_CONTACTS = ["alex@example.net", "sam@example.net"]
+
+
+def triage_folder(server: FakeIMAPServer, manager: EmailFolderManager, headers_only: bool,
+                  rules: RuleSource = None) -> tuple:
+    """Fetch and triage the inbox; return categories, seconds, bytes and the task."""
+    triage = TriageTask(KNOWN_CONTACTS, rules=rules)
+    before = server.bytes_sent
+    start = time.perf_counter()
+    emails = manager.iter_emails("INBOX", headers_only=headers_only)
+    categories = [result.category for _, result in triage.run_stream(emails)]
+    return categories, time.perf_counter() - start, server.bytes_sent - before, triage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--per-kind', type=int, default=10, help='Messages of each corpus kind')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Simulated RTT per command')
+    parser.add_argument('--kinds', help=f"Comma-separated corpus kinds ({', '.join(KINDS)})")
+    parser.add_argument('--header-first', action='store_true', help='Put the header-only rules first')
+    args = parser.parse_args()
+
+    kinds = args.kinds.split(',') if args.kinds else None
+    corpus = build_corpus(args.per_kind, kinds=kinds)
+
+    with FakeIMAPServer(latency=args.latency_ms / 1000.0) as server:
+        for messages in corpus.values():
+            for raw in messages:
+                server.add_message(raw)
+
+        with patch('utils.email_folder_manager.imaplib.IMAP4_SSL', imaplib.IMAP4):
+            manager = EmailFolderManager(server.username, server.password, server.host, server.port)
+            manager.connect()
+            with tempfile.TemporaryDirectory() as tmp:
+                rules = None
+                if args.header_first:
+                    path = os.path.join(tmp, 'triage_rules.json')
+                    with open(path, 'w', encoding='utf-8') as f:
+                        json.dump(header_rules_first(DEFAULT_RULES), f)
+                    rules = RuleSource(path)
+                full, full_time, full_bytes, _ = triage_folder(server, manager, False, rules)
+                fast, fast_time, fast_bytes, triage = triage_folder(server, manager, True, rules)
+            manager.disconnect()
+
+    assert full == fast, "header-only triage disagrees with full triage"
+    count = len(full)
+    print(f"Messages: {count} ({', '.join(corpus)}), simulated RTT: {args.latency_ms:.0f} ms, "
+          f"{'header rules first' if args.header_first else 'default rules'}")
+    print(f"  full fetch + triage:   {full_time * 1000:8.1f} ms  {full_bytes / count / 1024:8.1f} KB/msg")
+    print(f"  header-first triage:   {fast_time * 1000:8.1f} ms  {fast_bytes / count / 1024:8.1f} KB/msg")
+    print(f"  decided from headers:  {triage.header_decisions}/{count}"
+          f" ({full_bytes / fast_bytes:.1f}x fewer bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Parsing Benchmark
+
+Per-message parse time of the list-view fields (Subject, From, Date,
+Message-ID) with a full MIME parse versus the header-only parser, over a
+corpus of real-world-shaped messages.
+
+Usage:
+    python -m benchmarks.bench_parsing [--per-kind 25] [--repeat 5]
+"""
+
+import argparse
+import time
+
+from benchmarks.corpus import build_corpus
+from utils.email_parsing import parse_headers, parse_message
+
+LIST_HEADERS = ('Subject', 'From', 'Date', 'Message-ID')
+
+
+def list_fields(parse, messages: list) -> list:
+    """Parse each message and read the list-view headers."""
+    results = []
+    for raw in messages:
+        msg = parse(raw)
+        results.append(tuple(msg.get(name, '') for name in LIST_HEADERS))
+    return results
+
+
+def per_message_us(parse, messages: list, repeat: int) -> float:
+    """Best time per message over several runs, in microseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list_fields(parse, messages)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--per-kind', type=int, default=25, help='Messages of each kind')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is kept)')
+    args = parser.parse_args()
+    
+    corpus = build_corpus(args.per_kind)
+    
+    print(f"{'kind':<12}{'avg size':>12}{'full parse':>14}{'headers only':>16}{'speedup':>10}")
+    for kind, messages in corpus.items():
+        assert list_fields(parse_message, messages) == list_fields(parse_headers, messages)
+        size = sum(len(raw) for raw in messages) / len(messages)
+        full = per_message_us(parse_message, messages, args.repeat)
+        headers = per_message_us(parse_headers, messages, args.repeat)
+        print(f"{kind:<12}{size / 1024:>9.1f} KB{full:>11.1f} us{headers:>13.1f} us{full / headers:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
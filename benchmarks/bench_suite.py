@@ -0,0 +1,268 @@
+"""
+Benchmark Suite
+
+Throughput (messages/second) and per-message latency percentiles of the
+per-message pipeline stages over every kind of the synthetic corpus:
+
+- headers: decoding the Subject and From headers (RFC 2047)
+- body: MIME parse and plain-text body extraction
+- triage: TriageTask.run on the decoded message
+
+With --max-body-chars, triage searches at most that many body characters,
+and the report adds how often its category agrees with a full-body scan.
+
+Results can be saved as JSON and compared against an earlier run, e.g. one
+saved before a change:
+
+    python -m benchmarks.bench_suite --output before.json
+    python -m benchmarks.bench_suite --compare before.json
+
+Usage:
+    python -m benchmarks.bench_suite [--per-kind 50] [--scale 1] [--repeat 3]
+                                     [--kinds otp,thread] [--output FILE]
+                                     [--compare FILE] [--threshold 10]
+                                     [--max-body-chars N]
+"""
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.corpus import KINDS, build_corpus
+from utils.email_parsing import decode_header_value, extract_text_body, parse_headers, parse_message
+from utils.mailbuddy_triage import TriageTask
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Throughput and latency percentiles (microseconds) of per-message timings."""
+    values = sorted(latencies)
+    summary = {'messages': len(values), 'msg_per_s': len(values) / sum(values) if sum(values) else 0.0}
+    for pct in PERCENTILES:
+        summary[f'p{pct}_us'] = percentile(values, pct) * 1e6
+    return summary
+
+
+def time_each(func: Callable, inputs: list, repeat: int) -> List[float]:
+    """Per-input latency of ``func``: the best of ``repeat`` timed calls."""
+    best = [float('inf')] * len(inputs)
+    clock = time.perf_counter
+    # Collections triggered by earlier stages would land on random messages
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for index, item in enumerate(inputs):
+                start = clock()
+                func(item)
+                best[index] = min(best[index], clock() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def _stages(triage: TriageTask) -> Dict[str, Callable]:
+    def headers(raw_headers):
+        return decode_header_value(raw_headers[0]), decode_header_value(raw_headers[1])
+
+    def body(raw):
+        return extract_text_body(parse_message(raw))
+
+    return {'headers': headers, 'body': body, 'triage': triage.run}
+
+
+def _stage_inputs(messages: List[bytes]) -> Dict[str, list]:
+    """Each stage's input, prepared outside the timed region."""
+    raw_headers = []
+    emails = []
+    for raw in messages:
+        msg = parse_headers(raw)
+        raw_headers.append((msg.get('Subject', ''), msg.get('From', '')))
+        emails.append({
+            'subject': decode_header_value(msg.get('Subject', '')),
+            'sender': decode_header_value(msg.get('From', '')),
+            'body': extract_text_body(parse_message(raw)),
+        })
+    return {'headers': raw_headers, 'body': messages, 'triage': emails}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def _agreement(triage: TriageTask, reference: TriageTask, emails: List[Dict]) -> int:
+    """Messages that two triage setups put in the same category."""
+    return sum(1 for email in emails if triage.run(email).category == reference.run(email).category)
+
+
+def run_suite(per_kind: int, scale: int, repeat: int, kinds: Optional[List[str]] = None,
+              seed: int = 1, max_body_chars: Optional[int] = None) -> Dict:
+    """
+    Run every stage over every corpus kind.
+
+    Args:
+        per_kind: Messages of each kind
+        scale: Body size multiplier of the corpus
+        repeat: Runs per message (the best is kept)
+        kinds: Corpus kinds (default: all)
+        seed: Corpus seed
+        max_body_chars: Body characters triage searches at most (default: all)
+
+    Returns:
+        Report with 'meta' and 'results' (stage -> kind -> summary, plus
+        'all'), and with a cap 'accuracy' (kind -> share of categories
+        agreeing with a full-body scan, plus 'all')
+    """
+    corpus = build_corpus(per_kind, seed=seed, kinds=kinds, scale=scale)
+    contacts = ["alex@example.net", "sam@example.net"]
+    triage = TriageTask(contacts, max_body_chars=max_body_chars)
+    stages = _stages(triage)
+
+    results = {stage: {} for stage in stages}
+    agreeing = {}
+    for kind, messages in corpus.items():
+        inputs = _stage_inputs(messages)
+        for stage, func in stages.items():
+            results[stage][kind] = time_each(func, inputs[stage], repeat)
+        if max_body_chars is not None:
+            agreeing[kind] = _agreement(triage, TriageTask(contacts), inputs['triage'])
+    for stage, by_kind in results.items():
+        everything = [value for latencies in by_kind.values() for value in latencies]
+        results[stage] = {kind: summarize(latencies) for kind, latencies in by_kind.items()}
+        results[stage]['all'] = summarize(everything)
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'per_kind': per_kind,
+            'scale': scale,
+            'repeat': repeat,
+            'seed': seed,
+            'kinds': list(corpus),
+            'max_body_chars': max_body_chars,
+        },
+        'results': results,
+    }
+    if max_body_chars is not None:
+        report['accuracy'] = {kind: count / len(corpus[kind]) for kind, count in agreeing.items()}
+        report['accuracy']['all'] = sum(agreeing.values()) / sum(len(m) for m in corpus.values())
+    return report
+
+
+def print_report(report: Dict):
+    """Print a report as one table per stage."""
+    meta = report['meta']
+    print(f"commit {meta['commit'] or '-'}, Python {meta['python']}, "
+          f"{meta['per_kind']} messages/kind, best of {meta['repeat']}, scale {meta['scale']}")
+    for stage, by_kind in report['results'].items():
+        print(f"\n{stage}")
+        print(f"  {'kind':<14}{'msg/s':>12}" + ''.join(f"{'p%d' % pct:>12}" for pct in PERCENTILES))
+        for kind, summary in by_kind.items():
+            print(f"  {kind:<14}{summary['msg_per_s']:>12.0f}"
+                  + ''.join(f"{summary[f'p{pct}_us']:>9.1f} us" for pct in PERCENTILES))
+    if 'accuracy' in report:
+        print(f"\ntriage agreement with a full-body scan (max {meta['max_body_chars']} body chars)")
+        for kind, share in report['accuracy'].items():
+            print(f"  {kind:<14}{share:>11.1%}")
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    Compare two reports.
+
+    Args:
+        baseline: Earlier report
+        current: New report
+        threshold: Slowdown in percent that counts as a regression
+
+    Returns:
+        Descriptions of the regressions (throughput or p50 worse than the threshold)
+    """
+    regressions = []
+    print(f"\nChange vs baseline (commit {baseline['meta'].get('commit') or '-'}, "
+          f"{baseline['meta'].get('created', '?')}); negative is slower")
+    for stage, by_kind in current['results'].items():
+        print(f"\n{stage}")
+        print(f"  {'kind':<14}{'msg/s':>10}{'p50':>10}{'p99':>10}")
+        for kind, summary in by_kind.items():
+            old = baseline['results'].get(stage, {}).get(kind)
+            if kind == 'all' and baseline['meta'].get('kinds') != current['meta']['kinds']:
+                print(f"  {kind:<14}{'(different kinds)':>20}")
+                continue
+            if not old:
+                print(f"  {kind:<14}{'(new)':>10}")
+                continue
+            throughput = (summary['msg_per_s'] / old['msg_per_s'] - 1) * 100 if old['msg_per_s'] else 0.0
+            p50 = (old['p50_us'] / summary['p50_us'] - 1) * 100 if summary['p50_us'] else 0.0
+            p99 = (old['p99_us'] / summary['p99_us'] - 1) * 100 if summary['p99_us'] else 0.0
+            flag = ''
+            if throughput < -threshold or p50 < -threshold:
+                flag = '  REGRESSION'
+                regressions.append(f"{stage}/{kind}: {throughput:+.1f}% msg/s, {p50:+.1f}% p50")
+            print(f"  {kind:<14}{throughput:>+9.1f}%{p50:>+9.1f}%{p99:>+9.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--per-kind', type=int, default=50, help='Messages of each corpus kind')
+    parser.add_argument('--scale', type=int, default=1, help='Body size multiplier')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per message (best is kept)')
+    parser.add_argument('--seed', type=int, default=1, help='Corpus seed')
+    parser.add_argument('--kinds', help=f"Comma-separated corpus kinds ({', '.join(KINDS)})")
+    parser.add_argument('--max-body-chars', type=int,
+                        help='Body characters triage searches at most (reports the accuracy impact)')
+    parser.add_argument('--output', help='Save the results as JSON')
+    parser.add_argument('--compare', help='Compare with a JSON report saved by --output')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Slowdown in percent reported as a regression')
+    args = parser.parse_args()
+
+    kinds = args.kinds.split(',') if args.kinds else None
+    unknown = set(kinds or ()) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown kinds: {', '.join(sorted(unknown))}")
+
+    report = run_suite(args.per_kind, args.scale, args.repeat, kinds, args.seed, args.max_body_chars)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0f}%:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Triage Benchmark
+
+Per-message rule-matching time of the original per-list checks (one
+lowercase copy per keyword list, one ``re.search`` per OTP pattern) versus
+the compiled ``KeywordMatcher`` that triage rule sets use, over long
+newsletter bodies and the rest of the corpus.
+
+Usage:
+    python -m benchmarks.bench_triage [--per-kind 25] [--repeat 5]
+"""
+
+import argparse
+import time
+
+from benchmarks.corpus import build_corpus
+from utils.bulk_processing import parse_raw_message
+from utils.keyword_matcher import KeywordMatcher
+from utils.mailbuddy_triage import TriageTask
+from utils.triage_rules import DEFAULT_RULES
+
+TEXT_RULES = [rule for rule in DEFAULT_RULES['rules'] if 'keywords' in rule or 'patterns' in rule]
+
+
+def per_list_hits(triage: TriageTask, text: str) -> set:
+    """Rules with a text hit, found the way ``TriageTask.run`` used to."""
+    return {
+        rule['name'] for rule in TEXT_RULES
+        if triage._matches_pattern(text, rule.get('patterns', []))
+        or triage._contains_keywords(text, rule.get('keywords', []))
+    }
+
+
+def per_message_us(find, texts: list, repeat: int) -> float:
+    """Best time per message over several runs, in microseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            find(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--per-kind', type=int, default=25, help='Messages of each kind')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is kept)')
+    args = parser.parse_args()
+
+    triage = TriageTask([])
+    matcher = KeywordMatcher(
+        keywords={rule['name']: rule.get('keywords', []) for rule in TEXT_RULES},
+        patterns={rule['name']: rule.get('patterns', []) for rule in TEXT_RULES},
+    )
+    corpus = build_corpus(args.per_kind)
+
+    print(f"{'kind':<12}{'avg text':>12}{'per list':>14}{'compiled':>14}{'speedup':>10}")
+    for kind, messages in corpus.items():
+        texts = []
+        for raw in messages:
+            email = parse_raw_message(raw)
+            texts.append(f"{email['subject']} {email['body']}")
+        old = lambda text: per_list_hits(triage, text)
+        assert [old(text) for text in texts] == [matcher.search(text) for text in texts]
+        size = sum(len(text) for text in texts) / len(texts)
+        per_list = per_message_us(old, texts, args.repeat)
+        compiled = per_message_us(matcher.search, texts, args.repeat)
+        print(f"{kind:<12}{size / 1024:>9.1f} KB{per_list:>11.1f} us{compiled:>11.1f} us"
+              f"{per_list / compiled:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Benchmark Corpus
+
+Synthetic messages shaped like real mail: long Received chains, encoded and
+folded headers, multipart/alternative newsletters, receipts with PDF
+attachments and inline images, one-time codes, long reply threads, HTML-only
+mail and subjects in several languages and charsets. Generated
+deterministically so benchmark runs are comparable.
+"""
+
+import random
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.header import Header
+from email.mime.text import MIMEText
+from typing import Dict, Iterable, List, Optional
+
+_WORDS = ("meeting project invoice order update schedule review account team report "
+          "please thanks regards attached quarterly budget client delivery status").split()
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    return ' '.join(rng.choice(_WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _paragraphs(rng: random.Random, count: int) -> str:
+    return '\n\n'.join(' '.join(_sentence(rng) for _ in range(5)) for _ in range(count))
+
+
+def _add_transport_headers(msg, rng: random.Random, index: int, hops: int):
+    """Headers a message picks up on its way through real mail servers."""
+    for hop in range(hops):
+        msg['Received'] = (
+            f"from mx{hop}.example.net (mx{hop}.example.net [10.0.{hop}.{index % 250}]) "
+            f"by mail.example.com with ESMTPS id {rng.getrandbits(48):x}; "
+            f"Mon, 1 Jan 2024 12:{index % 60:02d}:{hop:02d} +0000"
+        )
+    msg['DKIM-Signature'] = ("v=1; a=rsa-sha256; c=relaxed/relaxed; d=example.net; s=sel; "
+                             "h=from:to:subject:date:message-id; bh=" + 'A' * 44 + "; b=" + 'B' * 340)
+    msg['Authentication-Results'] = "mail.example.com; dkim=pass; spf=pass; dmarc=pass"
+    msg['To'] = "test@example.com"
+    msg['Date'] = f"Mon, 1 Jan 2024 12:{index % 60:02d}:00 +0000"
+    msg['Message-ID'] = f"<corpus{index}.{rng.getrandbits(32):x}@example.net>"
+
+
+def personal(index: int, rng: random.Random, scale: int = 1) -> bytes:
+    """Short plain-text message from a person."""
+    msg = MIMEText(_paragraphs(rng, 2 * scale), 'plain', 'utf-8')
+    msg['From'] = "Alex Example <alex@example.net>"
+    msg['Subject'] = f"Re: {_sentence(rng, 5)}"
+    _add_transport_headers(msg, rng, index, hops=3)
+    return msg.as_bytes()
+
+
+def newsletter(index: int, rng: random.Random, scale: int = 1) -> bytes:
+    """multipart/alternative newsletter with an encoded subject and List-* headers."""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = "=?utf-8?q?Weekly_Digest_=E2=9C=89?= <news@lists.example.org>"
+    msg['Subject'] = "=?utf-8?b?" + "VGhpcyB3ZWVrJ3MgdG9wIHN0b3JpZXMg4pyo" + "?="
+    msg['List-Unsubscribe'] = "<mailto:unsubscribe@lists.example.org>, <https://example.org/u/123>"
+    msg['List-Id'] = "Weekly Digest <digest.lists.example.org>"
+    _add_transport_headers(msg, rng, index, hops=6)
+    text = _paragraphs(rng, 8 * scale)
+    msg.attach(MIMEText(text, 'plain', 'utf-8'))
+    html = ''.join(f'<tr><td style="padding:8px;font-family:Arial">{p}</td></tr>'
+                   for p in text.split('\n\n'))
+    msg.attach(MIMEText(f'<html><body><table>{html * 4}</table></body></html>', 'html', 'utf-8'))
+    return msg.as_bytes()
+
+
+def receipt(index: int, rng: random.Random, scale: int = 1, attachment_kb: int = 200) -> bytes:
+    """Order receipt with a PDF attachment."""
+    msg = MIMEMultipart()
+    msg['From'] = "Shop <orders@shop.example.com>"
+    msg['Subject'] = f"Your order #{100000 + index} has shipped"
+    _add_transport_headers(msg, rng, index, hops=4)
+    msg.attach(MIMEText(f"Thanks for your order.\n\n{_paragraphs(rng, scale)}", 'plain', 'utf-8'))
+    pdf = MIMEApplication(bytes(rng.getrandbits(8) for _ in range(1024)) * attachment_kb, _subtype='pdf')
+    pdf.add_header('Content-Disposition', 'attachment', filename=f'receipt-{index}.pdf')
+    msg.attach(pdf)
+    return msg.as_bytes()
+
+
+def rich(index: int, rng: random.Random, scale: int = 1) -> bytes:
+    """multipart/mixed with a multipart/alternative body and an inline image."""
+    msg = MIMEMultipart('mixed')
+    msg['From'] = "=?iso-8859-1?q?J=F6rg_M=FCller?= <joerg@example.de>"
+    msg['Subject'] = f"FW: {_sentence(rng, 10)} {_sentence(rng, 10)}"
+    _add_transport_headers(msg, rng, index, hops=5)
+    body = MIMEMultipart('alternative')
+    text = _paragraphs(rng, 4 * scale)
+    body.attach(MIMEText(text, 'plain', 'utf-8'))
+    body.attach(MIMEText(f'<html><body><p>{text}</p></body></html>', 'html', 'utf-8'))
+    msg.attach(body)
+    image = MIMEImage(b'\x89PNG\r\n\x1a\n' + bytes(rng.getrandbits(8) for _ in range(4096)) * 8, _subtype='png')
+    image.add_header('Content-Disposition', 'inline', filename='logo.png')
+    msg.attach(image)
+    return msg.as_bytes()
+
+
+def otp(index: int, rng: random.Random, scale: int = 1) -> bytes:
+    """One-time code from a service, as plain text."""
+    code = f"{rng.randrange(10 ** 6):06d}"
+    msg = MIMEText(f"Your verification code is {code}. It expires in 10 minutes.\n\n"
+                   f"If you didn't request this code, you can ignore this email.\n\n"
+                   f"{_paragraphs(rng, scale)}", 'plain', 'utf-8')
+    msg['From'] = "Example Accounts <no-reply@accounts.example.com>"
+    msg['Subject'] = f"{code} is your Example sign-in code"
+    _add_transport_headers(msg, rng, index, hops=3)
+    return msg.as_bytes()
+
+
+def thread(index: int, rng: random.Random, scale: int = 1) -> bytes:
+    """Long reply chain quoting every earlier message."""
+    body = ""
+    for reply in range(8 * scale):
+        quoted = '\n'.join('> ' + line for line in body.splitlines())
+        body = (f"{_paragraphs(rng, 1)}\n\nOn Mon, 1 Jan 2024 at 12:{reply:02d}, "
+                f"person{reply}@example.net wrote:\n{quoted}")
+    msg = MIMEText(body, 'plain', 'utf-8')
+    msg['From'] = "Sam Example <sam@example.net>"
+    msg['Subject'] = "Re: " * min(8 * scale, 10) + _sentence(rng, 4)
+    msg['In-Reply-To'] = f"<thread{index}.{8 * scale - 1}@example.net>"
+    msg['References'] = ' '.join(f"<thread{index}.{reply}@example.net>" for reply in range(8 * scale))
+    _add_transport_headers(msg, rng, index, hops=4)
+    return msg.as_bytes()
+
+
+def html(index: int, rng: random.Random, scale: int = 1) -> bytes:
+    """HTML-only marketing mail: nested tables, inline styles, tracking pixels."""
+    cells = ''.join(
+        f'<tr><td style="padding:12px;font-family:Helvetica,Arial;color:#333333" class="c{i}">'
+        f'<a href="https://click.example.com/t/{rng.getrandbits(64):x}" style="color:#0066cc">'
+        f'{_sentence(rng)}</a><img src="https://t.example.com/p/{i}.gif" width="1" height="1" alt=""></td></tr>'
+        for i in range(20 * scale)
+    )
+    markup = (f'<!DOCTYPE html><html><head><style>td {{ line-height: 1.4 }}</style></head><body>'
+              f'<table width="100%"><tr><td><table width="600">{cells}</table></td></tr></table>'
+              f'<p style="font-size:11px">Summer sale: 20% off. <a href="https://example.com/u">Unsubscribe</a></p>'
+              f'</body></html>')
+    msg = MIMEText(markup, 'html', 'utf-8')
+    msg['From'] = "Example Store <deals@store.example.com>"
+    msg['Subject'] = f"Don't miss out: {_sentence(rng, 4)}"
+    _add_transport_headers(msg, rng, index, hops=5)
+    return msg.as_bytes()
+
+
+_SUBJECTS = (
+    ('utf-8', "Réunion de projet — compte rendu"),
+    ('iso-2022-jp', "会議の議事録について"),
+    ('koi8-r', "Отчёт за квартал"),
+    ('iso-8859-7', "Ενημέρωση έργου"),
+    ('utf-8', "Zusammenfassung: Überprüfung der Lieferung"),
+    ('gb2312', "项目进度更新"),
+)
+
+
+def multilingual(index: int, rng: random.Random, scale: int = 1) -> bytes:
+    """Plain-text message with a subject and sender name in a non-ASCII charset."""
+    charset, subject = _SUBJECTS[index % len(_SUBJECTS)]
+    msg = MIMEText(f"{subject}\n\n{_paragraphs(rng, 2 * scale)}", 'plain', 'utf-8')
+    msg['From'] = f"{Header('Zoë Ærøskøbing', 'iso-8859-1').encode()} <zoe@example.dk>"
+    msg['Subject'] = Header(f"{subject} #{index}", charset).encode()
+    _add_transport_headers(msg, rng, index, hops=3)
+    return msg.as_bytes()
+
+
+KINDS = {'personal': personal, 'newsletter': newsletter, 'receipt': receipt, 'rich': rich,
+         'otp': otp, 'thread': thread, 'html': html, 'multilingual': multilingual}
+
+
+def build_corpus(per_kind: int = 25, seed: int = 1, kinds: Optional[Iterable[str]] = None,
+                 scale: int = 1) -> Dict[str, List[bytes]]:
+    """
+    Build the benchmark corpus.
+    
+    Args:
+        per_kind: Messages of each kind
+        seed: Random seed
+        kinds: Kinds to generate (default: all of KINDS)
+        scale: Body size multiplier (paragraphs, thread replies, HTML rows)
+    
+    Returns:
+        Dictionary mapping kind to raw messages
+    """
+    rng = random.Random(seed)
+    return {
+        kind: [KINDS[kind](index, rng, scale) for index in range(per_kind)]
+        for kind in (kinds or KINDS)
+    }
@@ -1,15 +1,21 @@
 
 import streamlit as st
 import os
+import re
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from agents.email_agent import generate_email_response, test_gemini_connection
-from utils.contacts import load_contacts, save_contacts, add_contact, remove_contact
+from utils.contacts import load_contacts, save_contacts, add_contact, remove_contact, get_contact_index, import_contacts
+from utils.contact_index import normalize_entry
 from utils.email_folder_manager import EmailFolderManager
+from utils.message_cache import MessageCache
 from utils.inbox_monitor import InboxMonitor
 from utils.email_sender import send_email, validate_email_address
 from utils.mailbuddy_triage import TriageTask, EmailTriageResult
+from utils.triage_cache import TriageCache
+from utils.triage_classifier import TriageClassifier, classifier_available
+from utils.triage_rules import RuleSource
 
 
 # Page configuration
@@ -52,6 +58,32 @@ def initialize_session_state():
     
     if 'check_interval' not in st.session_state:
         st.session_state.check_interval = 5  # minutes
+    
+    if 'triage_cache' not in st.session_state:
+        st.session_state.triage_cache = TriageCache()
+    
+    if 'triage_rules' not in st.session_state:
+        # data/triage_rules.json, reloaded on change
+        st.session_state.triage_rules = RuleSource()
+    
+    if 'triage_classifier' not in st.session_state:
+        # Learned model (data/triage_model.npz); None without NumPy
+        st.session_state.triage_classifier = None
+        if classifier_available():
+            st.session_state.triage_classifier = TriageClassifier.load() or TriageClassifier()
+
+
+def learn_from_moves(emails: List[Dict], folders: List[Optional[str]], previous: List[str]):
+    """
+    Teach the triage classifier the user's corrections of where mail was filed.
+    
+    Only moves the user chose against the filing are learned; accepting a
+    suggestion would train the classifier on its own predictions.
+    """
+    classifier = st.session_state.triage_classifier
+    if classifier is not None and emails:
+        classifier.learn(emails, folders, previous=previous)
+        classifier.save()
 
 
 def new_emails_callback(new_emails: List[Dict]):
@@ -131,12 +163,14 @@ def configure_imap_section():
             if st.button("🔌 Connect IMAP", use_container_width=True):
                 with st.spinner("Connecting to IMAP server..."):
                     folder_manager = EmailFolderManager(
-                        email_address, email_password, imap_server, imap_port
+                        email_address, email_password, imap_server, imap_port,
+                        cache=MessageCache()
                     )
                     
                     if folder_manager.connect():
                         # Ensure folders exist
-                        if folder_manager.ensure_folders_exist():
+                        rule_folders = st.session_state.triage_rules.current().folders
+                        if folder_manager.ensure_folders_exist(rule_folders):
                             st.session_state.folder_manager = folder_manager
                             st.session_state.imap_configured = True
                             st.success("✅ IMAP connected successfully!")
@@ -163,7 +197,9 @@ def configure_imap_section():
                 if st.session_state.folder_manager:
                     with st.spinner("Fetching emails from INBOX..."):
                         try:
-                            recent_emails = st.session_state.folder_manager.fetch_recent_emails("INBOX", limit=10)
+                            recent_emails = st.session_state.folder_manager.fetch_recent_emails(
+                                "INBOX", limit=10, headers_only=True
+                            )
                             if recent_emails:
                                 # Add to pending queue
                                 new_count = 0
@@ -219,6 +255,13 @@ def automated_monitor_section():
                 help="How often to check for new emails"
             )
             st.session_state.check_interval = check_interval
+            
+            use_idle = st.checkbox(
+                "Push notifications (IMAP IDLE)",
+                value=True,
+                key="monitor_use_idle",
+                help="Get new emails within seconds; falls back to the check interval if the server lacks IDLE"
+            )
         
         with col2:
             if not st.session_state.monitor_running:
@@ -227,11 +270,13 @@ def automated_monitor_section():
                     if not st.session_state.inbox_monitor:
                         st.session_state.inbox_monitor = InboxMonitor(
                             st.session_state.folder_manager,
-                            check_interval_seconds=check_interval * 60
+                            check_interval_seconds=check_interval * 60,
+                            use_idle=use_idle
                         )
                         st.session_state.inbox_monitor.set_new_emails_callback(new_emails_callback)
                     else:
                         st.session_state.inbox_monitor.set_check_interval(check_interval * 60)
+                        st.session_state.inbox_monitor.use_idle = use_idle
                     
                     st.session_state.inbox_monitor.start()
                     st.session_state.monitor_running = True
@@ -251,7 +296,9 @@ def automated_monitor_section():
                     with st.spinner("Checking for new emails..."):
                         # Use folder_manager directly to fetch emails
                         try:
-                            recent_emails = st.session_state.folder_manager.fetch_recent_emails("INBOX", limit=20)
+                            recent_emails = st.session_state.folder_manager.fetch_recent_emails(
+                                "INBOX", limit=20, headers_only=True
+                            )
                             if recent_emails:
                                 # Filter out already seen emails
                                 new_count = 0
@@ -289,7 +336,10 @@ def automated_monitor_section():
                 st.metric("Status", f"{status_icon} {'Active' if status['running'] else 'Stopped'}")
             
             with col2:
-                st.metric("Check Interval", f"{check_interval} min")
+                if status['mode'] == 'idle':
+                    st.metric("Mode", "⚡ Push (IDLE)")
+                else:
+                    st.metric("Check Interval", f"{check_interval} min")
             
             with col3:
                 last_check = status['last_check_time']
@@ -315,9 +365,39 @@ def pending_emails_section():
         
         st.markdown("### Newly Detected Emails")
         
-        # Load contacts for triage
-        known_contacts = load_contacts()
-        triage_task = TriageTask(known_contacts)
+        # Load contacts for triage (cached until the contacts file changes)
+        known_contacts = get_contact_index()
+        triage_task = TriageTask(known_contacts, cache=st.session_state.triage_cache,
+                                 rules=st.session_state.triage_rules,
+                                 classifier=st.session_state.triage_classifier)
+        triage_results = triage_task.run_batch(st.session_state.pending_emails)
+        
+        if st.button("📁 Move All to Suggested Folders", key="move_all_pending", use_container_width=True):
+            folder_manager = st.session_state.folder_manager
+            destinations = {
+                email_data['uid']: folder_manager.get_folder_for_result(triage_result)
+                for email_data, triage_result in zip(st.session_state.pending_emails, triage_results)
+                if email_data.get('uid')
+            }
+            if destinations:
+                with st.spinner(f"Moving {len(destinations)} emails..."):
+                    results = folder_manager.move_many(list(destinations), "INBOX", destinations)
+                
+                moved = {uid for uid, folder in destinations.items() if results.get(folder)}
+                # Not learned from: bulk-accepted suggestions include the classifier's own
+                # predictions, and training on those would reinforce its mistakes
+                st.session_state.pending_emails = [
+                    email_data for email_data in st.session_state.pending_emails
+                    if email_data.get('uid') not in moved
+                ]
+                failed = [folder for folder, success in results.items() if not success]
+                if failed:
+                    st.error(f"❌ Failed to move emails to: {', '.join(failed)}")
+                else:
+                    st.success(f"✅ Moved {len(moved)} emails!")
+                    st.rerun()
+            else:
+                st.error("❌ Email IDs not found")
         
         for idx, email_data in enumerate(st.session_state.pending_emails):
             email_id = email_data.get('message_id', email_data.get('id'))
@@ -333,7 +413,7 @@ def pending_emails_section():
                 
                 with col2:
                     # Triage classification
-                    triage_result = triage_task.run(email_data)
+                    triage_result = triage_results[idx]
                     
                     category_colors = {
                         "URGENT": "🔴",
@@ -434,10 +514,10 @@ def pending_emails_section():
                                 st.error("❌ SMTP not configured. Please enter SMTP credentials in Email Server Settings.")
                 
                 with col4:
-                    folder = st.session_state.folder_manager.get_folder_for_category(triage_result.category)
+                    folder = st.session_state.folder_manager.get_folder_for_result(triage_result)
                     if st.button(f"📁 Move to {folder[:8]}", key=f"move_{idx}", use_container_width=True):
                         with st.spinner(f"Moving to {folder}..."):
-                            # Use 'id' field which is the IMAP message ID
+                            # 'id' is the message UID, which earlier moves don't shift
                             imap_msg_id = email_data.get('id')
                             if imap_msg_id:
                                 success = st.session_state.folder_manager.move_email(
@@ -446,6 +526,7 @@ def pending_emails_section():
                                     folder
                                 )
                                 if success:
+                                    # The suggested folder; not learned, see learn_from_moves
                                     st.session_state.pending_emails.pop(idx)
                                     st.success(f"✅ Moved to {folder}!")
                                     st.rerun()
@@ -601,7 +682,10 @@ def classified_folders_section():
             if st.button("🔄 Load Folder", use_container_width=True):
                 with st.spinner(f"Loading emails from {selected_folder}..."):
                     try:
-                        emails = st.session_state.folder_manager.fetch_recent_emails(selected_folder, limit=limit)
+                        # Bodies are downloaded only when an email is viewed
+                        emails = st.session_state.folder_manager.fetch_recent_emails(
+                            selected_folder, limit=limit, headers_only=True
+                        )
                         st.session_state[f'folder_emails_{selected_folder}'] = emails
                         st.rerun()
                     except Exception as e:
@@ -652,6 +736,8 @@ def classified_folders_section():
                                         "INBOX"
                                     )
                                     if success:
+                                        # A correction: the message doesn't belong in this folder
+                                        learn_from_moves([email_data], [None], [selected_folder])
                                         st.success("✅ Moved to INBOX!")
                                         # Remove from current view
                                         st.session_state[folder_key].pop(idx)
@@ -770,6 +856,37 @@ def sidebar_content():
         with col2:
             st.metric("Drafts", len(st.session_state.draft_responses))
         
+        cache_stats = st.session_state.triage_cache.stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Triage Cache Hits", f"{cache_stats['hit_rate']:.0%}")
+        with col2:
+            st.metric("Time Saved", f"{cache_stats['time_saved'] * 1000:.0f} ms")
+        
+        st.markdown("---")
+        
+        st.markdown("### 🧠 Learned Triage")
+        
+        classifier = st.session_state.triage_classifier
+        if classifier is None:
+            st.caption("Install numpy to learn triage from your folders")
+        else:
+            examples = classifier.examples()
+            if classifier.ready:
+                st.caption(f"Learned from {sum(examples.values())} emails in {len(examples)} folders")
+            else:
+                st.caption("Not trained yet; keyword rules are used")
+            if st.session_state.imap_configured and st.button("🎓 Learn from Folders", use_container_width=True):
+                with st.spinner("Learning from your triage folders..."):
+                    retrained = TriageClassifier()
+                    learned = retrained.learn_folders(st.session_state.folder_manager,
+                                                      sorted(st.session_state.triage_rules.current().folders),
+                                                      per_folder=200)
+                    retrained.save()
+                    st.session_state.triage_classifier = retrained
+                st.success(f"✅ Learned {sum(learned.values())} emails!")
+                st.rerun()
+        
         st.markdown("---")
         
         st.markdown("### 👥 Known Contacts")
@@ -786,14 +903,30 @@ def sidebar_content():
             st.info("No contacts added yet")
         
         # Add contact
-        new_contact = st.text_input("Add contact email:", placeholder="email@example.com")
+        new_contact = st.text_input("Add contact email or domain:",
+                                    placeholder="email@example.com, @company.com or *.company.com")
         if st.button("➕ Add Contact", use_container_width=True):
-            if new_contact and validate_email_address(new_contact):
-                if add_contact(new_contact):
+            # Whole domains and subdomain wildcards are matched by the contact index
+            is_domain = new_contact.strip().startswith(('@', '*.')) or '@' not in new_contact
+            if new_contact and (validate_email_address(new_contact.strip())
+                                or (is_domain and normalize_entry(new_contact))):
+                if add_contact(normalize_entry(new_contact)):
                     st.success("✅ Contact added!")
                     st.rerun()
             else:
-                st.error("❌ Invalid email address")
+                st.error("❌ Invalid email address or domain")
+        
+        # Bulk import (one transaction, whatever the size)
+        contacts_file = st.file_uploader("Import contacts (one per line or comma-separated):",
+                                         type=["txt", "csv"], key="import_contacts")
+        if contacts_file is not None and st.button("📥 Import Contacts", use_container_width=True):
+            text = contacts_file.getvalue().decode('utf-8', errors='replace')
+            entries = [normalize_entry(entry) for entry in re.split(r'[,;\s]+', text) if entry]
+            added = import_contacts(entry for entry in entries if entry)
+            if added >= 0:
+                st.success(f"✅ Imported {added} new contacts")
+            else:
+                st.error("❌ Failed to import contacts")
         
         st.markdown("---")
         
@@ -5,7 +5,7 @@ Shared test configuration for MailBuddy tests.
 """
 
 import pytest
-from unittest.mock import Mock, MagicMock
+from unittest.mock import Mock, MagicMock, patch
 import imaplib
 
 
@@ -14,6 +14,7 @@ def mock_imap_connection():
     """Mock IMAP4_SSL connection."""
     mock_mail = MagicMock(spec=imaplib.IMAP4_SSL)
     mock_mail.login.return_value = ('OK', [b'Logged in'])
+    mock_mail.capability.return_value = ('OK', [b'IMAP4rev1'])
     mock_mail.select.return_value = ('OK', [b'1'])
     mock_mail.search.return_value = ('OK', [b'1 2 3'])
     mock_mail.list.return_value = ('OK', [b'(\\HasNoChildren) "/" "INBOX"'])
@@ -69,3 +70,44 @@ def known_contacts():
         'client@business.com',
         'teammate@company.com'
     ]
+
+
+@pytest.fixture
+def fake_imap_server(request):
+    """
+    Running in-process fake IMAP server.
+    
+    Parametrize indirectly with a capability list to emulate servers that
+    lack extensions, e.g. ``@pytest.mark.parametrize('fake_imap_server',
+    [['IMAP4rev1']], indirect=True)``.
+    """
+    from tests.fake_imap_server import FakeIMAPServer
+    capabilities = getattr(request, 'param', None)
+    with FakeIMAPServer(capabilities=capabilities) as server:
+        yield server
+
+
+@pytest.fixture
+def fake_imap_manager(fake_imap_server):
+    """EmailFolderManager connected to the fake IMAP server over plain TCP."""
+    from utils.email_folder_manager import EmailFolderManager
+    with patch('utils.email_folder_manager.imaplib.IMAP4_SSL', imaplib.IMAP4):
+        manager = EmailFolderManager(
+            fake_imap_server.username,
+            fake_imap_server.password,
+            fake_imap_server.host,
+            fake_imap_server.port
+        )
+        assert manager.connect()
+        yield manager
+        manager.disconnect()
+
+
+@pytest.fixture
+def header_first_rules(tmp_path):
+    """RuleSource for the default rules with the header-only rules first (opt-in)."""
+    import json
+    from utils.triage_rules import DEFAULT_RULES, RuleSource, header_rules_first
+    path = tmp_path / "header_first_rules.json"
+    path.write_text(json.dumps(header_rules_first(DEFAULT_RULES)), encoding='utf-8')
+    return RuleSource(str(path))
@@ -0,0 +1,706 @@
+"""
+Fake IMAP Server
+
+Minimal in-process IMAP4rev1 server for integration tests and benchmarks.
+Speaks plain TCP, so clients connect with ``imaplib.IMAP4`` (tests patch
+``IMAP4_SSL`` accordingly). An optional per-command latency simulates the
+round-trip time of a remote server.
+"""
+
+import email
+import email.message
+import re
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class FakeMessage:
+    """A message stored in a fake mailbox."""
+
+    def __init__(self, uid: int, raw: bytes, flags: Optional[List[str]] = None):
+        self.uid = uid
+        self.raw = raw
+        self.flags = list(flags or [])
+        self.modseq = 0
+        self._parsed = None
+        self._bodystructure = None
+
+    @property
+    def parsed(self) -> email.message.Message:
+        if self._parsed is None:
+            self._parsed = email.message_from_bytes(self.raw)
+        return self._parsed
+
+    @property
+    def bodystructure(self) -> str:
+        if self._bodystructure is None:
+            self._bodystructure = render_bodystructure(self.parsed)
+        return self._bodystructure
+
+
+class FakeMailbox:
+    """A fake IMAP folder."""
+
+    def __init__(self, name: str, uidvalidity: int = 1):
+        self.name = name
+        self.uidvalidity = uidvalidity
+        self.uidnext = 1
+        self.highestmodseq = 1
+        self.messages: List[FakeMessage] = []
+        # (uid, modseq) of every expunged message, for QRESYNC
+        self.vanished: List[tuple] = []
+
+    def append(self, raw: bytes, flags: Optional[List[str]] = None) -> int:
+        uid = self.uidnext
+        self.uidnext += 1
+        message = FakeMessage(uid, raw, flags)
+        self.touch(message)
+        self.messages.append(message)
+        return uid
+
+    def touch(self, message: FakeMessage):
+        """Give a changed message a new MODSEQ."""
+        self.highestmodseq += 1
+        message.modseq = self.highestmodseq
+
+    def set_flags(self, uid: int, flags: List[str]):
+        """Change a message's flags, as another client would."""
+        for message in self.messages:
+            if message.uid == uid:
+                message.flags = list(flags)
+                self.touch(message)
+                return
+        raise KeyError(uid)
+
+    def remove(self, index: int) -> FakeMessage:
+        """Expunge the message at a 0-based position."""
+        message = self.messages.pop(index)
+        self.highestmodseq += 1
+        self.vanished.append((message.uid, self.highestmodseq))
+        return message
+
+
+_SECTION = re.compile(r'^BODY(?:\.PEEK)?\[([\d.]+)\](?:<(\d+)\.(\d+)>)?$')
+
+
+def find_section(message: email.message.Message, section: str) -> email.message.Message:
+    """Find the MIME part addressed by an IMAP section number such as "2.1"."""
+    part = message
+    for number in section.split('.'):
+        if part.is_multipart():
+            part = part.get_payload()[int(number) - 1]
+        elif number != '1':
+            raise ValueError(f'No section {section}')
+    return part
+
+
+def _tokenize_args(text: str) -> List:
+    """Split command arguments into atoms, quoted strings and nested lists."""
+    stack = [[]]
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == ' ':
+            i += 1
+        elif ch == '(':
+            stack.append([])
+            i += 1
+        elif ch == ')':
+            item = stack.pop()
+            stack[-1].append(item)
+            i += 1
+        elif ch == '"':
+            j = i + 1
+            value = ''
+            while j < len(text) and text[j] != '"':
+                if text[j] == '\\':
+                    j += 1
+                value += text[j]
+                j += 1
+            stack[-1].append(value)
+            i = j + 1
+        else:
+            j = i
+            depth = 0
+            while j < len(text):
+                if text[j] == '[':
+                    depth += 1
+                elif text[j] == ']':
+                    depth -= 1
+                elif depth == 0 and text[j] in ' ()':
+                    break
+                j += 1
+            stack[-1].append(text[i:j])
+            i = j
+    return stack[0]
+
+
+def _quote(value: Optional[str]) -> str:
+    if value is None:
+        return 'NIL'
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _params(params) -> str:
+    if not params:
+        return 'NIL'
+    return '(' + ' '.join(f'{_quote(k)} {_quote(v)}' for k, v in params) + ')'
+
+
+def render_bodystructure(part: email.message.Message) -> str:
+    """Render a BODYSTRUCTURE (with extension data) for a parsed message."""
+    if part.is_multipart():
+        children = ''.join(render_bodystructure(child) for child in part.get_payload())
+        return f'({children} {_quote(part.get_content_subtype())})'
+
+    maintype = part.get_content_maintype()
+    subtype = part.get_content_subtype()
+    params = [(k, v) for k, v in part.get_params()[1:]] if part.get_params() else []
+    payload = part.get_payload(decode=False)
+    payload = payload.encode() if isinstance(payload, str) else (payload or b'')
+    encoding = part.get('Content-Transfer-Encoding', '7bit')
+    fields = (f'{_quote(maintype)} {_quote(subtype)} {_params(params)} NIL NIL '
+              f'{_quote(encoding)} {len(payload)}')
+    if maintype == 'text':
+        fields += ' %d' % (payload.count(b'\n') + 1)
+
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_filename()
+        disp_params = _params([('filename', filename)] if filename else [])
+        fields += f' NIL ({_quote(disposition)} {disp_params}) NIL'
+    else:
+        fields += ' NIL NIL NIL'
+    return f'({fields})'
+
+
+def _parse_sequence_set(spec: str, values: List[int]) -> List[int]:
+    """Resolve an IMAP sequence set against the available numbers."""
+    if not values:
+        return []
+    highest = max(values)
+    selected = set()
+    for part in spec.split(','):
+        if ':' in part:
+            lo, hi = part.split(':')
+            lo = highest if lo == '*' else int(lo)
+            hi = highest if hi == '*' else int(hi)
+            lo, hi = min(lo, hi), max(lo, hi)
+            selected.update(v for v in values if lo <= v <= hi)
+        else:
+            number = highest if part == '*' else int(part)
+            if number in values:
+                selected.add(number)
+    return sorted(selected)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Handles one client connection."""
+
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.selected: Optional[FakeMailbox] = None
+        self.readonly = False
+        self.enabled = set()
+        self.write_lock = threading.Lock()
+        with self.server.fake.clients_lock:
+            self.server.fake.clients.append(self)
+
+    def finish(self):
+        with self.server.fake.clients_lock:
+            self.server.fake.clients.remove(self)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def send_line(self, line):
+        if isinstance(line, str):
+            line = line.encode()
+        self.write(line + b'\r\n')
+
+    def write(self, data: bytes):
+        with self.write_lock:
+            self.server.fake.bytes_sent += len(data)
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def handle(self):
+        server = self.server.fake
+        self.send_line('* OK [CAPABILITY ' + ' '.join(server.capabilities) + '] Fake IMAP ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            line = line.decode('utf-8', errors='replace').rstrip('\r\n')
+            if not line:
+                continue
+            parts = line.split(' ', 2)
+            tag = parts[0]
+            command = parts[1].upper() if len(parts) > 1 else ''
+            args = parts[2] if len(parts) > 2 else ''
+            server.record(command, args)
+
+            if server.latency:
+                time.sleep(server.latency)
+
+            handler = getattr(self, 'cmd_' + command.replace(' ', '_'), None)
+            if handler is None:
+                self.send_line(f'{tag} BAD Unknown command')
+                continue
+            try:
+                if handler(tag, args) is False:
+                    return
+            except Exception as e:  # pragma: no cover - surfaced to the client
+                self.send_line(f'{tag} BAD {e}')
+
+    # Commands -------------------------------------------------------------
+
+    def cmd_CAPABILITY(self, tag, args):
+        self.send_line('* CAPABILITY ' + ' '.join(self.server.fake.capabilities))
+        self.send_line(f'{tag} OK CAPABILITY completed')
+
+    def cmd_LOGIN(self, tag, args):
+        user, password = _tokenize_args(args)[:2]
+        fake = self.server.fake
+        if (user, password) != (fake.username, fake.password):
+            self.send_line(f'{tag} NO LOGIN failed')
+            return
+        self.send_line(f'{tag} OK LOGIN completed')
+
+    def cmd_LOGOUT(self, tag, args):
+        self.send_line('* BYE Logging out')
+        self.send_line(f'{tag} OK LOGOUT completed')
+        return False
+
+    def cmd_ENABLE(self, tag, args):
+        capabilities = self.server.fake.capabilities
+        if 'ENABLE' not in capabilities:
+            self.send_line(f'{tag} BAD ENABLE not supported')
+            return
+        enabled = [name.upper() for name in args.split() if name.upper() in capabilities]
+        self.enabled.update(enabled)
+        if 'QRESYNC' in self.enabled:
+            self.enabled.add('CONDSTORE')
+        self.send_line('* ENABLED' + ''.join(f' {name}' for name in enabled))
+        self.send_line(f'{tag} OK ENABLE completed')
+
+    def cmd_NOOP(self, tag, args):
+        self.send_line(f'{tag} OK NOOP completed')
+
+    def cmd_IDLE(self, tag, args):
+        if 'IDLE' not in self.server.fake.capabilities:
+            self.send_line(f'{tag} BAD IDLE not supported')
+            return
+        fake = self.server.fake
+        with fake.idle_lock:
+            fake.idlers.append(self)
+        self.send_line('+ idling')
+        try:
+            line = self.rfile.readline()
+        finally:
+            with fake.idle_lock:
+                fake.idlers.remove(self)
+        if not line:
+            return False
+        self.send_line(f'{tag} OK IDLE terminated')
+
+    def cmd_LIST(self, tag, args):
+        for name in self.server.fake.mailboxes:
+            self.send_line(f'* LIST (\\HasNoChildren) "/" "{name}"')
+        self.send_line(f'{tag} OK LIST completed')
+
+    def cmd_CREATE(self, tag, args):
+        name = _tokenize_args(args)[0]
+        self.server.fake.mailbox(name)
+        self.send_line(f'{tag} OK CREATE completed')
+
+    def _select(self, tag, args, readonly):
+        tokens = _tokenize_args(args)
+        name = tokens[0]
+        qresync = None
+        if len(tokens) > 1 and tokens[1] and str(tokens[1][0]).upper() == 'QRESYNC':
+            if 'QRESYNC' not in self.enabled:
+                self.send_line(f'{tag} BAD QRESYNC not enabled')
+                return
+            qresync = [int(n) for n in tokens[1][1][:2]]
+        mailbox = self.server.fake.mailboxes.get(name)
+        if mailbox is None:
+            self.send_line(f'{tag} NO No such mailbox')
+            return
+        self.selected = mailbox
+        self.readonly = readonly
+        self.send_line('* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)')
+        self.send_line(f'* {len(mailbox.messages)} EXISTS')
+        self.send_line('* 0 RECENT')
+        self.send_line(f'* OK [UIDVALIDITY {mailbox.uidvalidity}] UIDs valid')
+        self.send_line(f'* OK [UIDNEXT {mailbox.uidnext}] Predicted next UID')
+        if 'CONDSTORE' in self.enabled:
+            self.send_line(f'* OK [HIGHESTMODSEQ {mailbox.highestmodseq}] Highest')
+        if qresync and qresync[0] == mailbox.uidvalidity:
+            since = qresync[1]
+            vanished = [uid for uid, modseq in mailbox.vanished if modseq > since]
+            if vanished:
+                self.send_line('* VANISHED (EARLIER) ' + ','.join(map(str, vanished)))
+            for number, message in enumerate(mailbox.messages, 1):
+                if message.modseq > since:
+                    self.send_line(f'* {number} FETCH (UID {message.uid} '
+                                   f'FLAGS ({" ".join(message.flags)}) MODSEQ ({message.modseq}))')
+        mode = 'READ-ONLY' if readonly else 'READ-WRITE'
+        self.send_line(f'{tag} OK [{mode}] SELECT completed')
+
+    def cmd_SELECT(self, tag, args):
+        self._select(tag, args, readonly=False)
+
+    def cmd_EXAMINE(self, tag, args):
+        self._select(tag, args, readonly=True)
+
+    def cmd_SEARCH(self, tag, args):
+        self._search(tag, args, by_uid=False)
+
+    def _search(self, tag, args, by_uid):
+        if self.selected is None:
+            self.send_line(f'{tag} BAD No mailbox selected')
+            return
+        messages = self.selected.messages
+        criteria = _tokenize_args(args)
+        if criteria and criteria[0].upper() == 'CHARSET':
+            criteria = criteria[2:]
+
+        matches = list(range(1, len(messages) + 1))
+        i = 0
+        while i < len(criteria):
+            key = criteria[i].upper()
+            if key == 'ALL':
+                i += 1
+            elif key == 'UID':
+                uids = _parse_sequence_set(criteria[i + 1], [m.uid for m in messages])
+                matches = [n for n in matches if messages[n - 1].uid in uids]
+                i += 2
+            else:
+                raise ValueError(f'Unsupported search key {key}')
+
+        if by_uid:
+            matches = [messages[n - 1].uid for n in matches]
+        self.send_line('* SEARCH' + ''.join(f' {n}' for n in matches))
+        self.send_line(f'{tag} OK SEARCH completed')
+
+    def cmd_FETCH(self, tag, args):
+        self._fetch(tag, args, by_uid=False)
+
+    def cmd_UID(self, tag, args):
+        sub, _, rest = args.partition(' ')
+        sub = sub.upper()
+        if sub == 'FETCH':
+            self._fetch(tag, rest, by_uid=True)
+        elif sub == 'SEARCH':
+            self._search(tag, rest, by_uid=True)
+        elif sub == 'COPY':
+            self._copy(tag, rest, by_uid=True)
+        elif sub == 'MOVE' and 'MOVE' in self.server.fake.capabilities:
+            self._copy(tag, rest, by_uid=True, move=True)
+        elif sub == 'STORE':
+            self._store(tag, rest, by_uid=True)
+        elif sub == 'EXPUNGE' and 'UIDPLUS' in self.server.fake.capabilities:
+            self._expunge(tag, rest)
+        else:
+            self.send_line(f'{tag} BAD Unsupported UID command')
+
+    def _numbers(self, spec: str, by_uid: bool) -> List[int]:
+        """Resolve a sequence set (or UID set) to sequence numbers."""
+        messages = self.selected.messages
+        if by_uid:
+            uids = set(_parse_sequence_set(spec, [m.uid for m in messages]))
+            return [n for n, m in enumerate(messages, 1) if m.uid in uids]
+        return _parse_sequence_set(spec, list(range(1, len(messages) + 1)))
+
+    def _check_writable(self, tag) -> bool:
+        if self.selected is None:
+            self.send_line(f'{tag} BAD No mailbox selected')
+            return False
+        if self.readonly:
+            self.send_line(f'{tag} NO Mailbox is read-only')
+            return False
+        return True
+
+    def cmd_COPY(self, tag, args):
+        self._copy(tag, args, by_uid=False)
+
+    def _copy(self, tag, args, by_uid, move=False):
+        if move:
+            if not self._check_writable(tag):
+                return
+        elif self.selected is None:
+            self.send_line(f'{tag} BAD No mailbox selected')
+            return
+        spec, _, destination = args.partition(' ')
+        name = _tokenize_args(destination)[0]
+        if name not in self.server.fake.mailboxes:
+            self.send_line(f'{tag} NO [TRYCREATE] No such mailbox')
+            return
+        numbers = self._numbers(spec, by_uid)
+        for number in numbers:
+            message = self.selected.messages[number - 1]
+            self.server.fake.add_message(message.raw, name, message.flags)
+        if move:
+            self._remove(set(numbers))
+        self.send_line(f'{tag} OK {"MOVE" if move else "COPY"} completed')
+
+    def cmd_STORE(self, tag, args):
+        self._store(tag, args, by_uid=False)
+
+    def _store(self, tag, args, by_uid):
+        if not self._check_writable(tag):
+            return
+        spec, mode, flags = args.split(' ', 2)
+        flags = _tokenize_args(flags)
+        if flags and isinstance(flags[0], list):
+            flags = flags[0]
+        mode = mode.upper()
+        for number in self._numbers(spec, by_uid):
+            message = self.selected.messages[number - 1]
+            if mode.startswith('+'):
+                message.flags += [f for f in flags if f not in message.flags]
+            elif mode.startswith('-'):
+                message.flags = [f for f in message.flags if f not in flags]
+            else:
+                message.flags = list(flags)
+            self.selected.touch(message)
+            if not mode.endswith('.SILENT'):
+                uid = f'UID {message.uid} ' if by_uid else ''
+                self.send_line(f'* {number} FETCH ({uid}FLAGS ({" ".join(message.flags)}))')
+        self.send_line(f'{tag} OK STORE completed')
+
+    def cmd_EXPUNGE(self, tag, args):
+        self._expunge(tag, None)
+
+    def _expunge(self, tag, uid_spec: Optional[str]):
+        if not self._check_writable(tag):
+            return
+        messages = self.selected.messages
+        allowed = set(self._numbers(uid_spec, by_uid=True)) if uid_spec else None
+        self._remove({
+            n for n, m in enumerate(messages, 1)
+            if '\\Deleted' in m.flags and (allowed is None or n in allowed)
+        })
+        self.send_line(f'{tag} OK EXPUNGE completed')
+
+    def _remove(self, numbers):
+        """Remove messages and report each removal with an untagged EXPUNGE (or VANISHED)."""
+        # Every EXPUNGE renumbers the messages after it, so report from the top down
+        for number in sorted(numbers, reverse=True):
+            message = self.selected.remove(number - 1)
+            if 'QRESYNC' in self.enabled:
+                self.send_line(f'* VANISHED {message.uid}')
+            else:
+                self.send_line(f'* {number} EXPUNGE')
+
+    def _fetch(self, tag, args, by_uid):
+        if self.selected is None:
+            self.send_line(f'{tag} BAD No mailbox selected')
+            return
+        spec, _, items = args.partition(' ')
+        items = _tokenize_args(items)
+        modifiers = items[1] if len(items) > 1 and isinstance(items[1], list) else []
+        if items and isinstance(items[0], list):
+            items = items[0]
+        items = [item.upper() for item in items]
+        if by_uid and 'UID' not in items:
+            items.insert(0, 'UID')
+
+        changedsince = None
+        if modifiers and str(modifiers[0]).upper() == 'CHANGEDSINCE':
+            if 'CONDSTORE' not in self.server.fake.capabilities:
+                self.send_line(f'{tag} BAD CONDSTORE not supported')
+                return
+            # CHANGEDSINCE implicitly enables CONDSTORE (RFC 7162)
+            self.enabled.add('CONDSTORE')
+            changedsince = int(modifiers[1])
+            if 'MODSEQ' not in items:
+                items.append('MODSEQ')
+
+        messages = self.selected.messages
+        for number in self._numbers(spec, by_uid):
+            message = messages[number - 1]
+            if changedsince is not None and message.modseq <= changedsince:
+                continue
+            parts = []
+            for item in items:
+                parts.append(self.server.fake.render_fetch_item(message, item))
+            self.write(f'* {number} FETCH ('.encode() + b' '.join(parts) + b')\r\n')
+        self.send_line(f'{tag} OK FETCH completed')
+
+
+class _ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeIMAPServer:
+    """
+    In-process IMAP server holding mailboxes in memory.
+
+    Use as a context manager; ``host`` and ``port`` are available once started.
+    Every command received is recorded in ``commands`` as (COMMAND, args).
+    """
+
+    def __init__(self, username: str = "test@example.com", password: str = "password",
+                 latency: float = 0.0, capabilities: Optional[List[str]] = None):
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.capabilities = capabilities or ['IMAP4rev1', 'IDLE']
+        self.mailboxes: Dict[str, FakeMailbox] = {}
+        self.commands: List[tuple] = []
+        self.bytes_sent = 0
+        self.idlers: List[_Handler] = []
+        self.idle_lock = threading.Lock()
+        self.clients: List[_Handler] = []
+        self.clients_lock = threading.Lock()
+        self._commands_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.mailbox('INBOX')
+
+    def mailbox(self, name: str) -> FakeMailbox:
+        """Get or create a mailbox."""
+        if name not in self.mailboxes:
+            self.mailboxes[name] = FakeMailbox(name)
+        return self.mailboxes[name]
+
+    def add_message(self, raw: bytes, folder: str = 'INBOX',
+                    flags: Optional[List[str]] = None) -> int:
+        """Store a message, notify idling clients and return its UID."""
+        mailbox = self.mailbox(folder)
+        uid = mailbox.append(raw, flags)
+        with self.idle_lock:
+            idlers = [h for h in self.idlers if h.selected is mailbox]
+        for handler in idlers:
+            handler.send_line(f'* {len(mailbox.messages)} EXISTS')
+        return uid
+
+    def drop_connections(self):
+        """Close every client connection, as a server restart or network drop would."""
+        with self.clients_lock:
+            clients = list(self.clients)
+        for handler in clients:
+            try:
+                handler.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def record(self, command: str, args: str):
+        with self._commands_lock:
+            self.commands.append((command, args))
+
+    def count(self, command: str) -> int:
+        """Number of times a command (e.g. 'FETCH' or 'UID FETCH') was received."""
+        name, _, sub = command.upper().partition(' ')
+        with self._commands_lock:
+            return sum(
+                1 for c, args in self.commands
+                if c == name and (not sub or args.upper().startswith(sub + ' '))
+            )
+
+    def render_fetch_item(self, message: FakeMessage, item: str) -> bytes:
+        """Render one FETCH data item for a message."""
+        if item == 'UID':
+            return f'UID {message.uid}'.encode()
+        if item == 'FLAGS':
+            return f'FLAGS ({" ".join(message.flags)})'.encode()
+        if item == 'MODSEQ':
+            return f'MODSEQ ({message.modseq})'.encode()
+        if item == 'RFC822.SIZE':
+            return f'RFC822.SIZE {len(message.raw)}'.encode()
+        if item in ('RFC822', 'BODY[]', 'BODY.PEEK[]'):
+            name = 'RFC822' if item == 'RFC822' else 'BODY[]'
+            return f'{name} {{{len(message.raw)}}}\r\n'.encode() + message.raw
+        match = _SECTION.match(item)
+        if match:
+            section, origin, length = match.groups()
+            payload = find_section(message.parsed, section).get_payload(decode=False)
+            data = payload.encode('ascii', 'surrogateescape')
+            name = f'BODY[{section}]'
+            if origin is not None:
+                data = data[int(origin):int(origin) + int(length)]
+                name += f'<{origin}>'
+            return f'{name} {{{len(data)}}}\r\n'.encode() + data
+        if item == 'BODYSTRUCTURE':
+            return f'BODYSTRUCTURE {message.bodystructure}'.encode()
+        if item.startswith(('BODY[HEADER.FIELDS', 'BODY.PEEK[HEADER.FIELDS')):
+            section = item[item.index('['):]
+            wanted = section[section.index('(') + 1:section.index(')')].split()
+            headers = ''.join(
+                f'{name}: {value}\r\n' for name, value in message.parsed.items()
+                if name.upper() in wanted
+            ).encode() + b'\r\n'
+            return f'BODY{section} {{{len(headers)}}}\r\n'.encode() + headers
+        raise ValueError(f'Unsupported fetch item {item}')
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._server = _ThreadedServer(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def make_message(index: int, body: str = "Hello from the fake server.",
+                 sender: str = "Sender <sender@example.com>") -> bytes:
+    """Build a simple RFC822 message for tests."""
+    return (
+        f"From: {sender}\r\n"
+        f"To: test@example.com\r\n"
+        f"Subject: Message {index}\r\n"
+        f"Date: Mon, 1 Jan 2024 12:{index % 60:02d}:00 +0000\r\n"
+        f"Message-ID: <msg{index}@example.com>\r\n"
+        f"\r\n"
+        f"{body}\r\n"
+    ).encode()
+
+
+def make_message_with_attachment(index: int, attachment_size: int = 512 * 1024,
+                                 body: str = "Please find the invoice attached.") -> bytes:
+    """Build a multipart message with a text part and a PDF attachment."""
+    from email.mime.application import MIMEApplication
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
+    msg = MIMEMultipart()
+    msg['From'] = "Billing <billing@example.com>"
+    msg['To'] = "test@example.com"
+    msg['Subject'] = f"Invoice {index}"
+    msg['Date'] = f"Mon, 1 Jan 2024 12:{index % 60:02d}:00 +0000"
+    msg['Message-ID'] = f"<invoice{index}@example.com>"
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+    attachment = MIMEApplication(bytes(range(256)) * (attachment_size // 256), _subtype='pdf')
+    attachment.add_header('Content-Disposition', 'attachment', filename=f'invoice{index}.pdf')
+    msg.attach(attachment)
+    return msg.as_bytes()
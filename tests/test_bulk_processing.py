@@ -0,0 +1,91 @@
+"""
+Tests for Bulk Processing
+
+Unit tests for process-pool parsing and triage of raw messages.
+"""
+
+import json
+import mailbox
+import pytest
+from benchmarks.corpus import build_corpus
+from tests.fake_imap_server import make_message
+from utils.bulk_processing import BulkProcessor, iter_mbox, parse_raw_message
+from utils.mailbuddy_triage import TriageTask
+
+
+def _corpus():
+    return [raw for messages in build_corpus(per_kind=3).values() for raw in messages]
+
+
+class TestBulkProcessor:
+    """Test cases for BulkProcessor."""
+    
+    def test_parse_raw_message(self):
+        """Raw bytes are decoded into the usual email fields."""
+        email_data = parse_raw_message(make_message(7, body="Hello there"))
+        
+        assert email_data['subject'] == 'Message 7'
+        assert email_data['message_id'] == '<msg7@example.com>'
+        assert email_data['body'] == 'Hello there'
+    
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_matches_serial_triage_in_order(self, workers, known_contacts):
+        """Pool results equal one-by-one parsing and triage, in input order."""
+        messages = _corpus()
+        triage = TriageTask(known_contacts)
+        expected = []
+        for raw in messages:
+            email_data = parse_raw_message(raw)
+            expected.append((email_data, triage.run(email_data)))
+        
+        processor = BulkProcessor(known_contacts, workers=workers, chunk_size=2)
+        results = list(processor.process(messages))
+        
+        assert results == expected
+    
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_rules_file(self, workers, tmp_path):
+        """Workers classify with the given rule file."""
+        path = str(tmp_path / "rules.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'rules': [{'name': 'all', 'senders': ['@example.com'], 'category': 'TEST',
+                                  'action': 'Move to Test', 'folder': 'Test'}]}, f)
+        
+        processor = BulkProcessor([], workers=workers, rules_path=path)
+        results = list(processor.process([make_message(1), make_message(2)]))
+        
+        assert [(r.category, r.folder) for _, r in results] == [('TEST', 'Test')] * 2
+    
+    def test_keys_and_bad_input(self):
+        """(key, raw) pairs keep their key; unparseable input does not stop the batch."""
+        processor = BulkProcessor([], workers=1)
+        
+        results = list(processor.process([("a", make_message(1)), ("b", None), ("c", make_message(3))]))
+        
+        assert [email_data['id'] for email_data, _ in results] == ["a", "b", "c"]
+        assert 'error' in results[1][0]
+        assert results[2][0]['subject'] == 'Message 3'
+    
+    def test_mbox_source(self, tmp_path):
+        """Messages are read from an mbox file in order."""
+        path = str(tmp_path / "archive.mbox")
+        box = mailbox.mbox(path)
+        for i in range(1, 4):
+            box.add(make_message(i))
+        box.close()
+        
+        results = list(BulkProcessor([], workers=1).process(iter_mbox(path)))
+        
+        assert [email_data['subject'] for email_data, _ in results] == ['Message 1', 'Message 2', 'Message 3']
+    
+    def test_imap_source(self, fake_imap_server, fake_imap_manager):
+        """Raw messages stream from IMAP in chunks, keyed by UID."""
+        for i in range(1, 6):
+            fake_imap_server.add_message(make_message(i))
+        
+        results = list(BulkProcessor([], workers=1).process(
+            fake_imap_manager.iter_raw_messages("INBOX", chunk_size=2)
+        ))
+        
+        assert [(e['id'], e['subject']) for e, _ in results] == [(str(i), f'Message {i}') for i in range(1, 6)]
+        assert fake_imap_server.count('UID FETCH') == 3
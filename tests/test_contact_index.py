@@ -0,0 +1,66 @@
+"""
+Tests for Contact Index
+
+Unit tests for address, domain and wildcard contact lookups.
+"""
+
+import pytest
+from utils.contact_index import ContactIndex, normalize_entry
+from utils.mailbuddy_triage import TriageTask
+
+
+class TestContactIndex:
+    """Test cases for ContactIndex."""
+    
+    @pytest.mark.parametrize('entry, expected', [
+        (' Boss@Company.com ', 'boss@company.com'),
+        ('@company.com', '@company.com'),
+        ('Company.com', '@company.com'),
+        ('*.company.com', '@*.company.com'),
+        ('@*.company.com', '@*.company.com'),
+        ('company', None),
+        ('@*.', None),
+        ('not a domain', None),
+    ])
+    def test_normalize_entry(self, entry, expected):
+        """Entries are lowercased and domains get their canonical '@' form."""
+        assert normalize_entry(entry) == expected
+    
+    def test_lookups(self):
+        """Exact addresses, whole domains and subdomain wildcards."""
+        index = ContactIndex(['boss@company.com', '@partner.org', '*.corp.example', 'bogus'])
+        
+        assert 'boss@company.com' in index
+        assert 'intern@company.com' not in index
+        assert 'anyone@partner.org' in index
+        assert 'anyone@eu.partner.org' not in index
+        assert 'dev@eng.corp.example' in index
+        assert 'dev@a.b.corp.example' in index
+        assert 'dev@corp.example' not in index
+        assert 'dev@othercorp.example' not in index
+        assert 'partner.org' not in index
+        assert len(index) == 3
+        assert sorted(index) == ['@*.corp.example', '@partner.org', 'boss@company.com']
+    
+    def test_remove(self):
+        """Removing an entry keeps overlapping ones and prunes the trie."""
+        index = ContactIndex(['@corp.example', '*.corp.example', '@mail.example'])
+        
+        assert index.remove('*.corp.example')
+        assert 'a@eng.corp.example' not in index
+        assert 'a@corp.example' in index
+        assert not index.remove('*.corp.example')
+        
+        assert index.remove('@corp.example') and index.remove('@mail.example')
+        assert index._root.children == {}
+        assert len(index) == 0
+    
+    def test_triage_uses_domains(self):
+        """One domain entry makes every colleague a known contact in triage."""
+        triage = TriageTask(['@company.com'])
+        email = {'subject': 'Lunch?', 'sender': 'New Hire <new.hire@company.com>', 'body': ''}
+        
+        assert triage._is_from_known_contact(email['sender'])
+        assert triage.run(email).category == "IMPORTANT"
+        assert TriageTask(['@company.com']).rules_version == triage.rules_version
+        assert TriageTask(['@*.company.com']).rules_version != triage.rules_version
@@ -0,0 +1,137 @@
+"""
+Tests for Contact Store
+
+Unit tests for the SQLite-backed known contacts store.
+"""
+
+import json
+import os
+import threading
+import time
+import pytest
+
+from utils.contact_store import ContactStore
+
+
+@pytest.fixture
+def store():
+    """In-memory contact store."""
+    store = ContactStore(":memory:")
+    yield store
+    store.close()
+
+
+class TestContactStore:
+    """Test cases for ContactStore."""
+    
+    def test_add_remove_lookup(self, store):
+        """Single entries are normalized, added once and removed."""
+        assert store.add(" Boss@Company.com ")
+        assert not store.add("boss@company.com")
+        
+        assert "BOSS@company.com" in store
+        assert len(store) == 1
+        
+        assert store.remove("boss@company.com")
+        assert not store.remove("boss@company.com")
+        assert "boss@company.com" not in store
+    
+    def test_replace_and_all(self, store):
+        """replace() swaps the whole list; all() is sorted and deduplicated."""
+        store.add("old@example.com")
+        
+        store.replace(["b@example.com", "@a.org", "B@example.com", " "])
+        
+        assert store.all() == ["@a.org", "b@example.com"]
+    
+    def test_revision_changes_on_writes(self, tmp_path):
+        """The revision moves with writes from this and other connections, not with no-ops."""
+        path = str(tmp_path / "contacts.sqlite3")
+        store = ContactStore(path)
+        revision = store.revision()
+        
+        store.add("a@example.com")
+        assert store.revision() != revision
+        revision = store.revision()
+        store.add("a@example.com")
+        assert store.revision() == revision
+        
+        other = ContactStore(path)
+        other.add("b@example.com")
+        assert store.revision() != revision
+        assert store.all() == ["a@example.com", "b@example.com"]
+        other.close()
+        store.close()
+    
+    def test_migration(self, tmp_path):
+        """A JSON contacts file is imported once, on creation."""
+        json_path = tmp_path / "known_contacts.json"
+        json_path.write_text(json.dumps({"known_contacts": ["A@example.com", "@b.org"]}))
+        path = str(tmp_path / "contacts.sqlite3")
+        
+        store = ContactStore(path, migrate_from=str(json_path))
+        assert store.all() == ["@b.org", "a@example.com"]
+        store.remove("a@example.com")
+        store.close()
+        
+        store = ContactStore(path, migrate_from=str(json_path))
+        assert store.all() == ["@b.org"]
+        store.close()
+    
+    def test_unreadable_json_retried(self, tmp_path):
+        """A corrupt JSON file is not marked as migrated."""
+        json_path = tmp_path / "known_contacts.json"
+        json_path.write_text("{not json")
+        path = str(tmp_path / "contacts.sqlite3")
+        
+        ContactStore(path, migrate_from=str(json_path)).close()
+        json_path.write_text(json.dumps({"known_contacts": ["a@example.com"]}))
+        store = ContactStore(path, migrate_from=str(json_path))
+        
+        assert store.all() == ["a@example.com"]
+        store.close()
+    
+    def test_concurrent_adds(self, store):
+        """Adds from several threads all land."""
+        def worker(n):
+            for i in range(200):
+                store.add(f"user{n}.{i}@example.com")
+        
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(store) == 800
+    
+    def test_bulk_import_speed(self, tmp_path):
+        """100k contacts import in one transaction within seconds."""
+        store = ContactStore(str(tmp_path / "contacts.sqlite3"))
+        entries = [f"user{i}@example{i % 500}.com" for i in range(100000)]
+        
+        start = time.perf_counter()
+        added = store.add_many(entries)
+        
+        assert time.perf_counter() - start < 5.0
+        assert added == 100000 and len(store) == 100000
+        store.close()
+    
+    def test_json_edits_merged(self, tmp_path):
+        """Edits to the JSON file after the first import are merged in, keeping app changes."""
+        json_path = tmp_path / "known_contacts.json"
+        store = ContactStore(str(tmp_path / "contacts.sqlite3"), migrate_from=str(json_path))
+        assert store.all() == []
+        store.add("app@example.com")
+        
+        # e.g. setup copying the example file after the first run
+        json_path.write_text(json.dumps({"known_contacts": ["Boss@Company.com"]}))
+        assert store.sync_json() == 1
+        assert store.all() == ["app@example.com", "boss@company.com"]
+        assert store.sync_json() == 0
+        
+        store.remove("boss@company.com")
+        json_path.write_text(json.dumps({"known_contacts": ["boss@company.com", "new@example.com"]}))
+        os.utime(json_path, ns=(0, os.stat(json_path).st_mtime_ns + 10 ** 9))
+        assert store.sync_json() == 2
+        store.close()
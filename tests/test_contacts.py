@@ -0,0 +1,111 @@
+"""
+Tests for Contacts
+
+Unit tests for the known contacts functions and their in-process cache.
+"""
+
+import json
+import os
+import pytest
+from unittest.mock import patch
+
+from utils import contacts
+from utils.contact_store import ContactStore
+from utils.contacts import (add_contact, get_contact_index, get_contact_store, get_known_contacts,
+                            import_contacts, load_contacts, remove_contact, save_contacts)
+
+
+@pytest.fixture
+def contacts_file(tmp_path):
+    """Point the contacts module at a temporary data directory with a fresh cache."""
+    path = str(tmp_path / "data" / "known_contacts.json")
+    with patch('utils.contacts.get_contacts_file_path', return_value=path), \
+            patch('utils.contacts._cache', contacts._ContactsCache()):
+        yield path
+
+
+def _write(path, entries):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"known_contacts": entries}, f)
+
+
+class TestContacts:
+    """Test cases for the contacts store."""
+    
+    def test_missing_file_starts_empty(self, contacts_file):
+        """Without a JSON file to migrate, the store starts empty."""
+        assert load_contacts() == []
+        assert os.path.exists(get_contact_store().path)
+    
+    def test_add_and_remove(self, contacts_file):
+        """Entries are normalized, saved and removed."""
+        assert add_contact(" Boss@Company.com ")
+        assert add_contact("@partner.org")
+        
+        assert load_contacts() == ["@partner.org", "boss@company.com"]
+        assert "boss@company.com" in get_contact_index()
+        
+        assert remove_contact("boss@company.com")
+        assert load_contacts() == ["@partner.org"]
+    
+    def test_unchanged_store_not_reread(self, contacts_file):
+        """While the store is unchanged, the same frozenset and index are returned without reading."""
+        save_contacts(["a@example.com"])
+        first = get_known_contacts()
+        index = get_contact_index()
+        
+        with patch.object(ContactStore, 'all', side_effect=AssertionError("store re-read")):
+            assert get_known_contacts() is first
+            assert get_contact_index() is index
+        assert isinstance(first, frozenset)
+    
+    def test_reload_on_change(self, contacts_file):
+        """Changes through this process or another connection are picked up on the next call."""
+        save_contacts(["a@example.com"])
+        index = get_contact_index()
+        
+        add_contact("b@example.com")
+        assert get_known_contacts() == {"a@example.com", "b@example.com"}
+        assert get_contact_index() is not index
+        
+        # e.g. another MailBuddy process
+        other = ContactStore(get_contact_store().path)
+        other.remove("a@example.com")
+        other.close()
+        assert get_known_contacts() == {"b@example.com"}
+    
+    def test_migrates_json_once(self, contacts_file):
+        """The JSON contacts file is imported when the store is first created, and only then."""
+        os.makedirs(os.path.dirname(contacts_file))
+        _write(contacts_file, ["Boss@Company.com", "@partner.org"])
+        
+        assert load_contacts() == ["@partner.org", "boss@company.com"]
+        remove_contact("boss@company.com")
+        
+        with patch('utils.contacts._cache', contacts._ContactsCache()):
+            assert load_contacts() == ["@partner.org"]
+    
+    def test_json_edits_picked_up(self, contacts_file):
+        """Editing known_contacts.json while running merges its entries on the next read."""
+        assert load_contacts() == []
+        
+        os.makedirs(os.path.dirname(contacts_file), exist_ok=True)
+        _write(contacts_file, ["boss@company.com"])
+        
+        assert load_contacts() == ["boss@company.com"]
+    
+    def test_import_contacts(self, contacts_file):
+        """Bulk import adds only new entries."""
+        add_contact("a@example.com")
+        
+        assert import_contacts(["A@example.com", "b@example.com", "c@example.com", ""]) == 2
+        assert len(get_known_contacts()) == 3
+    
+    def test_digest_follows_contents(self, contacts_file):
+        """The index digest changes with the contacts, so cached triage results are invalidated."""
+        save_contacts(["a@example.com"])
+        digest = get_contact_index().digest
+        
+        add_contact("b@example.com")
+        
+        assert get_contact_index().digest != digest
@@ -5,8 +5,10 @@ Unit tests for IMAP folder management functionality.
 """
 
 import pytest
+import random
 from unittest.mock import Mock, patch, MagicMock
 from utils.email_folder_manager import EmailFolderManager
+from utils.mailbuddy_triage import EmailTriageResult
 
 
 class TestEmailFolderManager:
@@ -69,11 +71,12 @@ class TestEmailFolderManager:
         manager = EmailFolderManager("test@gmail.com", "password")
         manager.connect()
         
-        result = manager.ensure_folders_exist()
+        result = manager.ensure_folders_exist(["Bills"])
         
         assert result is True
-        # Should attempt to create folders
+        # Should attempt to create folders, including those from triage rules
         assert mock_imap_connection.create.call_count > 0
+        mock_imap_connection.create.assert_any_call("Bills")
     
     def test_get_folder_for_category(self):
         """Test category to folder mapping."""
@@ -87,6 +90,16 @@ class TestEmailFolderManager:
         assert manager.get_folder_for_category("OTHER") == "Archive"
         assert manager.get_folder_for_category("UNKNOWN") == "Archive"
     
+    def test_get_folder_for_result(self):
+        """A folder set by the triage rule wins over the category default."""
+        manager = EmailFolderManager("test@gmail.com", "password")
+        
+        ruled = EmailTriageResult(category="OTP_RECEIPT", action="Move", justification="", folder="Bills")
+        plain = EmailTriageResult(category="OTP_RECEIPT", action="Move", justification="")
+        
+        assert manager.get_folder_for_result(ruled) == "Bills"
+        assert manager.get_folder_for_result(plain) == "Receipts"
+    
     def test_decode_mime_header(self):
         """Test MIME header decoding."""
         manager = EmailFolderManager("test@gmail.com", "password")
@@ -105,10 +118,10 @@ class TestEmailFolderManager:
     
     @patch('utils.email_folder_manager.imaplib.IMAP4_SSL')
     def test_move_email(self, mock_imap_ssl, mock_imap_connection):
-        """Test moving email between folders."""
+        """Test moving email between folders by UID."""
         mock_imap_ssl.return_value = mock_imap_connection
-        mock_imap_connection.copy.return_value = ('OK', [b'Copied'])
-        mock_imap_connection.store.return_value = ('OK', [b'Stored'])
+        mock_imap_connection.capability.return_value = ('OK', [b'IMAP4rev1'])
+        mock_imap_connection.uid.return_value = ('OK', [None])
         
         manager = EmailFolderManager("test@gmail.com", "password")
         manager.connect()
@@ -117,6 +130,409 @@ class TestEmailFolderManager:
         
         assert result is True
         mock_imap_connection.select.assert_called_with("INBOX")
-        mock_imap_connection.copy.assert_called_with("1", "Urgent")
-        mock_imap_connection.store.assert_called_with("1", '+FLAGS', '\\Deleted')
+        mock_imap_connection.uid.assert_any_call('COPY', '1', 'Urgent')
+        mock_imap_connection.uid.assert_any_call('STORE', '1', '+FLAGS.SILENT', '(\\Deleted)')
         mock_imap_connection.expunge.assert_called_once()
+
+
+class TestBatchedFetch:
+    """Batched FETCH against the fake IMAP server."""
+    
+    def test_fetch_recent_emails_single_fetch(self, fake_imap_server, fake_imap_manager):
+        """All messages are retrieved with one FETCH command."""
+        from tests.fake_imap_server import make_message
+        for i in range(1, 21):
+            fake_imap_server.add_message(make_message(i, body=f"Body {i}"))
+        
+        emails = fake_imap_manager.fetch_recent_emails("INBOX", limit=10)
+        
+        assert fake_imap_server.count('UID FETCH') == 1
+        assert [e['id'] for e in emails] == [str(i) for i in range(20, 10, -1)]
+        assert emails[0] == {
+            'id': '20',
+            'subject': 'Message 20',
+            'sender': 'Sender <sender@example.com>',
+            'date': 'Mon, 1 Jan 2024 12:20:00 +0000',
+            'body': 'Body 20',
+            'message_id': '<msg20@example.com>',
+            'uid': '20',
+            'uidvalidity': 1,
+            'flags': [],
+            'headers': {},
+            'folder': 'INBOX'
+        }
+    
+    def test_search_emails_single_fetch(self, fake_imap_server, fake_imap_manager):
+        """search_emails uses one FETCH command, for headers only."""
+        from tests.fake_imap_server import make_message
+        for i in range(1, 6):
+            fake_imap_server.add_message(make_message(i))
+        
+        results = fake_imap_manager.search_emails("INBOX", limit=3)
+        
+        assert fake_imap_server.count('UID FETCH') == 1
+        fetch = next(args for command, args in fake_imap_server.commands if args.startswith('FETCH '))
+        assert 'HEADER.FIELDS' in fetch and 'BODY.PEEK[]' not in fetch
+        assert results == [
+            ('5', 'Message 5', 'Sender <sender@example.com>'),
+            ('4', 'Message 4', 'Sender <sender@example.com>'),
+            ('3', 'Message 3', 'Sender <sender@example.com>'),
+        ]
+    
+    def test_fetch_recent_emails_empty_folder(self, fake_imap_server, fake_imap_manager):
+        """An empty folder returns no emails and issues no FETCH."""
+        assert fake_imap_manager.fetch_recent_emails("INBOX") == []
+        assert fake_imap_server.count('UID FETCH') == 0
+    
+    
+    def test_ids_are_uids(self, fake_imap_server, fake_imap_manager):
+        """'id' is the UID, not the sequence number."""
+        from tests.fake_imap_server import make_message
+        for i in range(1, 4):
+            fake_imap_server.add_message(make_message(i))
+        del fake_imap_server.mailbox("INBOX").messages[0]
+        
+        emails = fake_imap_manager.fetch_recent_emails("INBOX")
+        
+        assert [(e['id'], e['subject']) for e in emails] == [('3', 'Message 3'), ('2', 'Message 2')]
+    
+    def test_stale_list_moves_right_message(self, fake_imap_server, fake_imap_manager):
+        """Moving from a list fetched before earlier moves still hits the intended messages."""
+        from tests.fake_imap_server import make_message
+        for i in range(1, 6):
+            fake_imap_server.add_message(make_message(i))
+        fake_imap_server.mailbox("Archive")
+        
+        emails = fake_imap_manager.fetch_recent_emails("INBOX")
+        by_subject = {e['subject']: e['id'] for e in emails}
+        assert fake_imap_manager.move_email(by_subject['Message 1'], "INBOX", "Archive")
+        assert fake_imap_manager.move_email(by_subject['Message 4'], "INBOX", "Archive")
+        
+        archived = [m.parsed['Subject'] for m in fake_imap_server.mailbox("Archive").messages]
+        assert archived == ['Message 1', 'Message 4']
+        assert fake_imap_manager.load_email_body("INBOX", by_subject['Message 5']) == \
+            "Hello from the fake server."
+
+
+class TestHeaderOnlyFetch:
+    """Header-only fetches with lazily loaded bodies."""
+    
+    def test_headers_only_skips_body(self, fake_imap_server, fake_imap_manager):
+        """Records carry headers, size and attachment flag but no body yet."""
+        from tests.fake_imap_server import make_message_with_attachment
+        for i in range(1, 4):
+            fake_imap_server.add_message(make_message_with_attachment(i))
+        
+        emails = fake_imap_manager.fetch_recent_emails("INBOX", limit=3, headers_only=True)
+        
+        assert [e['subject'] for e in emails] == ['Invoice 3', 'Invoice 2', 'Invoice 1']
+        assert emails[0]['sender'] == 'Billing <billing@example.com>'
+        assert emails[0]['message_id'] == '<invoice3@example.com>'
+        assert emails[0]['has_attachments'] is True
+        assert emails[0]['size'] > 512 * 1024
+        assert not emails[0].body_loaded
+        assert fake_imap_server.bytes_sent < 64 * 1024
+    
+    def test_body_loaded_on_first_access(self, fake_imap_server, fake_imap_manager):
+        """Reading 'body' fetches it once and caches it on the record."""
+        from tests.fake_imap_server import make_message_with_attachment
+        fake_imap_server.add_message(make_message_with_attachment(1, body="Invoice body text"))
+        
+        email_data = fake_imap_manager.fetch_recent_emails("INBOX", headers_only=True)[0]
+        assert fake_imap_server.count('UID FETCH') == 1
+        
+        assert email_data.get('body') == "Invoice body text"
+        assert email_data['body'] == "Invoice body text"
+        assert 'body' in email_data
+        assert fake_imap_server.count('UID FETCH') == 2
+    
+    def test_full_fetch_unchanged(self, fake_imap_server, fake_imap_manager):
+        """Default fetches return records with their bodies already loaded."""
+        from tests.fake_imap_server import make_message_with_attachment
+        fake_imap_server.add_message(make_message_with_attachment(1, body="Invoice body text"))
+        
+        email_data = fake_imap_manager.fetch_recent_emails("INBOX")[0]
+        
+        assert email_data.body_loaded
+        assert email_data['body'] == "Invoice body text"
+    
+    def test_body_fetch_skips_attachment(self, fake_imap_server, fake_imap_manager):
+        """Only the text part is downloaded, located via BODYSTRUCTURE."""
+        from tests.fake_imap_server import make_message_with_attachment
+        uid = fake_imap_server.add_message(make_message_with_attachment(1, body="Invoice body text"))
+        
+        body = fake_imap_manager.load_email_body("INBOX", str(uid))
+        
+        assert body == "Invoice body text"
+        fetches = [args for command, args in fake_imap_server.commands if args.startswith('FETCH ')]
+        assert fetches == [f'FETCH {uid} (UID BODYSTRUCTURE)', f'FETCH {uid} (UID BODY.PEEK[1])']
+        assert fake_imap_server.bytes_sent < 8 * 1024
+    
+    def test_body_partial_fetch(self, fake_imap_server, fake_imap_manager):
+        """A byte cap turns the section fetch into a partial fetch."""
+        from tests.fake_imap_server import make_message_with_attachment
+        text = "Line of invoice text. " * 200
+        fake_imap_server.add_message(make_message_with_attachment(1, body=text))
+        fake_imap_manager.body_max_bytes = 100
+        
+        email_data = fake_imap_manager.fetch_recent_emails("INBOX", headers_only=True)[0]
+        
+        assert 0 < len(email_data['body']) <= 100
+        assert text.startswith(email_data['body'])
+        assert fake_imap_server.commands[-1][1].endswith('BODY.PEEK[1]<0.100>)')
+    
+    def test_truncated_body_not_cached(self, fake_imap_server, fake_imap_manager):
+        """Bodies cut short by the byte cap are not cached; whole ones are."""
+        from tests.fake_imap_server import make_message_with_attachment
+        from utils.message_cache import MessageCache
+        fake_imap_server.add_message(make_message_with_attachment(1, body="Line of invoice text. " * 200))
+        fake_imap_server.add_message(make_message_with_attachment(2, body="Short invoice text"))
+        fake_imap_manager.cache = MessageCache(":memory:")
+        fake_imap_manager.body_max_bytes = 100
+        
+        for email_data in fake_imap_manager.fetch_recent_emails("INBOX", headers_only=True):
+            email_data.get('body')
+        
+        cached = fake_imap_manager.cache.get_many(fake_imap_manager.cache_account, "INBOX", 1, [1, 2])
+        assert cached[1]['body'] is None
+        assert cached[2]['body'] == "Short invoice text"
+    
+    def test_header_triage_skips_bulk_bodies(self, fake_imap_server, fake_imap_manager, header_first_rules):
+        """Bulk mail is triaged from signal headers; only other bodies are downloaded."""
+        from benchmarks.corpus import newsletter, personal
+        from utils.mailbuddy_triage import TriageTask
+        rng = random.Random(1)
+        fake_imap_server.add_message(newsletter(1, rng))
+        fake_imap_server.add_message(personal(2, rng))
+        
+        emails = list(fake_imap_manager.iter_emails("INBOX", headers_only=True))
+        triage = TriageTask([], rules=header_first_rules)
+        results = [result for _, result in triage.run_stream(emails)]
+        
+        assert emails[1]['headers']['list-id'] == 'Weekly Digest <digest.lists.example.org>'
+        assert results[1].category == 'NEWSLETTER'
+        assert emails[0].body_loaded and not emails[1].body_loaded
+        assert triage.header_decisions == 1 and triage.body_decisions == 1
+    
+    def test_html_fallback(self, fake_imap_server, fake_imap_manager):
+        """Messages without a text/plain part fall back to the HTML part."""
+        from email.mime.image import MIMEImage
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        msg = MIMEMultipart()
+        msg['Subject'] = "Newsletter"
+        msg.attach(MIMEText("<html><body><p>Big &amp; bold news</p></body></html>", 'html'))
+        msg.attach(MIMEImage(b'\x89PNG' + b'\0' * 4096, _subtype='png'))
+        uid = fake_imap_server.add_message(msg.as_bytes())
+        
+        assert fake_imap_manager.load_email_body("INBOX", str(uid)) == "Big & bold news"
+        assert fake_imap_manager.fetch_recent_emails("INBOX")[0]['body'] == "Big & bold news"
+
+
+class TestMoveMany:
+    """Bulk moves by UID against the fake IMAP server."""
+    
+    @staticmethod
+    def _setup(server):
+        from tests.fake_imap_server import make_message
+        for i in range(1, 6):
+            server.add_message(make_message(i))
+        server.mailbox("Urgent")
+        server.mailbox("Archive")
+    
+    @staticmethod
+    def _uid_commands(server, name):
+        return [args for command, args in server.commands
+                if command == 'UID' and args.upper().startswith(name)]
+    
+    @staticmethod
+    def _subjects(server, folder):
+        return [m.parsed['Subject'] for m in server.mailbox(folder).messages]
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1', 'MOVE']], indirect=True)
+    def test_uid_move_per_destination(self, fake_imap_server, fake_imap_manager):
+        """With MOVE, each destination costs exactly one UID MOVE."""
+        self._setup(fake_imap_server)
+        
+        results = fake_imap_manager.move_many(
+            [1, 2, 4, 5], "INBOX", {1: "Urgent", 2: "Archive", 4: "Urgent", 5: "Archive"}
+        )
+        
+        assert results == {"Urgent": True, "Archive": True}
+        assert self._uid_commands(fake_imap_server, 'MOVE') == ['MOVE 1,4 Urgent', 'MOVE 2,5 Archive']
+        assert fake_imap_server.count('EXPUNGE') == 0
+        assert self._subjects(fake_imap_server, "INBOX") == ['Message 3']
+        assert self._subjects(fake_imap_server, "Urgent") == ['Message 1', 'Message 4']
+        assert self._subjects(fake_imap_server, "Archive") == ['Message 2', 'Message 5']
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1', 'UIDPLUS']], indirect=True)
+    def test_copy_fallback_with_uidplus(self, fake_imap_server, fake_imap_manager):
+        """Without MOVE, copies and flags per destination, then one UID EXPUNGE."""
+        self._setup(fake_imap_server)
+        fake_imap_server.mailbox("INBOX").messages[2].flags.append('\\Deleted')
+        
+        results = fake_imap_manager.move_many([1, 2], "INBOX", "Urgent")
+        
+        assert results == {"Urgent": True}
+        assert len(self._uid_commands(fake_imap_server, 'COPY')) == 1
+        assert len(self._uid_commands(fake_imap_server, 'STORE')) == 1
+        assert self._uid_commands(fake_imap_server, 'EXPUNGE') == ['EXPUNGE 1:2']
+        # Messages deleted by someone else are left alone
+        assert self._subjects(fake_imap_server, "INBOX") == ['Message 3', 'Message 4', 'Message 5']
+        assert self._subjects(fake_imap_server, "Urgent") == ['Message 1', 'Message 2']
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1']], indirect=True)
+    def test_copy_fallback_single_expunge(self, fake_imap_server, fake_imap_manager):
+        """Without UIDPLUS, all destinations share one EXPUNGE."""
+        self._setup(fake_imap_server)
+        
+        results = fake_imap_manager.move_many([1, 3, 5], "INBOX", {1: "Urgent", 3: "Archive", 5: "Archive"})
+        
+        assert results == {"Urgent": True, "Archive": True}
+        assert fake_imap_server.count('EXPUNGE') == 1
+        assert self._subjects(fake_imap_server, "INBOX") == ['Message 2', 'Message 4']
+        assert self._subjects(fake_imap_server, "Archive") == ['Message 3', 'Message 5']
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1', 'MOVE']], indirect=True)
+    def test_uids_stay_valid_across_moves(self, fake_imap_server, fake_imap_manager):
+        """Later moves from the same list still hit the right messages."""
+        self._setup(fake_imap_server)
+        
+        assert fake_imap_manager.move_many([1], "INBOX", "Urgent") == {"Urgent": True}
+        assert fake_imap_manager.move_many([5], "INBOX", "Archive") == {"Archive": True}
+        
+        assert self._subjects(fake_imap_server, "Urgent") == ['Message 1']
+        assert self._subjects(fake_imap_server, "Archive") == ['Message 5']
+    
+    def test_missing_destination_reported(self, fake_imap_server, fake_imap_manager):
+        """A failed destination is reported without affecting the others."""
+        self._setup(fake_imap_server)
+        
+        results = fake_imap_manager.move_many([1, 2], "INBOX", {1: "Urgent", 2: "Nowhere"})
+        
+        assert results == {"Urgent": True, "Nowhere": False}
+        assert self._subjects(fake_imap_server, "INBOX") == ['Message 2', 'Message 3', 'Message 4', 'Message 5']
+
+
+class TestRefreshFolder:
+    """Flag and expunge resynchronisation with and without CONDSTORE/QRESYNC."""
+    
+    @staticmethod
+    def _setup(server, manager):
+        from tests.fake_imap_server import make_message
+        from utils.message_cache import MessageCache
+        for i in range(1, 6):
+            server.add_message(make_message(i))
+        manager.cache = MessageCache(":memory:")
+        manager.fetch_recent_emails("INBOX")
+    
+    @pytest.mark.parametrize('fake_imap_server', [
+        ['IMAP4rev1', 'ENABLE', 'CONDSTORE', 'QRESYNC'],
+        ['IMAP4rev1', 'ENABLE', 'CONDSTORE'],
+        ['IMAP4rev1'],
+    ], indirect=True)
+    def test_reports_flag_changes_and_expunges(self, fake_imap_server, fake_imap_manager):
+        """Changed flags and expunged UIDs reach the caller and the cache."""
+        self._setup(fake_imap_server, fake_imap_manager)
+        first = fake_imap_manager.refresh_folder("INBOX")
+        assert first.full
+        
+        inbox = fake_imap_server.mailbox("INBOX")
+        inbox.set_flags(2, ['\\Seen'])
+        inbox.remove(3)  # UID 4
+        changes = fake_imap_manager.refresh_folder("INBOX")
+        
+        assert not changes.full
+        assert changes.flags[2] == ['\\Seen']
+        assert changes.vanished == [4]
+        if 'CONDSTORE' in fake_imap_server.capabilities:
+            assert list(changes.flags) == [2]
+        cached = fake_imap_manager.cache.get_many(fake_imap_manager.cache_account, "INBOX", 1, range(1, 6))
+        assert sorted(cached) == [1, 2, 3, 5]
+        assert cached[2]['flags'] == ['\\Seen']
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1', 'ENABLE', 'CONDSTORE', 'QRESYNC']], indirect=True)
+    def test_qresync_needs_only_examine(self, fake_imap_server, fake_imap_manager):
+        """With QRESYNC the changes arrive with the EXAMINE response."""
+        self._setup(fake_imap_server, fake_imap_manager)
+        fake_imap_manager.refresh_folder("INBOX")
+        fake_imap_server.mailbox("INBOX").set_flags(1, ['\\Flagged'])
+        fake_imap_server.commands.clear()
+        
+        changes = fake_imap_manager.refresh_folder("INBOX")
+        
+        assert changes.flags == {1: ['\\Flagged']}
+        assert [command for command, _ in fake_imap_server.commands] == ['EXAMINE']
+        assert 'QRESYNC' in fake_imap_server.commands[0][1]
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1', 'ENABLE', 'CONDSTORE']], indirect=True)
+    def test_unchanged_modseq_is_one_command(self, fake_imap_server, fake_imap_manager):
+        """An unchanged HIGHESTMODSEQ means nothing to fetch."""
+        self._setup(fake_imap_server, fake_imap_manager)
+        fake_imap_manager.refresh_folder("INBOX")
+        fake_imap_server.commands.clear()
+        
+        changes = fake_imap_manager.refresh_folder("INBOX")
+        
+        assert changes.is_empty()
+        assert [command for command, _ in fake_imap_server.commands] == ['EXAMINE']
+        state = fake_imap_manager.cache.get_folder_state(fake_imap_manager.cache_account, "INBOX")
+        assert state == (1, fake_imap_server.mailbox("INBOX").highestmodseq)
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1', 'ENABLE', 'CONDSTORE', 'QRESYNC']], indirect=True)
+    def test_uidvalidity_change_resyncs_fully(self, fake_imap_server, fake_imap_manager):
+        """A new UIDVALIDITY discards the cached folder and reports everything."""
+        self._setup(fake_imap_server, fake_imap_manager)
+        fake_imap_manager.refresh_folder("INBOX")
+        fake_imap_server.mailbox("INBOX").uidvalidity = 2
+        fake_imap_server.drop_connections()
+        
+        changes = fake_imap_manager.refresh_folder("INBOX")
+        
+        assert changes.full
+        assert changes.uidvalidity == 2
+        assert sorted(changes.flags) == [1, 2, 3, 4, 5]
+        assert fake_imap_manager.cache.get_many(fake_imap_manager.cache_account, "INBOX", 1, [1]) == {}
+
+
+class TestIterEmails:
+    """Streaming a folder in bounded chunks."""
+    
+    @staticmethod
+    def _fill(server, count):
+        from tests.fake_imap_server import make_message
+        for i in range(1, count + 1):
+            server.add_message(make_message(i))
+    
+    def test_yields_every_message_in_chunks(self, fake_imap_server, fake_imap_manager):
+        """Each chunk is one UID FETCH; all messages arrive newest first."""
+        self._fill(fake_imap_server, 25)
+        
+        emails = list(fake_imap_manager.iter_emails("INBOX", chunk_size=10))
+        
+        assert [e['uid'] for e in emails] == [str(uid) for uid in range(25, 0, -1)]
+        assert fake_imap_server.count('UID FETCH') == 3
+    
+    def test_fetches_lazily(self, fake_imap_server, fake_imap_manager):
+        """Nothing beyond the chunks actually consumed is downloaded."""
+        import itertools
+        self._fill(fake_imap_server, 25)
+        
+        first = list(itertools.islice(
+            fake_imap_manager.iter_emails("INBOX", chunk_size=10, newest_first=False), 3
+        ))
+        
+        assert [e['subject'] for e in first] == ['Message 1', 'Message 2', 'Message 3']
+        assert fake_imap_server.count('UID FETCH') == 1
+    
+    def test_stops_on_uidvalidity_change(self, fake_imap_server, fake_imap_manager):
+        """Remaining UIDs are not fetched once they may name other messages."""
+        self._fill(fake_imap_server, 6)
+        stream = fake_imap_manager.iter_emails("INBOX", chunk_size=3)
+        assert next(stream)['uid'] == '6'
+        
+        fake_imap_server.mailbox("INBOX").uidvalidity = 2
+        fake_imap_server.drop_connections()
+        
+        assert len(list(stream)) == 2
+        assert fake_imap_server.count('UID FETCH') == 1
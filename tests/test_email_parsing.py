@@ -0,0 +1,70 @@
+"""
+Tests for Email Parsing
+
+Unit tests for the header-only and full message parsers.
+"""
+
+import pytest
+from benchmarks.corpus import KINDS, build_corpus
+from utils.email_parsing import (
+    decode_body_part, header_block, html_to_text, parse_headers, parse_message
+)
+
+
+class TestParseHeaders:
+    """Test cases for header-only parsing."""
+    
+    @pytest.mark.parametrize('kind', sorted(KINDS))
+    def test_matches_full_parse(self, kind):
+        """Header values are identical to those of a full parse."""
+        for raw in build_corpus(per_kind=2)[kind]:
+            assert parse_headers(raw).items() == parse_message(raw).items()
+    
+    def test_body_not_parsed(self):
+        """A multipart message is not split into parts."""
+        raw = build_corpus(per_kind=1)['receipt'][0]
+        
+        msg = parse_headers(raw)
+        
+        assert msg.get_content_type() == 'multipart/mixed'
+        assert not msg.get_payload()
+    
+    def test_header_block_line_endings(self):
+        """Both CRLF and bare LF header terminators are found."""
+        assert header_block(b"Subject: a\r\n\r\nbody\n\nmore") == b"Subject: a\r\n\r\n"
+        assert header_block(b"Subject: a\n\nbody\r\n\r\nmore") == b"Subject: a\n\n"
+        assert header_block(b"Subject: a\r\n") == b"Subject: a\r\n"
+    
+    def test_folded_and_encoded_headers(self):
+        """Folded headers keep their continuation lines."""
+        raw = b"Subject: =?utf-8?q?Caf=C3=A9?=\r\n menu\r\nFrom: a@example.com\r\n\r\nbody"
+        
+        msg = parse_headers(raw)
+        
+        assert msg['Subject'] == "=?utf-8?q?Caf=C3=A9?=\r\n menu"
+        assert msg['From'] == "a@example.com"
+
+
+class TestDecodeBodyPart:
+    """Test cases for decoding separately fetched body sections."""
+    
+    def test_truncated_base64(self):
+        """A partial fetch cut mid-quad and mid-character still decodes."""
+        import base64
+        encoded = base64.encodebytes("Grüße aus Köln. ".encode('utf-8') * 20)
+        
+        text = decode_body_part(encoded[:45], 'base64', 'utf-8')
+        
+        assert text.startswith("Grüße aus Köln.")
+    
+    def test_quoted_printable_and_charset(self):
+        """Quoted-printable data is decoded with the part's charset."""
+        assert decode_body_part(b'Caf=E9 cr=E8me', 'quoted-printable', 'iso-8859-1') == "Café crème"
+        assert decode_body_part(b'plain', '7bit', 'x-unknown') == "plain"
+    
+    def test_html_to_text(self):
+        """Tags, styles and entities are removed from HTML bodies."""
+        markup = "<html><style>p {color: red}</style><p>Sale &amp; more</p><br>Shop now</html>"
+        
+        assert html_to_text(markup) == "Sale & more\n\nShop now"
+
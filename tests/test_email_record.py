@@ -0,0 +1,100 @@
+"""
+Tests for Email Records
+
+Unit tests for the compact __slots__ email record.
+"""
+
+import pickle
+import tracemalloc
+import pytest
+from utils.email_record import EmailRecord
+
+
+def _fields(i):
+    # Build fresh string objects, as parsing each message would
+    return {
+        'subject': f"Subject {i}",
+        'sender': "".join(["Sender ", "<sender@example.com>"]),
+        'date': f"Mon, 1 Jan 2024 12:{i % 60:02d}:00 +0000",
+        'message_id': f"<msg{i}@example.com>",
+        'flags': ["".join(["\\", "Seen"])],
+    }
+
+
+class TestEmailRecord:
+    """Test cases for EmailRecord."""
+    
+    def test_mapping_access(self):
+        """Records read like the email dictionaries they replace."""
+        record = EmailRecord("7", uidvalidity=3, folder="INBOX", body="Hi", **_fields(7))
+        
+        assert record['id'] == record['uid'] == "7"
+        assert record.get('subject') == "Subject 7"
+        assert record['flags'] == ['\\Seen']
+        assert 'body' in record and 'folder' in record
+        assert 'size' not in record and record.get('size', 0) == 0
+        with pytest.raises(KeyError):
+            record['unknown']
+        assert record == dict(record.items())
+        assert record.to_dict()['body'] == "Hi"
+    
+    def test_lazy_body_loaded_once(self):
+        """The body loader runs on first access only."""
+        calls = []
+        record = EmailRecord("1", body_loader=lambda: calls.append(1) or "Loaded")
+        
+        assert not record.body_loaded
+        assert 'body' not in record.to_dict(load_body=False)
+        assert record.get('body') == "Loaded"
+        assert record['body'] == "Loaded"
+        assert calls == [1]
+    
+    def test_failed_load_retries(self):
+        """A failed load leaves the loader in place for a later access."""
+        attempts = []
+        
+        def loader():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("connection lost")
+            return "Second time lucky"
+        
+        record = EmailRecord("1", body_loader=loader)
+        
+        assert record.body == ""
+        assert record.body == "Second time lucky"
+    
+    def test_interned_strings(self):
+        """Equal senders, folders and flags share one string object."""
+        first = EmailRecord("1", folder="".join(["IN", "BOX"]), **_fields(1))
+        second = EmailRecord("2", folder="".join(["IN", "BOX"]), **_fields(2))
+        
+        assert first.sender is second.sender
+        assert first.folder is second.folder
+        assert first.flags[0] is second.flags[0]
+    
+    def test_pickle_drops_loader(self):
+        """Records pickle (e.g. to worker processes) without their body loader."""
+        record = EmailRecord("1", body_loader=lambda: "Loaded", **_fields(1))
+        
+        restored = pickle.loads(pickle.dumps(record))
+        
+        assert restored.subject == "Subject 1"
+        assert restored.body == ""
+    
+    def test_smaller_than_dicts(self):
+        """Thousands of records take well under the memory of the equivalent dicts."""
+        def measure(build):
+            tracemalloc.start()
+            items = [build(i) for i in range(2000)]
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            assert len(items) == 2000
+            return size
+        
+        dicts = measure(lambda i: dict(_fields(i), id=str(i), uid=str(i), uidvalidity=1,
+                                       folder="INBOX", body=""))
+        records = measure(lambda i: EmailRecord(str(i), uidvalidity=1, folder="INBOX", body="",
+                                                **_fields(i)))
+        
+        assert records < 0.65 * dicts
@@ -0,0 +1,118 @@
+"""
+Tests for IMAP Connection Pool
+
+Unit tests for pooled connections, keepalive and reconnects.
+"""
+
+import threading
+import time
+
+import pytest
+from utils.imap_pool import IMAPConnectionPool
+from tests.fake_imap_server import make_message
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestIMAPConnectionPool:
+    """Test cases for IMAPConnectionPool."""
+    
+    def test_redundant_select_skipped(self, fake_imap_server, fake_imap_manager):
+        """Repeated operations on one folder select it only once."""
+        for i in range(1, 6):
+            fake_imap_server.add_message(make_message(i))
+        
+        fake_imap_manager.fetch_recent_emails("INBOX", limit=5)
+        fake_imap_manager.search_uids("INBOX")
+        fake_imap_manager.fetch_emails_by_uid("INBOX", [1, 2])
+        
+        assert fake_imap_server.count('EXAMINE') == 1
+    
+    def test_write_selection_after_read(self, fake_imap_server, fake_imap_manager):
+        """A read-only selection is upgraded with SELECT for writes, not the reverse."""
+        fake_imap_server.add_message(make_message(1))
+        conn = fake_imap_manager.pool.checkout("INBOX")
+        try:
+            assert conn.select_folder("INBOX", readonly=True) == 1
+            assert conn.select_folder("INBOX", readonly=False) == 1
+            assert conn.select_folder("INBOX", readonly=True) == 1
+        finally:
+            fake_imap_manager.pool.checkin(conn)
+        
+        assert fake_imap_server.count('EXAMINE') == 1
+        assert fake_imap_server.count('SELECT') == 1
+    
+    def test_reconnect_after_drop(self, fake_imap_server, fake_imap_manager):
+        """A dropped connection is replaced and the operation retried."""
+        fake_imap_server.add_message(make_message(1))
+        assert len(fake_imap_manager.fetch_recent_emails("INBOX")) == 1
+        
+        fake_imap_server.drop_connections()
+        emails = fake_imap_manager.fetch_recent_emails("INBOX")
+        
+        assert [e['subject'] for e in emails] == ['Message 1']
+        assert fake_imap_server.count('LOGIN') == 2
+        assert fake_imap_manager.pool.size() == 1
+    
+    def test_concurrent_operations(self, fake_imap_server, fake_imap_manager):
+        """Threads get separate connections instead of sharing one socket."""
+        fake_imap_server.latency = 0.01
+        for i in range(1, 11):
+            fake_imap_server.add_message(make_message(i))
+        
+        results = []
+        
+        def worker():
+            for _ in range(5):
+                results.append(len(fake_imap_manager.fetch_recent_emails("INBOX", limit=10)))
+        
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert results == [10] * 20
+        assert 1 < fake_imap_manager.pool.size() <= fake_imap_manager.pool_size
+    
+    def test_checkout_timeout(self, fake_imap_manager):
+        """Checkout waits for a free connection and gives up after the timeout."""
+        pool = IMAPConnectionPool(fake_imap_manager.open_connection, max_size=1,
+                                  keepalive_interval=None)
+        conn = pool.checkout()
+        try:
+            with pytest.raises(TimeoutError):
+                pool.checkout(timeout=0.1)
+        finally:
+            pool.checkin(conn)
+            pool.close()
+    
+    def test_keepalive_noop(self, fake_imap_server, fake_imap_manager):
+        """Idle connections receive NOOP so the server does not drop them."""
+        pool = IMAPConnectionPool(fake_imap_manager.open_connection, keepalive_interval=0.05,
+                                  connections=[fake_imap_manager.open_connection()])
+        try:
+            assert _wait_for(lambda: fake_imap_server.count('NOOP') >= 1)
+            assert pool.size() == 1
+        finally:
+            pool.close()
+    
+    def test_stale_connection_replaced_on_checkout(self, fake_imap_server, fake_imap_manager):
+        """A connection idle past stale_after is health-checked before use."""
+        pool = IMAPConnectionPool(fake_imap_manager.open_connection, keepalive_interval=None,
+                                  stale_after=0, connections=[fake_imap_manager.open_connection()])
+        try:
+            fake_imap_server.drop_connections()
+            conn = pool.checkout()
+            assert conn.noop()
+            pool.checkin(conn)
+            assert pool.size() == 1
+        finally:
+            pool.close()
@@ -0,0 +1,145 @@
+"""
+Tests for IMAP Protocol Helpers
+
+Unit tests for message-set building and FETCH response parsing.
+"""
+
+from utils.imap_protocol import (
+    build_message_set, parse_fetch_response, get_fetch_item, parse_uid_set, parse_vanished,
+    find_text_part, iter_body_parts
+)
+
+
+class TestBuildMessageSet:
+    """Test cases for build_message_set."""
+    
+    def test_ranges(self):
+        """Consecutive ids collapse into ranges."""
+        assert build_message_set([b'1', b'2', b'3', b'7', b'9', b'10']) == "1:3,7,9:10"
+    
+    def test_unsorted_and_duplicates(self):
+        """Input order and duplicates do not matter."""
+        assert build_message_set(['5', 4, b'5', 3]) == "3:5"
+    
+    def test_empty(self):
+        """An empty list gives an empty set."""
+        assert build_message_set([]) == ""
+
+
+class TestParseUidSet:
+    """Test cases for parse_uid_set and parse_vanished."""
+    
+    def test_round_trip(self):
+        """Expanding a built set returns the original UIDs."""
+        uids = [1, 2, 3, 7, 9, 10]
+        assert parse_uid_set(build_message_set(uids)) == uids
+    
+    def test_reversed_range(self):
+        """Ranges may be written high:low."""
+        assert parse_uid_set(b"5:3,1") == [1, 3, 4, 5]
+    
+    def test_vanished_earlier(self):
+        """VANISHED (EARLIER) and plain VANISHED responses are merged."""
+        assert parse_vanished([b'(EARLIER) 41,43:45', b'50', None]) == [41, 43, 44, 45, 50]
+
+
+class TestParseFetchResponse:
+    """Test cases for parse_fetch_response."""
+    
+    def test_interleaved_literals(self):
+        """Multiple messages with literals are split per message."""
+        data = [
+            (b'1 (UID 10 RFC822 {5}', b'hello'),
+            b')',
+            (b'2 (UID 11 RFC822 {5}', b'world'),
+            b' FLAGS (\\Seen))',
+        ]
+        
+        responses = parse_fetch_response(data)
+        
+        assert [seq for seq, _ in responses] == [1, 2]
+        assert responses[0][1] == {'UID': 10, 'RFC822': b'hello'}
+        assert responses[1][1]['RFC822'] == b'world'
+        assert responses[1][1]['FLAGS'] == ['\\Seen']
+    
+    def test_section_names_with_spaces(self):
+        """Bracketed section specs stay a single attribute name."""
+        data = [
+            (b'3 (RFC822.SIZE 2048 BODY[HEADER.FIELDS (FROM SUBJECT)] {12}', b'Subject: x\r\n'),
+            b')',
+        ]
+        
+        seq, attributes = parse_fetch_response(data)[0]
+        
+        assert seq == 3
+        assert attributes['RFC822.SIZE'] == 2048
+        assert get_fetch_item(attributes, 'BODY[HEADER.FIELDS (FROM SUBJECT)]') == b'Subject: x\r\n'
+    
+    def test_nested_lists_and_nil(self):
+        """Nested lists, quoted strings and NIL are decoded."""
+        data = [b'4 (BODYSTRUCTURE ("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 12 1))']
+        
+        _, attributes = parse_fetch_response(data)[0]
+        
+        assert attributes['BODYSTRUCTURE'] == [
+            'text', 'plain', ['charset', 'utf-8'], None, None, '7bit', 12, 1
+        ]
+    
+    def test_empty_response(self):
+        """imaplib returns [None] when nothing matched."""
+        assert parse_fetch_response([None]) == []
+
+
+def _structure(raw: bytes):
+    """BODYSTRUCTURE of a message as the client parses it."""
+    import email
+    from tests.fake_imap_server import render_bodystructure
+    data = [f'1 (BODYSTRUCTURE {render_bodystructure(email.message_from_bytes(raw))})'.encode()]
+    return parse_fetch_response(data)[0][1]['BODYSTRUCTURE']
+
+
+class TestFindTextPart:
+    """Test cases for BODYSTRUCTURE walking."""
+    
+    def test_single_part(self):
+        """A single-part body is section 1."""
+        from tests.fake_imap_server import make_message
+        part = find_text_part(_structure(make_message(1)))
+        
+        assert part.section == '1'
+        assert part.content_type == 'text/plain'
+    
+    def test_skips_attachment(self):
+        """The text part is found next to an attachment, with its parameters."""
+        from tests.fake_imap_server import make_message_with_attachment
+        structure = _structure(make_message_with_attachment(1, attachment_size=1024))
+        
+        parts = list(iter_body_parts(structure))
+        text = find_text_part(structure)
+        
+        assert [(p.section, p.content_type, p.disposition) for p in parts] == [
+            ('1', 'text/plain', None), ('2', 'application/pdf', 'attachment')
+        ]
+        assert (text.section, text.charset, text.encoding) == ('1', 'utf-8', 'base64')
+    
+    def test_nested_and_html_fallback(self):
+        """Nested sections are dotted; HTML is used only without text/plain."""
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        alternative = MIMEMultipart('alternative')
+        alternative.attach(MIMEText("<p>html</p>", 'html'))
+        msg = MIMEMultipart()
+        msg.attach(alternative)
+        attached = MIMEText("notes", 'plain')
+        attached.add_header('Content-Disposition', 'attachment', filename='notes.txt')
+        msg.attach(attached)
+        
+        part = find_text_part(_structure(msg.as_bytes()))
+        
+        assert (part.section, part.subtype) == ('1.1', 'html')
+    
+    def test_no_text(self):
+        """Messages with no readable part give None."""
+        assert find_text_part([]) is None
+        assert find_text_part(['image', 'png', None, None, None, 'base64', 10]) is None
+
@@ -0,0 +1,211 @@
+"""
+Tests for Inbox Monitor
+
+Unit tests for incremental inbox polling.
+"""
+
+import random
+import threading
+import time
+
+import pytest
+from tests.fake_imap_server import make_message
+from utils.imap_idle import IdleSession
+from utils.inbox_monitor import InboxMonitor
+from utils.mailbox_sync import MailboxSync
+
+
+class TestMailboxSync:
+    """Test cases for UID-based incremental sync."""
+    
+    def test_first_sync_returns_recent(self, fake_imap_server, fake_imap_manager):
+        """The first sync returns only the newest messages."""
+        for i in range(1, 31):
+            fake_imap_server.add_message(make_message(i))
+        
+        sync = MailboxSync(fake_imap_manager, initial_limit=5)
+        emails = sync.sync("INBOX")
+        
+        assert [e['uid'] for e in emails] == ['26', '27', '28', '29', '30']
+        assert all(e['uidvalidity'] == 1 for e in emails)
+        assert sync.get_state("INBOX").last_uid == 30
+    
+    def test_only_new_messages_fetched(self, fake_imap_server, fake_imap_manager):
+        """Later syncs search from the last seen UID and fetch nothing else."""
+        for i in range(1, 4):
+            fake_imap_server.add_message(make_message(i))
+        sync = MailboxSync(fake_imap_manager)
+        sync.sync("INBOX")
+        
+        assert sync.sync("INBOX") == []
+        
+        fake_imap_server.add_message(make_message(4))
+        fake_imap_server.commands.clear()
+        emails = sync.sync("INBOX")
+        
+        assert [e['subject'] for e in emails] == ['Message 4']
+        searches = [args for command, args in fake_imap_server.commands if command == 'UID']
+        assert any(args.startswith('SEARCH UID 4:*') for args in searches)
+    
+    def test_burst_not_truncated(self, fake_imap_server, fake_imap_manager):
+        """Every message of a burst larger than the old 20-message window is returned."""
+        fake_imap_server.add_message(make_message(0))
+        sync = MailboxSync(fake_imap_manager, batch_size=10)
+        sync.sync("INBOX")
+        
+        for i in range(1, 51):
+            fake_imap_server.add_message(make_message(i))
+        emails = sync.sync("INBOX")
+        
+        assert len(emails) == 50
+        assert emails[0]['subject'] == 'Message 1'
+        assert emails[-1]['subject'] == 'Message 50'
+    
+    def test_uidvalidity_change_resyncs(self, fake_imap_server, fake_imap_manager):
+        """A UIDVALIDITY change discards the stored position."""
+        for i in range(1, 4):
+            fake_imap_server.add_message(make_message(i))
+        sync = MailboxSync(fake_imap_manager, initial_limit=2)
+        sync.sync("INBOX")
+        
+        # UIDVALIDITY is fixed for a session; the change shows up after reconnecting
+        fake_imap_server.mailbox("INBOX").uidvalidity = 2
+        fake_imap_server.drop_connections()
+        emails = sync.sync("INBOX")
+        
+        assert [e['subject'] for e in emails] == ['Message 2', 'Message 3']
+        assert sync.get_state("INBOX").uidvalidity == 2
+    
+    def test_fetches_headers_only(self, fake_imap_server, fake_imap_manager):
+        """New messages arrive without their bodies, which load on first access."""
+        from tests.fake_imap_server import make_message_with_attachment
+        fake_imap_server.add_message(make_message_with_attachment(1, body="Invoice body text"))
+        sync = MailboxSync(fake_imap_manager)
+        
+        email_data = sync.sync("INBOX")[0]
+        
+        assert not email_data.body_loaded
+        assert fake_imap_server.bytes_sent < 64 * 1024
+        assert email_data['body'] == "Invoice body text"
+        assert MailboxSync(fake_imap_manager, headers_only=False).sync("INBOX")[0].body_loaded
+
+
+class TestInboxMonitor:
+    """Test cases for InboxMonitor."""
+    
+    def test_check_for_new_emails(self, fake_imap_server, fake_imap_manager):
+        """New emails are reported once and counted as seen."""
+        fake_imap_server.add_message(make_message(1))
+        monitor = InboxMonitor(fake_imap_manager)
+        
+        assert len(monitor.check_for_new_emails()) == 1
+        assert monitor.check_for_new_emails() == []
+        
+        fake_imap_server.add_message(make_message(2))
+        new_emails = monitor.check_for_new_emails()
+        
+        assert [e['message_id'] for e in new_emails] == ['<msg2@example.com>']
+        assert monitor.get_status()['emails_seen_count'] == 2
+    
+    def test_header_triage_skips_bulk_bodies(self, fake_imap_server, fake_imap_manager, header_first_rules):
+        """Mail the header rules decide is triaged without downloading its body."""
+        from benchmarks.corpus import newsletter, personal
+        from utils.mailbuddy_triage import TriageTask
+        rng = random.Random(1)
+        fake_imap_server.add_message(newsletter(1, rng))
+        fake_imap_server.add_message(personal(2, rng))
+        monitor = InboxMonitor(fake_imap_manager)
+        
+        new_emails = monitor.check_for_new_emails()
+        results = TriageTask([], rules=header_first_rules).run_batch(new_emails)
+        
+        assert results[0].category == 'NEWSLETTER'
+        assert not new_emails[0].body_loaded and new_emails[1].body_loaded
+    
+    def test_set_check_interval_clamped(self):
+        """Intervals are clamped to 1-30 minutes."""
+        monitor = InboxMonitor(None)
+        
+        monitor.set_check_interval(5)
+        assert monitor.check_interval_seconds == 60
+        
+        monitor.set_check_interval(10000)
+        assert monitor.check_interval_seconds == 1800
+
+
+def _wait_for(condition, timeout=5.0):
+    """Poll a condition until it holds or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestIdleSession:
+    """Test cases for IMAP IDLE sessions."""
+    
+    def test_wait_returns_on_exists(self, fake_imap_server, fake_imap_manager):
+        """An EXISTS notification ends the IDLE wait."""
+        session = IdleSession(fake_imap_manager.open_connection(), "INBOX")
+        assert session.supported()
+        
+        threading.Timer(0.2, fake_imap_server.add_message, args=(make_message(1),)).start()
+        start = time.monotonic()
+        
+        assert session.wait(timeout=10) is True
+        assert time.monotonic() - start < 5
+        session.conn.logout()
+    
+    def test_wait_times_out(self, fake_imap_server, fake_imap_manager):
+        """Without mailbox changes the wait ends after the timeout and can be re-issued."""
+        session = IdleSession(fake_imap_manager.open_connection(), "INBOX")
+        
+        assert session.wait(timeout=0.2) is False
+        assert session.wait(timeout=0.2) is False
+        assert fake_imap_server.count('IDLE') == 2
+        session.conn.logout()
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1']], indirect=True)
+    def test_not_supported(self, fake_imap_server, fake_imap_manager):
+        """Servers without IDLE are detected."""
+        session = IdleSession(fake_imap_manager.open_connection(), "INBOX")
+        
+        assert session.supported() is False
+        session.conn.logout()
+
+
+class TestIdleMonitor:
+    """Test cases for the IDLE-driven monitor loop."""
+    
+    def test_idle_push_delivers_callback(self, fake_imap_server, fake_imap_manager):
+        """New mail reaches the callback within seconds, without waiting for the interval."""
+        received = []
+        monitor = InboxMonitor(fake_imap_manager, check_interval_seconds=1800, use_idle=True)
+        monitor.set_new_emails_callback(received.extend)
+        monitor.start()
+        try:
+            assert _wait_for(lambda: monitor.get_status()['mode'] == 'idle' and fake_imap_server.idlers)
+            
+            fake_imap_server.add_message(make_message(1))
+            
+            assert _wait_for(lambda: len(received) == 1)
+            assert received[0]['subject'] == 'Message 1'
+        finally:
+            monitor.stop()
+        assert monitor.get_status()['mode'] == 'polling'
+    
+    @pytest.mark.parametrize('fake_imap_server', [['IMAP4rev1']], indirect=True)
+    def test_falls_back_to_polling(self, fake_imap_server, fake_imap_manager):
+        """Without IDLE the monitor keeps polling."""
+        fake_imap_server.add_message(make_message(1))
+        received = []
+        monitor = InboxMonitor(fake_imap_manager, check_interval_seconds=1800, use_idle=True)
+        monitor.set_new_emails_callback(received.extend)
+        monitor.start()
+        try:
+            assert _wait_for(lambda: len(received) == 1)
+            assert monitor.get_status()['mode'] == 'polling'
+        finally:
+            monitor.stop()
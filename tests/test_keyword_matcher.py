@@ -0,0 +1,67 @@
+"""
+Tests for Keyword Matcher
+
+Unit tests for the compiled keyword and pattern matcher used by triage.
+"""
+
+import pytest
+from utils.keyword_matcher import KeywordMatcher
+from utils.mailbuddy_triage import TriageTask
+from utils.triage_rules import DEFAULT_RULES
+
+
+class TestKeywordMatcher:
+    """Test cases for KeywordMatcher."""
+    
+    def test_keywords_case_insensitive(self):
+        """Keywords match anywhere in the text, ignoring case."""
+        matcher = KeywordMatcher({'urgent': ['ASAP', 'action required'], 'promo': ['% off']})
+        
+        assert matcher.search("Reply asap please") == {'urgent'}
+        assert matcher.search("ACTION REQUIRED: 20% OFF") == {'urgent', 'promo'}
+        assert matcher.search("nothing here") == set()
+    
+    def test_patterns(self):
+        """Regex patterns are combined; plain-text patterns act as keywords."""
+        matcher = KeywordMatcher({}, {'otp': [r'\b\d{4,6}\b', r'OTP'], 'ref': [r'ref-\d+']})
+        
+        assert matcher.groups == {'otp', 'ref'}
+        assert matcher.search("Your code is 123456") == {'otp'}
+        assert matcher.search("your otp") == {'otp'}
+        assert matcher.search("1234567 is too long") == set()
+        # An earlier match of one group doesn't hide the other group
+        assert matcher.search("REF-12345") == {'otp', 'ref'}
+    
+    def test_restrict_groups(self):
+        """Only the requested groups are checked."""
+        matcher = KeywordMatcher({'a': ['alpha'], 'b': ['beta']}, {'c': [r'\d+']})
+        
+        assert matcher.search("alpha beta 1", groups=['b']) == {'b'}
+        assert matcher.matches("alpha beta 1", 'c')
+        assert not matcher.matches("alpha", 'b')
+        assert not matcher.matches("alpha", 'unknown')
+    
+    @pytest.mark.parametrize("text", [
+        "Your verification code is 4821",
+        "Order #12 shipped, tracking number inside",
+        "URGENT: deadline moved",
+        "Weekly Digest - click to Unsubscribe",
+        "Summer SALE: free shipping on everything",
+        "Lunch on Friday?",
+        "",
+    ])
+    def test_matches_triage_lists(self, text):
+        """The compiled default rules agree with per-list keyword and regex checks."""
+        triage = TriageTask([])
+        text_rules = [rule for rule in DEFAULT_RULES['rules'] if 'keywords' in rule or 'patterns' in rule]
+        matcher = KeywordMatcher(
+            keywords={rule['name']: rule.get('keywords', []) for rule in text_rules},
+            patterns={rule['name']: rule.get('patterns', []) for rule in text_rules},
+        )
+        expected = {
+            rule['name'] for rule in text_rules
+            if triage._contains_keywords(text, rule.get('keywords', []))
+            or triage._matches_pattern(text, rule.get('patterns', []))
+        }
+        
+        assert matcher.search(text) == expected
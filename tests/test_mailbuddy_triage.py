@@ -5,7 +5,10 @@ Unit tests for email classification functionality.
 """
 
 import pytest
-from utils.mailbuddy_triage import TriageTask, EmailTriageResult
+from pydantic import ValidationError
+from utils.email_record import EmailRecord
+from utils.mailbuddy_triage import TriageTask, EmailTriageResult, OTHER_RESULT
+from utils.triage_cache import TriageCache
 
 
 class TestEmailTriageResult:
@@ -22,6 +25,15 @@ class TestEmailTriageResult:
         assert result.category == "URGENT"
         assert result.action == "Move to Urgent"
         assert "urgent" in result.justification.lower()
+    
+    def test_result_immutable(self):
+        """Results are frozen, so shared instances can't be changed by callers."""
+        result = TriageTask([]).run({'subject': 'Lunch?', 'body': ''})
+        
+        assert result is OTHER_RESULT
+        assert result == EmailTriageResult(**result.model_dump())
+        with pytest.raises(ValidationError):
+            result.category = "URGENT"
 
 
 class TestTriageTask:
@@ -206,3 +218,102 @@ class TestTriageTask:
         assert isinstance(result, EmailTriageResult)
         assert result.category in ["URGENT", "IMPORTANT", "NEWSLETTER", 
                                    "PROMOTIONAL", "OTP_RECEIPT", "OTHER"]
+    
+    def test_run_stream(self, urgent_email_data, newsletter_email_data, known_contacts):
+        """Streaming triage pairs each email with its result, lazily and in order."""
+        triage = TriageTask(known_contacts)
+        
+        def emails():
+            yield urgent_email_data
+            yield newsletter_email_data
+            raise AssertionError("consumed past the second email")
+        
+        stream = triage.run_stream(emails())
+        (first, first_result), (second, second_result) = next(stream), next(stream)
+        
+        assert first is urgent_email_data and first_result.category == "URGENT"
+        assert second is newsletter_email_data and second_result.category == "NEWSLETTER"
+    
+    def test_run_batch_cache(self, urgent_email_data, newsletter_email_data, known_contacts):
+        """Batches reuse cached results; other rule sets don't see them."""
+        cache = TriageCache()
+        triage = TriageTask(known_contacts, cache=cache)
+        emails = [urgent_email_data, newsletter_email_data]
+        
+        first = triage.run_batch(emails)
+        assert [r.category for r in first] == ["URGENT", "NEWSLETTER"]
+        assert cache.stats()['misses'] == 2 and cache.stats()['hits'] == 0
+        
+        second = TriageTask(known_contacts, cache=cache).run_batch(emails)
+        assert all(a is b for a, b in zip(first, second))
+        stats = cache.stats()
+        assert stats['hits'] == 2 and stats['hit_rate'] == 0.5
+        assert stats['time_saved'] > 0
+        
+        # Without the known contact the sender is no longer trusted
+        assert TriageTask([], cache=cache).run_batch([urgent_email_data])[0].category == "IMPORTANT"
+        assert len(cache) == 3
+    
+    def test_run_batch_without_message_id(self):
+        """Messages without a Message-ID are keyed by content."""
+        triage = TriageTask([], cache=TriageCache())
+        email = {'subject': 'Weekly newsletter', 'sender': 'news@example.com', 'body': 'Hi'}
+        changed = dict(email, subject='Lunch?')
+        
+        triage.run_batch([email, dict(email), changed])
+        
+        assert triage.cache.stats()['hits'] == 1
+        assert triage.run_batch([changed])[0].category == "OTHER"
+    
+    def test_header_only_records(self, known_contacts, header_first_rules):
+        """Header-only records load their body only when the headers can't decide."""
+        loads = []
+        
+        def record(uid, sender, headers, body="Your verification code is 123456"):
+            def load_body():
+                loads.append(uid)
+                return body
+            return EmailRecord(uid, subject="Hello", sender=sender, headers=headers,
+                               body_loader=load_body)
+        
+        def bulk():
+            return record('1', 'news@example.com', {'list-unsubscribe': '<mailto:u@example.com>'})
+        
+        # Default rules: a code in the body outranks the bulk headers
+        triage = TriageTask(known_contacts)
+        assert triage.run(bulk()).category == "OTP_RECEIPT"
+        assert loads == ['1']
+        
+        # With the header rules first, bulk mail is decided without its body
+        loads.clear()
+        triage = TriageTask(known_contacts, rules=header_first_rules)
+        known = record('2', 'boss@company.com', {})
+        not_fetched = record('3', 'news@example.com', None)
+        
+        assert triage.run(bulk()).category == "NEWSLETTER"
+        assert loads == []
+        # A known contact could still be overruled by OTP or receipt keywords in the body
+        assert triage.run(known).category == "OTP_RECEIPT"
+        assert triage.run(not_fetched).category == "OTP_RECEIPT"
+        assert loads == ['2', '3']
+        assert (triage.header_decisions, triage.body_decisions) == (1, 2)
+    
+    def test_run_batch_header_only_without_message_id(self, header_first_rules):
+        """Records without a Message-ID are cached by UID, without loading the body."""
+        triage = TriageTask([], cache=TriageCache(), rules=header_first_rules)
+        email = EmailRecord('7', uidvalidity=3, folder='INBOX', headers={'list-id': 'x'},
+                            body_loader=lambda: pytest.fail("body loaded"))
+        
+        assert triage.run_batch([email, email])[0].category == "NEWSLETTER"
+        assert triage.cache.stats()['hits'] == 1
+    
+    def test_max_body_chars(self):
+        """Keywords past the body cap are ignored; capped results are cached separately."""
+        email = {'subject': 'Hello', 'sender': 'friend@example.com',
+                 'body': "Catching up. " * 1000 + "Click to unsubscribe.", 'message_id': '<m1@example.com>'}
+        cache = TriageCache()
+        
+        assert TriageTask([], cache=cache).run_batch([email])[0].category == "NEWSLETTER"
+        capped = TriageTask([], cache=cache, max_body_chars=1000)
+        assert capped.run_batch([email])[0].category == "OTHER"
+        assert cache.stats()['hits'] == 0
@@ -0,0 +1,159 @@
+"""
+Tests for Message Cache
+
+Unit tests for the SQLite-backed message cache.
+"""
+
+from tests.fake_imap_server import make_message, make_message_with_attachment
+from utils.message_cache import MessageCache
+
+
+def _record(uid, body="Body", subject="Subject"):
+    return {
+        'uid': str(uid),
+        'subject': subject,
+        'sender': 'Sender <sender@example.com>',
+        'date': 'Mon, 1 Jan 2024 12:00:00 +0000',
+        'message_id': f'<msg{uid}@example.com>',
+        'body': body,
+        'flags': ['\\Seen'],
+    }
+
+
+class TestMessageCache:
+    """Test cases for MessageCache."""
+    
+    def test_round_trip(self):
+        """Stored records come back keyed by UID."""
+        cache = MessageCache(":memory:")
+        cache.put_many("acct", "INBOX", 1, [_record(1), _record(2)])
+        
+        records = cache.get_many("acct", "INBOX", 1, [1, 2, 3])
+        
+        assert sorted(records) == [1, 2]
+        assert records[1]['subject'] == 'Subject'
+        assert records[1]['body'] == 'Body'
+        assert records[1]['flags'] == ['\\Seen']
+    
+    def test_keyed_by_uidvalidity(self):
+        """Entries from another UIDVALIDITY are not returned and can be dropped."""
+        cache = MessageCache(":memory:")
+        cache.put_many("acct", "INBOX", 1, [_record(1)])
+        
+        assert cache.get_many("acct", "INBOX", 2, [1]) == {}
+        
+        cache.invalidate_folder("acct", "INBOX", keep_uidvalidity=2)
+        assert cache.get_many("acct", "INBOX", 1, [1]) == {}
+    
+    def test_header_only_keeps_body(self):
+        """Re-storing headers does not erase a cached body; bodies can be added later."""
+        cache = MessageCache(":memory:")
+        header_only = _record(1)
+        del header_only['body']
+        cache.put_many("acct", "INBOX", 1, [header_only])
+        assert cache.get_many("acct", "INBOX", 1, [1])[1]['body'] is None
+        
+        cache.update_body("acct", "INBOX", 1, 1, "Loaded later")
+        cache.put_many("acct", "INBOX", 1, [header_only])
+        
+        assert cache.get_many("acct", "INBOX", 1, [1])[1]['body'] == "Loaded later"
+    
+    def test_signal_headers(self, tmp_path):
+        """Signal headers round-trip; caches from before they were stored are migrated."""
+        import sqlite3
+        path = str(tmp_path / "old.db")
+        old = sqlite3.connect(path)
+        old.execute("CREATE TABLE messages (account TEXT NOT NULL, folder TEXT NOT NULL, "
+                    "uidvalidity INTEGER NOT NULL, uid INTEGER NOT NULL, message_id TEXT, "
+                    "subject TEXT, sender TEXT, date TEXT, body TEXT, flags TEXT, size INTEGER, "
+                    "has_attachments INTEGER, stored_bytes INTEGER NOT NULL, last_access REAL NOT NULL, "
+                    "PRIMARY KEY (account, folder, uidvalidity, uid))")
+        old.execute("INSERT INTO messages VALUES ('acct', 'INBOX', 1, 1, '', 'Old', '', '', NULL, "
+                    "'[]', NULL, NULL, 3, 0)")
+        old.commit()
+        old.close()
+        
+        cache = MessageCache(path)
+        assert 'headers' not in cache.get_many("acct", "INBOX", 1, [1])[1]
+        
+        cache.put_many("acct", "INBOX", 1, [dict(_record(2), headers={'list-id': '<news.example.com>'})])
+        cache.put_many("acct", "INBOX", 1, [_record(2)])
+        assert cache.get_many("acct", "INBOX", 1, [2])[2]['headers'] == {'list-id': '<news.example.com>'}
+    
+    def test_eviction_bounds_size(self):
+        """Least recently read messages are evicted once the size limit is exceeded."""
+        cache = MessageCache(":memory:", max_bytes=5000)
+        cache.put_many("acct", "INBOX", 1, [_record(uid, body="x" * 900) for uid in range(1, 5)])
+        cache.get_many("acct", "INBOX", 1, [1])  # touch message 1
+        
+        cache.put_many("acct", "INBOX", 1, [_record(uid, body="x" * 900) for uid in range(5, 8)])
+        
+        assert cache.total_bytes() <= 5000
+        remaining = cache.get_many("acct", "INBOX", 1, range(1, 8))
+        assert 1 in remaining and 7 in remaining
+        assert 2 not in remaining
+    
+    def test_folder_state_and_deletes(self):
+        """Folder refresh state round-trips; vanished UIDs can be dropped."""
+        cache = MessageCache(":memory:")
+        cache.put_many("acct", "INBOX", 1, [_record(1), _record(2), _record(3)])
+        assert cache.get_folder_state("acct", "INBOX") is None
+        
+        cache.set_folder_state("acct", "INBOX", 1, 42)
+        cache.delete_uids("acct", "INBOX", 1, [2])
+        
+        assert cache.get_folder_state("acct", "INBOX") == (1, 42)
+        assert cache.uids("acct", "INBOX", 1) == [1, 3]
+        cache.invalidate_folder("acct", "INBOX")
+        assert cache.get_folder_state("acct", "INBOX") is None
+
+
+class TestCachedFetch:
+    """EmailFolderManager reading through the cache."""
+    
+    def test_reopen_reads_from_cache(self, fake_imap_server, fake_imap_manager):
+        """The second fetch downloads no message data."""
+        for i in range(1, 11):
+            fake_imap_server.add_message(make_message(i, body=f"Body {i}"))
+        fake_imap_manager.cache = MessageCache(":memory:")
+        
+        first = fake_imap_manager.fetch_recent_emails("INBOX", limit=10)
+        bytes_before = fake_imap_server.bytes_sent
+        second = fake_imap_manager.fetch_recent_emails("INBOX", limit=10)
+        
+        assert second == first
+        assert fake_imap_server.bytes_sent - bytes_before < 2048
+        fetches = [args for command, args in fake_imap_server.commands
+                   if command == 'UID' and args.startswith('FETCH ')]
+        assert fetches[-1].endswith('(UID FLAGS)')
+    
+    def test_only_new_messages_downloaded(self, fake_imap_server, fake_imap_manager):
+        """New arrivals are fetched; cached messages get current flags."""
+        for i in range(1, 4):
+            fake_imap_server.add_message(make_message(i))
+        fake_imap_manager.cache = MessageCache(":memory:")
+        fake_imap_manager.fetch_recent_emails("INBOX")
+        
+        fake_imap_server.mailbox("INBOX").messages[0].flags = ['\\Seen']
+        fake_imap_server.add_message(make_message(4))
+        fake_imap_server.commands.clear()
+        emails = fake_imap_manager.fetch_recent_emails("INBOX")
+        
+        assert [e['subject'] for e in emails] == ['Message 4', 'Message 3', 'Message 2', 'Message 1']
+        assert emails[-1]['id'] == '1'
+        assert emails[-1]['flags'] == ['\\Seen']
+        fetches = [args for command, args in fake_imap_server.commands
+                   if command == 'UID' and args.startswith('FETCH ')]
+        assert fetches[-1].startswith('FETCH 4 ')
+    
+    def test_lazy_body_written_to_cache(self, fake_imap_server, fake_imap_manager):
+        """Bodies loaded on demand are cached for the next header-only fetch."""
+        fake_imap_server.add_message(make_message_with_attachment(1, body="Invoice body"))
+        fake_imap_manager.cache = MessageCache(":memory:")
+        
+        first = fake_imap_manager.fetch_recent_emails("INBOX", headers_only=True)[0]
+        assert first['body'] == "Invoice body"
+        
+        second = fake_imap_manager.fetch_recent_emails("INBOX", headers_only=True)[0]
+        assert second.get('body') == "Invoice body"
+        assert second.body_loaded
@@ -0,0 +1,59 @@
+"""
+Tests for Triage Cache
+
+Unit tests for the LRU cache of triage results.
+"""
+
+from utils.triage_cache import TriageCache, content_key
+
+
+class TestContentKey:
+    """Test cases for content_key."""
+    
+    def test_prefers_message_id(self):
+        """The Message-ID identifies a message regardless of content."""
+        assert content_key("<a@x>", "s", "f", "b") == content_key("<a@x>")
+        assert content_key("<a@x>") != content_key("<b@x>")
+    
+    def test_hashes_content(self):
+        """Without a Message-ID the subject, sender and body are hashed."""
+        key = content_key("", "s", "f", "b")
+        
+        assert key == content_key("", "s", "f", "b")
+        assert key != content_key("", "s", "f", "other")
+        # Field boundaries are part of the hash
+        assert content_key("", "ab", "c") != content_key("", "a", "bc")
+
+
+class TestTriageCache:
+    """Test cases for TriageCache."""
+    
+    def test_lru_eviction(self):
+        """The least recently used result is dropped first."""
+        cache = TriageCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+        assert len(cache) == 2
+    
+    def test_stats(self):
+        """Hit rate and time saved are reported."""
+        cache = TriageCache()
+        assert cache.stats() == {'hits': 0, 'misses': 0, 'hit_rate': 0.0, 'entries': 0, 'time_saved': 0.0}
+        
+        cache.get('a')
+        cache.put('a', 1, seconds=0.5)
+        cache.get('a')
+        cache.get('a')
+        
+        stats = cache.stats()
+        assert stats['hits'] == 2 and stats['misses'] == 1
+        assert abs(stats['hit_rate'] - 2 / 3) < 1e-9
+        assert stats['time_saved'] == 1.0
+        
+        cache.clear()
+        assert len(cache) == 0 and cache.stats()['hits'] == 2
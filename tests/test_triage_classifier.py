@@ -0,0 +1,202 @@
+"""
+Tests for Triage Classifier
+
+Unit tests for the learned (naive Bayes) triage backend. Skipped without NumPy.
+"""
+
+import time
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.corpus import build_corpus
+from utils.bulk_processing import parse_raw_message
+from utils.email_record import EmailRecord
+from utils.mailbuddy_triage import TriageTask
+from utils.triage_cache import TriageCache
+from utils.triage_classifier import TriageClassifier
+
+
+def _bill(i):
+    return {'subject': f"Your {2020 + i % 5} electricity bill",
+            'sender': 'billing@power.example', 'body': f"Amount due by March {i % 28 + 1}. Meter 90210."}
+
+
+def _note(i):
+    return {'subject': f"Notes from the {2020 + i % 5} offsite",
+            'sender': f'colleague{i}@company.com', 'body': "Here are my notes and the agenda for next week."}
+
+
+def _trained(**kwargs):
+    classifier = TriageClassifier(**kwargs)
+    classifier.learn([_bill(i) for i in range(10)], ['Bills'] * 10)
+    classifier.learn([_note(i) for i in range(10)], ['Work'] * 10)
+    return classifier
+
+
+class TestTriageClassifier:
+    """Test cases for TriageClassifier."""
+    
+    def test_not_ready_abstains(self):
+        """Until two folders have enough examples, predict() abstains."""
+        classifier = TriageClassifier()
+        classifier.learn([_bill(i) for i in range(10)], ['Bills'] * 10)
+        
+        assert not classifier.ready
+        assert classifier.predict([_bill(99)]) == [None]
+    
+    def test_predicts_learned_folders(self):
+        """Messages resembling a folder's mail are assigned to it."""
+        classifier = _trained()
+        
+        predictions = classifier.predict([_bill(50), _note(50)])
+        
+        assert [p[0] for p in predictions] == ['Bills', 'Work']
+        assert all(p[1] >= classifier.min_confidence for p in predictions)
+        assert classifier.examples() == {'Bills': 10, 'Work': 10}
+    
+    def test_abstains_when_unsure(self):
+        """Messages unlike anything learned fall below the confidence threshold."""
+        classifier = _trained(min_confidence=0.99)
+        
+        assert classifier.predict([{'subject': 'Hello', 'sender': '', 'body': ''}]) == [None]
+    
+    def test_incremental_move(self):
+        """Learning a move removes the message from its old folder's counts."""
+        classifier = _trained()
+        version = classifier.version
+        
+        classifier.learn([_bill(1)], ['Work'], previous=['Bills'])
+        
+        assert classifier.examples() == {'Bills': 9, 'Work': 11}
+        assert classifier.version > version
+    
+    def test_unlearn_without_new_label(self):
+        """A label of None only removes the message from its previous folder."""
+        classifier = _trained()
+        
+        classifier.learn([_bill(1)], [None], previous=['Bills'])
+        
+        assert classifier.examples() == {'Bills': 9, 'Work': 10}
+    
+    def test_batch_matches_single(self):
+        """Scoring a batch gives the same probabilities as scoring one by one."""
+        classifier = _trained()
+        emails = [_bill(3), _note(4), {'subject': '', 'sender': '', 'body': ''}]
+        
+        batch = classifier.scores(emails)
+        
+        for row, email in zip(batch, emails):
+            assert np.allclose(row, classifier.scores([email])[0])
+    
+    def test_scoring_does_not_load_bodies(self):
+        """Header-only records are scored on subject, sender and headers, without a download."""
+        classifier = _trained()
+        bill = _bill(64)
+        record = EmailRecord('1', subject=bill['subject'], sender=bill['sender'],
+                             body_loader=lambda: pytest.fail("body loaded"))
+        
+        assert classifier.predict([record])[0][0] == 'Bills'
+        assert not record.body_loaded
+    
+    def test_learn_folders_fetches_headers_first(self, fake_imap_server, fake_imap_manager):
+        """Training from folders downloads text parts only, not attachments."""
+        from tests.fake_imap_server import make_message, make_message_with_attachment
+        for i in range(6):
+            fake_imap_server.add_message(make_message_with_attachment(i + 1), folder="Bills")
+            fake_imap_server.add_message(make_message(i + 7, body="Agenda for the offsite"), folder="Work")
+        classifier = TriageClassifier()
+        before = fake_imap_server.bytes_sent
+        
+        assert classifier.learn_folders(fake_imap_manager, ["Bills", "Work"]) == {'Bills': 6, 'Work': 6}
+        assert fake_imap_server.bytes_sent - before < 512 * 1024
+    
+    def test_save_and_load(self, tmp_path):
+        """A saved model predicts the same after loading."""
+        path = str(tmp_path / "model.npz")
+        classifier = _trained()
+        classifier.save(path)
+        
+        loaded = TriageClassifier.load(path)
+        
+        assert loaded.labels == classifier.labels
+        assert np.allclose(loaded.scores([_bill(7)]), classifier.scores([_bill(7)]))
+        assert TriageClassifier.load(str(tmp_path / "missing.npz")) is None
+    
+    def test_batch_scoring_speed(self):
+        """10k corpus messages are scored in one batch, features included, within seconds."""
+        emails = [parse_raw_message(raw) for kind in build_corpus(per_kind=25).values() for raw in kind]
+        classifier = TriageClassifier()
+        for i, label in enumerate(['A', 'B', 'C', 'D']):
+            classifier.learn(emails[i::4], [label] * len(emails[i::4]))
+        batch = [emails[i % len(emails)] for i in range(10000)]
+        classifier.scores(batch[:100])
+        
+        start = time.perf_counter()
+        classifier.scores(batch)
+        
+        assert time.perf_counter() - start < 2.0
+
+
+class TestLearnedTriage:
+    """TriageTask with a classifier backend."""
+    
+    def test_classifier_overrides_keyword_rules(self):
+        """Confident predictions replace keyword misfires like years read as OTP codes."""
+        bill = _bill(60)
+        assert TriageTask([]).run(bill).category == "OTP_RECEIPT"
+        
+        triage = TriageTask([], classifier=_trained())
+        result = triage.run(bill)
+        
+        assert result.folder == 'Bills' and result.category == "OTHER"
+        assert result.action == "Move to Bills"
+        assert triage.learned_decisions == 1
+    
+    def test_rule_folders_keep_their_category(self):
+        """Predictions of a rule's folder use that rule's category."""
+        classifier = TriageClassifier()
+        classifier.learn([_bill(i) for i in range(10)], ['Receipts'] * 10)
+        classifier.learn([_note(i) for i in range(10)], ['Important'] * 10)
+        
+        assert TriageTask([], classifier=classifier).run(_note(70)).category == "IMPORTANT"
+    
+    def test_header_rules_and_fallback(self, header_first_rules):
+        """Header-only rules that are certain still decide first; unsure predictions fall back to the rules."""
+        triage = TriageTask([], classifier=_trained(min_confidence=0.99), rules=header_first_rules)
+        bulk = EmailRecord('1', subject='Weekly digest', headers={'list-id': 'x'},
+                           body_loader=lambda: pytest.fail("body loaded"))
+        unsure = {'subject': 'Weekly newsletter', 'sender': '', 'body': ''}
+        
+        results = triage.run_batch([bulk, unsure])
+        
+        assert [r.category for r in results] == ["NEWSLETTER", "NEWSLETTER"]
+        assert (triage.header_decisions, triage.body_decisions) == (1, 1)
+    
+    def test_training_invalidates_cache(self):
+        """Cached results are keyed by the model version."""
+        classifier = _trained()
+        triage = TriageTask([], cache=TriageCache(), classifier=classifier)
+        email = dict(_bill(61), message_id='<bill61@power.example>')
+        
+        assert triage.run_batch([email])[0].folder == 'Bills'
+        assert triage.run_batch([email])[0].folder == 'Bills'
+        classifier.learn([_bill(62)], ['Bills'])
+        
+        assert triage.run_batch([email])[0].folder == 'Bills'
+        assert triage.cache.stats()['hits'] == 1 and triage.cache.stats()['misses'] == 2
+    
+    def test_retrained_model_not_served_from_cache(self):
+        """A new model with the same version counter does not reuse the old model's results."""
+        cache = TriageCache()
+        email = dict(_bill(63), message_id='<bill63@power.example>')
+        first = _trained()
+        assert TriageTask([], cache=cache, classifier=first).run_batch([email])[0].folder == 'Bills'
+        
+        # Same number of learn() calls, opposite labels
+        second = TriageClassifier()
+        second.learn([_bill(i) for i in range(10)], ['Work'] * 10)
+        second.learn([_note(i) for i in range(10)], ['Bills'] * 10)
+        assert second.version == first.version
+        
+        assert TriageTask([], cache=cache, classifier=second).run_batch([email])[0].folder == 'Work'
@@ -0,0 +1,293 @@
+"""
+Tests for Triage Rules
+
+Unit tests for rule compilation, the decision table and rule file reloading.
+"""
+
+import copy
+import json
+import os
+import pytest
+from unittest.mock import patch
+from benchmarks.corpus import build_corpus
+from utils.bulk_processing import parse_raw_message
+from utils.mailbuddy_triage import TriageTask
+from utils.triage_rules import DEFAULT_RULES, RuleError, RuleSet, RuleSource, header_rules_first
+
+
+def _previous_category(email, known_contacts):
+    """The if-chain TriageTask.run used before rules were data."""
+    triage = TriageTask(known_contacts)
+    lists = {rule['name']: rule for rule in DEFAULT_RULES['rules']}
+    text = f"{email.get('subject', '')} {email.get('body', '')}"
+    if triage._matches_pattern(text, lists['otp']['patterns']):
+        return "OTP_RECEIPT"
+    if triage._contains_keywords(text, lists['receipt']['keywords']):
+        return "OTP_RECEIPT"
+    known = triage._is_from_known_contact(email.get('sender', ''))
+    urgent = triage._contains_keywords(text, lists['urgent']['keywords'])
+    if known and urgent:
+        return "URGENT"
+    if urgent or known:
+        return "IMPORTANT"
+    if triage._contains_keywords(text, lists['newsletter']['keywords']):
+        return "NEWSLETTER"
+    if triage._contains_keywords(text, lists['promotional']['keywords']):
+        return "PROMOTIONAL"
+    return "OTHER"
+
+
+def _rule(name, priority, **conditions):
+    return dict(name=name, priority=priority, category=name.upper(), action=f"Move to {name}",
+                justification=name, folder=name.title(), **conditions)
+
+
+def _write(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+class TestRuleSet:
+    """Test cases for the compiled decision table."""
+    
+    def test_default_rules_match_previous_logic(self, sample_email_data, urgent_email_data,
+                                                newsletter_email_data, known_contacts):
+        """Without signal headers, the built-in rules classify like the old hard-coded chain."""
+        emails = [sample_email_data, urgent_email_data, newsletter_email_data,
+                  {'subject': 'Lunch?', 'sender': 'boss@company.com', 'body': 'See you'},
+                  {'subject': '50% off', 'sender': 'shop@example.com', 'body': 'Shop now'}]
+        emails += [parse_raw_message(raw) for kind in build_corpus(per_kind=3).values() for raw in kind]
+        contacts = known_contacts + ['alex@example.net']
+        triage = TriageTask(contacts)
+        
+        for email in emails:
+            email = {key: value for key, value in email.items() if key != 'headers'}
+            assert triage.run(email).category == _previous_category(email, contacts)
+    
+    def test_default_header_rules(self):
+        """Bulk headers file mail as newsletters only where no OTP, receipt or urgent rule applies."""
+        triage = TriageTask(['boss@company.com'])
+        email = {'subject': 'Spring sale', 'sender': 'news@lists.example.org', 'body': ''}
+        
+        assert triage.run(email).category == 'PROMOTIONAL'
+        assert triage.run(dict(email, headers={'list-id': '<digest.example.org>'})).category == 'NEWSLETTER'
+        assert triage.run(dict(email, headers={'precedence': 'Bulk'})).category == 'NEWSLETTER'
+        assert triage.run(dict(email, headers={'precedence': 'first-class'})).category == 'PROMOTIONAL'
+        assert triage.run(dict(email, headers={'auto-submitted': 'auto-replied'})).justification \
+            == 'Automatic reply'
+        
+        # Higher-priority rules still win on bulk mail
+        code = {'subject': 'Your verification code is 482913', 'sender': 'a@b.c', 'body': '',
+                'headers': {'list-unsubscribe': '<mailto:u@b.c>'}}
+        outage = {'subject': 'URGENT: server down', 'sender': 'boss@company.com', 'body': '',
+                  'headers': {'list-id': 'ops.company.com'}}
+        receipt = {'subject': 'Your receipt', 'sender': 'a@b.c', 'body': '', 'headers': {'precedence': 'bulk'}}
+        assert [triage.run(e).category for e in (code, outage, receipt)] == ['OTP_RECEIPT', 'URGENT', 'OTP_RECEIPT']
+    
+    def test_header_rules_first(self):
+        """header_rules_first moves only the header-only rules ahead, keeping their order."""
+        data = header_rules_first(DEFAULT_RULES)
+        order = [rule['name'] for rule in sorted(data['rules'], key=lambda rule: rule['priority'])]
+        
+        assert order[:5] == ['mailing_list', 'bulk_unsubscribe', 'bulk_precedence', 'auto_reply', 'otp']
+        assert DEFAULT_RULES['rules'][0]['name'] == 'otp'
+        rules = RuleSet(data)
+        assert rules.evaluate_headers("Hi", "a@b.c", False, {'list-id': 'x'}).name == 'mailing_list'
+        assert RuleSet(DEFAULT_RULES).evaluate_headers("Hi", "a@b.c", False, {'list-id': 'x'}) is None
+    
+    def test_evaluate_headers(self):
+        """Header-only evaluation decides only when the body cannot change the outcome."""
+        rules = RuleSet({'rules': [
+            _rule('list', 10, headers={'List-Id': True}),
+            _rule('otp', 20, keywords=['verification code']),
+            _rule('boss', 30, senders=['boss@company.com']),
+        ]})
+        
+        # Header rule first: decided without the body
+        assert rules.evaluate_headers("Hi", "x@example.com", False, {'list-id': 'a'}).name == 'list'
+        # A keyword rule outranks the sender rule, and only the body can rule it out
+        assert rules.evaluate_headers("Hi", "boss@company.com", False, {}) is None
+        # ... unless the subject already matches it
+        assert rules.evaluate_headers("Verification code", "boss@company.com", False, {}).name == 'otp'
+        # Headers not fetched: the header rule is undecided
+        assert rules.evaluate_headers("Verification code", "x@example.com", False, None) is None
+        
+        only_senders = RuleSet({'rules': [_rule('boss', 30, senders=['boss@company.com'])]})
+        assert only_senders.evaluate_headers("Hi", "boss@company.com", False, None).name == 'boss'
+        assert only_senders.evaluate_headers("Hi", "x@example.com", False, None).name == 'default'
+    
+    def test_conditions_and_priority(self):
+        """All conditions of a rule must hold; the lowest priority wins."""
+        rules = RuleSet({'rules': [
+            _rule('bank', 20, senders=['@bank.example']),
+            _rule('bank_alert', 10, senders=['@bank.example'], keywords=['alert']),
+            _rule('boss', 30, senders=['boss@company.com']),
+            _rule('known', 40, senders=['$known_contacts']),
+        ]})
+        
+        assert rules.evaluate("Account alert", "no-reply@bank.example", False).name == 'bank_alert'
+        assert rules.evaluate("Statement", "no-reply@bank.example", False).name == 'bank'
+        assert rules.evaluate("Hi", "boss@company.com", False).name == 'boss'
+        assert rules.evaluate("Hi", "friend@example.com", True).name == 'known'
+        assert rules.evaluate("Hi", "friend@example.com", False).name == 'default'
+        assert rules.folders == {'Bank', 'Bank_Alert', 'Boss', 'Known', 'Archive'}
+        
+        wildcard = RuleSet({'rules': [_rule('bank', 10, senders=['@*.bank.example'])]})
+        assert wildcard.evaluate("Hi", "alerts@mail.bank.example", False).name == 'bank'
+        assert wildcard.evaluate("Hi", "alerts@bank.example", False).name == 'default'
+    
+    def test_header_conditions(self):
+        """Headers can be required present, absent or matching a regex."""
+        rules = RuleSet({'rules': [
+            _rule('list', 10, headers={'List-Unsubscribe': True, 'Precedence': 'bulk|list'}),
+            _rule('direct', 20, headers={'List-Id': False}),
+        ]})
+        
+        headers = {'list-unsubscribe': '<mailto:u@example.com>', 'precedence': 'Bulk'}
+        assert rules.evaluate("", "", False, headers).name == 'list'
+        assert rules.evaluate("", "", False, {'list-unsubscribe': '<x>'}).name == 'direct'
+        assert rules.evaluate("", "", False, {'list-id': 'x'}).name == 'default'
+    
+    def test_custom_rules_in_triage(self, tmp_path):
+        """TriageTask results carry the rule's category, action and folder."""
+        path = str(tmp_path / 'rules.json')
+        _write(path, {'rules': [_rule('invoices', 10, patterns=[r'INV-\d+'])]})
+        triage = TriageTask([], rules=RuleSource(path))
+        
+        result = triage.run({'subject': 'Your inv-2041', 'sender': 'a@b.c', 'body': ''})
+        repeat = triage.run({'subject': 'inv-7', 'sender': 'a@b.c', 'body': ''})
+        
+        assert (result.category, result.folder) == ('INVOICES', 'Invoices')
+        assert repeat is result
+    
+    @pytest.mark.parametrize('rules', [
+        {'rules': [_rule('a', 1, patterns=['(unclosed'])]},
+        {'rules': [_rule('a', 1, keywords=['x']), _rule('a', 2, keywords=['y'])]},
+        {'rules': [_rule('a', 1)]},
+        {'rules': [_rule('a', 1, keywords='x')]},
+        {'rules': [_rule('a', 1, headers={'X-Spam': 1})]},
+        {'rules': [_rule('a', 1, senders=['@not a domain'])]},
+        {'rules': [_rule('a', 1, patterns=['(?i)invoice #\\d+'])]},
+        {'rules': [_rule('a', 1, patterns=['(\\w)\\1'])]},
+        {'rules': [_rule('a', 1, patterns=['(?P<n>x)y']), _rule('b', 2, patterns=['(?P<n>z)y'])]},
+        {'rules': [{'name': 'a', 'keywords': ['x']}]},
+        {'rules': {}},
+    ])
+    def test_invalid_rules(self, rules):
+        """Malformed rules are rejected with RuleError."""
+        with pytest.raises(RuleError):
+            RuleSet(rules)
+    
+    def test_incremental_recompile(self):
+        """Unchanged rules and text conditions are reused from the previous rule set."""
+        first = RuleSet(DEFAULT_RULES)
+        data = copy.deepcopy(DEFAULT_RULES)
+        data['rules'][-1]['folder'] = 'Deals'
+        
+        second = RuleSet(data, previous=first)
+        
+        assert second.matcher is first.matcher
+        assert second.rules[0] is first.rules[0]
+        assert second.rules[-1] is not first.rules[-1]
+        assert second.version != first.version
+        
+        data['rules'][-1]['keywords'].append('clearance')
+        third = RuleSet(data, previous=second)
+        assert third.matcher is not second.matcher
+    
+    def test_scan_matches_full_evaluation(self, known_contacts):
+        """Windowed scanning decides like a full scan, whatever the window size."""
+        rules = RuleSet(DEFAULT_RULES)
+        emails = [parse_raw_message(raw) for kind in build_corpus(per_kind=3, scale=4).values() for raw in kind]
+        
+        for email in emails:
+            address = email['sender'].lower()
+            expected = rules.evaluate(f"{email['subject']} {email['body']}", address, False)
+            for window in (64, 1000, 16384):
+                assert rules.evaluate_scan(email['subject'], email['body'], address, False,
+                                           window=window) is expected
+    
+    def test_scan_stops_early(self):
+        """Once a higher-priority rule is certain, the rest of the body is not searched."""
+        rules = RuleSet(DEFAULT_RULES)
+        body = "Your verification code is 482913. " + "Lorem ipsum dolor sit amet. " * 20000
+        
+        with patch.object(rules.matcher, 'search', wraps=rules.matcher.search) as search:
+            assert rules.evaluate_scan("Sign-in", body, "x@example.com", False, window=4096).name == 'otp'
+        
+        assert sum(len(call.args[0]) for call in search.call_args_list) < 8192
+    
+    def test_scan_cap(self):
+        """Text past max_body_chars is ignored, and the cap does not cut numbers."""
+        rules = RuleSet(DEFAULT_RULES)
+        body = "Hello there. " * 100 + "Unsubscribe here."
+        
+        assert rules.evaluate_scan("Hi", body, "x@example.com", False).name == 'newsletter'
+        assert rules.evaluate_scan("Hi", body, "x@example.com", False, max_body_chars=500).name == 'default'
+        
+        number = "Ticket " + "1" * 10
+        assert rules.evaluate_scan("Hi", number, "x@example.com", False, max_body_chars=12).name == 'default'
+
+
+class TestRuleSource:
+    """Test cases for the reloading rule file."""
+    
+    def test_creates_default_file(self, tmp_path):
+        """A missing rule file is written from the built-in rules."""
+        path = str(tmp_path / 'rules.json')
+        
+        source = RuleSource(path)
+        
+        with open(path, encoding='utf-8') as f:
+            assert json.load(f) == DEFAULT_RULES
+        assert source.current().version == RuleSet(DEFAULT_RULES).version
+        assert os.path.exists(path + '.cache')
+    
+    def test_hot_reload(self, tmp_path):
+        """Edits are picked up; broken edits keep the previous rules."""
+        path = str(tmp_path / 'rules.json')
+        _write(path, {'rules': [_rule('a', 1, keywords=['alpha'])]})
+        source = RuleSource(path, check_interval=0)
+        triage = TriageTask([], rules=source)
+        version = triage.rules_version
+        assert triage.run({'subject': 'alpha beta'}).category == 'A'
+        
+        _write(path, {'rules': [_rule('b', 1, keywords=['beta'])]})
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+        assert triage.run({'subject': 'alpha beta'}).category == 'B'
+        assert triage.rules_version != version
+        assert source.reloads == 1
+        
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"rules": [')
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2 * 10 ** 9))
+        assert triage.run({'subject': 'alpha beta'}).category == 'B'
+        assert source.last_error
+        
+        # Valid alone, but not inside the combined pattern
+        _write(path, {'rules': [_rule('c', 1, patterns=['(?i)invoice #\\d+'])]})
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 3 * 10 ** 9))
+        assert triage.run({'subject': 'alpha beta'}).category == 'B'
+        assert 'global flags' in source.last_error
+    
+    def test_check_interval(self, tmp_path):
+        """The file is not checked again within the interval."""
+        path = str(tmp_path / 'rules.json')
+        source = RuleSource(path, check_interval=3600)
+        
+        with patch('utils.triage_rules.os.stat') as stat:
+            source.current()
+        
+        stat.assert_not_called()
+    
+    def test_compiled_cache(self, tmp_path):
+        """A restart with an unchanged file loads the compiled rules from disk."""
+        path = str(tmp_path / 'rules.json')
+        version = RuleSource(path).current().version
+        
+        with patch('utils.triage_rules._validate', side_effect=AssertionError("recompiled")):
+            assert RuleSource(path).current().version == version
+        
+        # A stale cache (different file contents) is ignored
+        _write(path, {'rules': [_rule('a', 1, keywords=['alpha'])]})
+        assert RuleSource(path).current().rules[0].name == 'a'
@@ -0,0 +1,161 @@
+"""
+Bulk Processing
+
+Parse, decode and triage large numbers of raw messages on a process pool,
+for backfills of whole folders or mbox archives.
+"""
+
+import mailbox
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+from .email_parsing import extract_text_body, message_fields, parse_message
+from .mailbuddy_triage import EmailTriageResult, TriageTask
+from .triage_rules import RuleSource
+
+RawMessage = Union[bytes, Tuple[str, bytes]]
+ProcessedMessage = Tuple[dict, EmailTriageResult]
+
+# TriageTask of a worker process, built once by the pool initializer
+_worker_triage: Optional[TriageTask] = None
+
+
+def _make_triage(known_contacts: List[str], rules_path: Optional[str]) -> TriageTask:
+    # Workers load the compiled rules from the on-disk cache
+    rules = RuleSource(rules_path) if rules_path else None
+    return TriageTask(known_contacts, rules=rules)
+
+
+def _init_worker(known_contacts: List[str], rules_path: Optional[str] = None):
+    global _worker_triage
+    _worker_triage = _make_triage(known_contacts, rules_path)
+
+
+def parse_raw_message(raw: bytes) -> dict:
+    """
+    Parse and decode one raw RFC822 message.
+
+    Args:
+        raw: Raw message bytes
+
+    Returns:
+        Email dictionary with 'subject', 'sender', 'date', 'message_id' and 'body'
+    """
+    msg = parse_message(raw)
+    email_dict = message_fields(msg)
+    email_dict['body'] = extract_text_body(msg)
+    return email_dict
+
+
+def _process_chunk(chunk: List[RawMessage], triage: Optional[TriageTask] = None) -> List[ProcessedMessage]:
+    """Parse and triage a chunk of messages (in a worker, or in-process)."""
+    triage = triage or _worker_triage
+    results = []
+    for item in chunk:
+        key, raw = item if isinstance(item, tuple) else (None, item)
+        try:
+            email_dict = parse_raw_message(raw)
+        except Exception as e:
+            email_dict = {'subject': '', 'sender': '', 'date': '', 'message_id': '', 'body': '',
+                          'error': str(e)}
+        if key is not None:
+            email_dict['id'] = key
+        results.append((email_dict, triage.run(email_dict)))
+    return results
+
+
+def _chunks(items: Iterable[RawMessage], size: int) -> Iterator[List[RawMessage]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_mbox(path: str) -> Iterator[Tuple[str, bytes]]:
+    """
+    Read the raw messages of an mbox file.
+
+    Args:
+        path: Path to the mbox file
+
+    Yields:
+        (key, raw message) pairs in file order
+    """
+    box = mailbox.mbox(path, create=False)
+    try:
+        for key in box.iterkeys():
+            yield str(key), box.get_bytes(key)
+    finally:
+        box.close()
+
+
+class BulkProcessor:
+    """
+    Fans parsing, decoding and triage of raw messages out to a process pool.
+
+    Messages are submitted in chunks (one task per chunk keeps pickling and
+    scheduling overhead small) and at most ``max_pending`` chunks are in
+    flight, so a generator over a huge folder or mbox is consumed at the pace
+    of the workers rather than read into memory. Results come back in input
+    order.
+    """
+
+    def __init__(self, known_contacts: List[str], workers: Optional[int] = None,
+                 chunk_size: int = 64, max_pending: Optional[int] = None,
+                 rules_path: Optional[str] = None):
+        """
+        Initialize the processor.
+
+        Args:
+            known_contacts: Known contact addresses for triage
+            workers: Worker processes (None for one per CPU; 0 or 1 runs in-process)
+            chunk_size: Messages per submitted task
+            max_pending: Chunks in flight at once (default: twice the workers)
+            rules_path: Triage rule file (default: the built-in rules)
+        """
+        self.known_contacts = list(known_contacts)
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 2 * max(self.workers, 1)
+        self.rules_path = rules_path
+
+    def process(self, messages: Iterable[RawMessage]) -> Iterator[ProcessedMessage]:
+        """
+        Parse and triage messages.
+
+        Args:
+            messages: Raw message bytes, or (key, bytes) pairs such as those
+                from ``iter_mbox`` or ``EmailFolderManager.iter_raw_messages``;
+                the key is returned as the record's 'id'
+
+        Yields:
+            (email_dict, triage result) pairs, in input order
+        """
+        chunks = _chunks(messages, self.chunk_size)
+
+        if self.workers <= 1:
+            triage = _make_triage(self.known_contacts, self.rules_path)
+            for chunk in chunks:
+                yield from _process_chunk(chunk, triage)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.known_contacts, self.rules_path)) as pool:
+            pending = deque()
+            try:
+                for chunk in chunks:
+                    pending.append(pool.submit(_process_chunk, chunk))
+                    if len(pending) >= self.max_pending:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                # The consumer stopped early; don't finish work nobody will read
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,183 @@
+"""
+Contact Index
+
+Known-contact lookup that covers whole organisations with one entry:
+
+- ``boss@company.com``: that address
+- ``@company.com`` (or ``company.com``): every address at that domain
+- ``@*.company.com`` (or ``*.company.com``): every address at a subdomain,
+  e.g. ``eng.company.com`` but not ``company.com`` itself
+
+Domains are kept in a trie keyed by their labels in reverse order (com ->
+company -> eng), so a lookup walks the sender's domain once, whatever the
+number of entries.
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+_DOMAIN_PATTERN = re.compile(r'^(\*\.)?[a-z0-9-]+(\.[a-z0-9-]+)+$')
+
+
+def normalize_entry(entry: str) -> Optional[str]:
+    """
+    Canonical form of a contact entry.
+
+    Args:
+        entry: Address, domain or subdomain wildcard, in any of the accepted forms
+
+    Returns:
+        'user@domain', '@domain' or '@*.domain', or None if the entry is invalid
+    """
+    entry = entry.strip().lower()
+    if '@' in entry and not entry.startswith('@'):
+        # Addresses are taken as given (lowercased), like the contacts file always was
+        return entry
+    domain = entry.lstrip('@')
+    if not _DOMAIN_PATTERN.match(domain):
+        return None
+    return '@' + domain
+
+
+class _Node:
+    """One domain label in the trie."""
+
+    __slots__ = ('children', 'domain', 'subdomains')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        # An '@domain' entry ends here / an '@*.domain' entry covers the labels below
+        self.domain = False
+        self.subdomains = False
+
+
+class ContactIndex:
+    """
+    Known contacts: exact addresses, whole domains and subdomain wildcards.
+
+    Supports ``address in index``, ``len()`` and iteration over the
+    (canonical) entries, so it can stand in for the plain set of
+    addresses triage used before.
+    """
+
+    def __init__(self, entries: Iterable[str] = ()):
+        """
+        Build the index.
+
+        Args:
+            entries: Contact entries; invalid ones are skipped
+        """
+        self._addresses: Set[str] = set()
+        self._domains: Set[str] = set()
+        self._root = _Node()
+        self._digest: Optional[str] = None
+        for entry in entries:
+            self.add(entry)
+
+    @staticmethod
+    def _labels(domain: str) -> List[str]:
+        return domain.split('.')[::-1]
+
+    def add(self, entry: str) -> bool:
+        """
+        Add an address, domain or wildcard.
+
+        Args:
+            entry: Contact entry
+
+        Returns:
+            True if the entry is valid
+        """
+        entry = normalize_entry(entry)
+        if entry is None:
+            return False
+        self._digest = None
+        if not entry.startswith('@'):
+            self._addresses.add(entry)
+            return True
+
+        self._domains.add(entry)
+        wildcard = entry.startswith('@*.')
+        node = self._root
+        for label in self._labels(entry[3:] if wildcard else entry[1:]):
+            node = node.children.setdefault(label, _Node())
+        if wildcard:
+            node.subdomains = True
+        else:
+            node.domain = True
+        return True
+
+    def remove(self, entry: str) -> bool:
+        """
+        Remove an entry.
+
+        Args:
+            entry: Contact entry, as added
+
+        Returns:
+            True if it was present
+        """
+        entry = normalize_entry(entry)
+        if entry is None:
+            return False
+        self._digest = None
+        if not entry.startswith('@'):
+            if entry not in self._addresses:
+                return False
+            self._addresses.discard(entry)
+            return True
+        if entry not in self._domains:
+            return False
+
+        self._domains.discard(entry)
+        wildcard = entry.startswith('@*.')
+        path = [self._root]
+        labels = self._labels(entry[3:] if wildcard else entry[1:])
+        for label in labels:
+            path.append(path[-1].children[label])
+        if wildcard:
+            path[-1].subdomains = False
+        else:
+            path[-1].domain = False
+        # Prune labels that no longer lead to an entry
+        for label, parent, node in zip(reversed(labels), reversed(path[:-1]), reversed(path[1:])):
+            if node.children or node.domain or node.subdomains:
+                break
+            del parent.children[label]
+        return True
+
+    @property
+    def digest(self) -> str:
+        """Short fingerprint of the entries (computed once per change)."""
+        if self._digest is None:
+            self._digest = hashlib.sha1(json.dumps(sorted(self)).encode('utf-8')).hexdigest()[:16]
+        return self._digest
+
+    def __contains__(self, address) -> bool:
+        """Whether an address (lowercase) is a known contact."""
+        if address in self._addresses:
+            return True
+        if not isinstance(address, str):
+            return False
+        _, at, domain = address.rpartition('@')
+        if not at or not domain or not self._root.children:
+            return False
+
+        node = self._root
+        labels = self._labels(domain)
+        for depth, label in enumerate(labels):
+            node = node.children.get(label)
+            if node is None:
+                return False
+            if node.subdomains and depth < len(labels) - 1:
+                return True
+        return node.domain
+
+    def __len__(self) -> int:
+        return len(self._addresses) + len(self._domains)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._addresses
+        yield from self._domains
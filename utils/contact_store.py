@@ -0,0 +1,217 @@
+"""
+Contact Store
+
+Persistent store of known contacts backed by SQLite, replacing whole-file
+rewrites of data/known_contacts.json.
+
+The store (data/contacts.sqlite3) is the source of truth. The JSON file is
+only read, and merged into the store, when it was modified since its last
+import; the app never writes it.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+
+def get_store_file_path() -> str:
+    """Get the path to the default contact store database."""
+    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(current_dir, "data", "contacts.sqlite3")
+
+
+def _clean(entries: Iterable[str]) -> List[Tuple[str]]:
+    """Entries as parameter rows, lowercased and stripped like the JSON file always was."""
+    rows = []
+    for entry in entries:
+        entry = entry.lower().strip()
+        if entry:
+            rows.append((entry,))
+    return rows
+
+
+class ContactStore:
+    """
+    Known contact entries (addresses, '@domain', '@*.domain') in SQLite.
+
+    Each entry is a primary-key row, so adding, removing or looking up one
+    entry touches one row instead of rewriting the list, and every write is
+    its own transaction. One connection is shared by the UI and monitor
+    threads under a lock; other processes can use the same file (WAL mode).
+    """
+
+    def __init__(self, path: Optional[str] = None, migrate_from: Optional[str] = None):
+        """
+        Open (or create) the contact store.
+
+        Args:
+            path: SQLite file path (default: data/contacts.sqlite3),
+                or ":memory:" for a throwaway store
+            migrate_from: known_contacts.json file imported when the store is
+                created and again whenever the file is modified (see sync_json)
+        """
+        self.path = path or get_store_file_path()
+        self.migrate_from = migrate_from
+        self.lock = threading.Lock()
+        # Writes through this connection; PRAGMA data_version covers other connections
+        self._writes = 0
+        # JSON file modification time last seen by sync_json() (None: no file, -1: not checked yet)
+        self._json_mtime: Optional[int] = -1
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS contacts (
+                entry TEXT PRIMARY KEY
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.db.commit()
+        self.sync_json()
+
+    def sync_json(self) -> int:
+        """
+        Import the JSON contacts file if it was modified since it was last imported.
+
+        Entries are merged into the store: contacts added in the app are
+        kept, and deleting a line from the file does not remove a contact.
+        Cheap when nothing changed (one stat), so it can be called per read.
+
+        Returns:
+            Number of new contacts
+        """
+        if not self.migrate_from:
+            return 0
+        try:
+            mtime = os.stat(self.migrate_from).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._json_mtime:
+            return 0
+
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'json_mtime'").fetchone()
+            # Any change of modification time counts (a copied file may keep an older one)
+            if row is not None and (mtime is None or mtime == int(row[0])):
+                self._json_mtime = mtime
+                return 0
+            entries = []
+            if mtime is not None:
+                try:
+                    with open(self.migrate_from, 'r', encoding='utf-8') as f:
+                        entries = json.load(f).get("known_contacts", [])
+                except (json.JSONDecodeError, IOError, AttributeError) as e:
+                    # Not marked as imported; retried once the file changes or on restart
+                    print(f"Error importing contacts from {self.migrate_from}: {e}")
+                    self._json_mtime = mtime
+                    return 0
+            with self.db:
+                before = self.db.total_changes
+                self.db.executemany("INSERT OR IGNORE INTO contacts (entry) VALUES (?)", _clean(entries))
+                added = self.db.total_changes - before
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_mtime', ?)",
+                                (str(mtime or 0),))
+            self._json_mtime = mtime
+            if added:
+                self._writes += 1
+        if row is not None and added:
+            print(f"Imported {added} new contacts from {self.migrate_from}")
+        return added
+
+    def revision(self) -> Tuple[int, int]:
+        """Changes whenever the contacts change, through this store or another connection."""
+        with self.lock:
+            return self._writes, self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def add(self, entry: str) -> bool:
+        """
+        Add one entry.
+
+        Args:
+            entry: Address or domain entry
+
+        Returns:
+            True if it was not already present
+        """
+        return self.add_many([entry]) > 0
+
+    def add_many(self, entries: Iterable[str]) -> int:
+        """
+        Add entries in one transaction (bulk import).
+
+        Args:
+            entries: Addresses or domain entries
+
+        Returns:
+            Number of entries that were not already present
+        """
+        rows = _clean(entries)
+        with self.lock:
+            with self.db:
+                before = self.db.total_changes
+                self.db.executemany("INSERT OR IGNORE INTO contacts (entry) VALUES (?)", rows)
+                added = self.db.total_changes - before
+            if added:
+                self._writes += 1
+            return added
+
+    def remove(self, entry: str) -> bool:
+        """
+        Remove one entry.
+
+        Args:
+            entry: Address or domain entry, as added
+
+        Returns:
+            True if it was present
+        """
+        with self.lock:
+            with self.db:
+                cursor = self.db.execute("DELETE FROM contacts WHERE entry = ?", (entry.lower().strip(),))
+            if cursor.rowcount:
+                self._writes += 1
+            return cursor.rowcount > 0
+
+    def replace(self, entries: Iterable[str]):
+        """
+        Replace all entries in one transaction.
+
+        Args:
+            entries: The new contact list
+        """
+        rows = _clean(entries)
+        with self.lock:
+            with self.db:
+                self.db.execute("DELETE FROM contacts")
+                self.db.executemany("INSERT OR IGNORE INTO contacts (entry) VALUES (?)", rows)
+            self._writes += 1
+
+    def all(self) -> List[str]:
+        """All entries, sorted."""
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT entry FROM contacts ORDER BY entry")]
+
+    def __contains__(self, entry) -> bool:
+        """Whether an exact entry is stored (domain matching is ContactIndex's job)."""
+        if not isinstance(entry, str):
+            return False
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM contacts WHERE entry = ?",
+                                   (entry.lower().strip(),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        with self.lock:
+            self.db.close()
@@ -1,90 +1,163 @@
-
-import json
 import os
-from typing import List
+import sqlite3
+import threading
+from typing import FrozenSet, Iterable, List, Optional, Tuple
+
+from .contact_index import ContactIndex
+from .contact_store import ContactStore
+
+
+class _ContactsCache:
+    """The shared contact store, and the contacts read from it at a given revision."""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.store: Optional[ContactStore] = None
+        self.revision: Optional[Tuple[int, int]] = None
+        self.contacts: FrozenSet[str] = frozenset()
+        self.index: Optional[ContactIndex] = None
+
+
+# Shared by every caller in the process (Streamlit reruns, the monitor thread)
+_cache = _ContactsCache()
 
 
 def get_contacts_file_path() -> str:
-    """Get the path to the known contacts JSON file."""
+    """Get the path to the known contacts JSON file (merged into the store when modified)."""
     current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(current_dir, "data", "known_contacts.json")
 
 
-def load_contacts() -> List[str]:
+def get_contact_store() -> ContactStore:
     """
-    Load known contacts from JSON file.
+    Shared contact store, opened on first use.
+    
+    The store lives next to the JSON file (data/contacts.sqlite3) and is the
+    source of truth; known_contacts.json is merged into it when created and
+    whenever the file is modified afterwards.
     
     Returns:
-        List of email addresses (lowercase)
+        ContactStore
     """
-    file_path = get_contacts_file_path()
+    with _cache.lock:
+        if _cache.store is None:
+            file_path = get_contacts_file_path()
+            store_path = os.path.join(os.path.dirname(file_path), "contacts.sqlite3")
+            _cache.store = ContactStore(store_path, migrate_from=file_path)
+        return _cache.store
+
+
+def get_known_contacts() -> FrozenSet[str]:
+    """
+    Known contacts, read from the store only when they changed.
     
-    if not os.path.exists(file_path):
-        # Create default empty file
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        save_contacts([])
-        return []
+    The store's revision (and the JSON file's modification time) is checked
+    on every call; the contacts are read again only if it differs from the
+    last read.
+    
+    Returns:
+        Frozenset of contact entries (lowercase)
+    """
+    store = get_contact_store()
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            contacts = data.get("known_contacts", [])
-            # Normalize to lowercase
-            return [email.lower().strip() for email in contacts]
-    except (json.JSONDecodeError, IOError) as e:
+        # Edits to known_contacts.json are merged in; no-op unless the file changed
+        store.sync_json()
+        # Taken before reading, so a write in between causes a re-read, not a stale cache
+        revision = store.revision()
+        with _cache.lock:
+            if _cache.revision == revision:
+                return _cache.contacts
+        contacts = frozenset(store.all())
+    except sqlite3.Error as e:
         print(f"Error loading contacts: {e}")
-        return []
+        return frozenset()
+    
+    with _cache.lock:
+        _cache.revision = revision
+        _cache.contacts = contacts
+        _cache.index = None
+    return contacts
+
+
+def get_contact_index() -> ContactIndex:
+    """
+    Known contacts as a ContactIndex, rebuilt only when they changed.
+    
+    Returns:
+        Shared ContactIndex (do not modify; use add_contact/remove_contact)
+    """
+    contacts = get_known_contacts()
+    with _cache.lock:
+        if _cache.contacts is not contacts:
+            # Changed again since; don't cache an index of the older list
+            return ContactIndex(contacts)
+        if _cache.index is None:
+            _cache.index = ContactIndex(contacts)
+        return _cache.index
+
+
+def load_contacts() -> List[str]:
+    """
+    Load known contacts.
+    
+    Returns:
+        List of email addresses (lowercase, sorted)
+    """
+    return sorted(get_known_contacts())
 
 
-def save_contacts(contacts: List[str]) -> bool:
+def save_contacts(contacts: Iterable[str]) -> bool:
     """
-    Save known contacts to JSON file.
+    Replace the known contacts.
     
     Args:
-        contacts: List of email addresses
-        
+        contacts: Email addresses (or domain entries)
+    
     Returns:
         True if successful, False otherwise
     """
-    file_path = get_contacts_file_path()
-    
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Normalize and deduplicate
-        normalized = list(set(email.lower().strip() for email in contacts))
-        
-        data = {
-            "known_contacts": sorted(normalized)
-        }
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
-        
+        get_contact_store().replace(contacts)
         return True
-    except IOError as e:
+    except sqlite3.Error as e:
         print(f"Error saving contacts: {e}")
         return False
 
 
+def import_contacts(contacts: Iterable[str]) -> int:
+    """
+    Add many contacts in one transaction.
+    
+    Args:
+        contacts: Email addresses (or domain entries)
+    
+    Returns:
+        Number of new contacts, or -1 on error
+    """
+    try:
+        return get_contact_store().add_many(contacts)
+    except sqlite3.Error as e:
+        print(f"Error importing contacts: {e}")
+        return -1
+
+
 def add_contact(email: str) -> bool:
     """
     Add a contact to the known contacts list.
     
     Args:
         email: Email address to add
-        
+    
     Returns:
         True if successful, False otherwise
     """
-    contacts = load_contacts()
-    email = email.lower().strip()
-    
-    if email not in contacts:
-        contacts.append(email)
-        return save_contacts(contacts)
-    
-    return True
+    try:
+        get_contact_store().add(email)
+        return True
+    except sqlite3.Error as e:
+        print(f"Error saving contacts: {e}")
+        return False
 
 
 def remove_contact(email: str) -> bool:
@@ -93,15 +166,13 @@ def remove_contact(email: str) -> bool:
     
     Args:
         email: Email address to remove
-        
+    
     Returns:
         True if successful, False otherwise
     """
-    contacts = load_contacts()
-    email = email.lower().strip()
-    
-    if email in contacts:
-        contacts.remove(email)
-        return save_contacts(contacts)
-    
-    return True
+    try:
+        get_contact_store().remove(email)
+        return True
+    except sqlite3.Error as e:
+        print(f"Error saving contacts: {e}")
+        return False
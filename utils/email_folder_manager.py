@@ -6,8 +6,21 @@ Manages email folders and moving messages using IMAP.
 
 import imaplib
 import email
-from typing import List, Tuple, Optional
-from email.header import decode_header
+import email.message
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional, Union
+
+from .email_record import EmailRecord
+from .message_cache import MessageCache
+from .imap_pool import IMAPConnectionPool, PooledConnection
+from .imap_protocol import (
+    BodyPart, build_message_set, find_text_part, parse_fetch_response,
+    get_fetch_item, get_fetch_section, parse_vanished
+)
+from .email_parsing import (
+    decode_body_part, decode_header_value, extract_text_body, html_to_text, message_fields,
+    parse_headers, parse_message, SIGNAL_HEADERS
+)
+from .mailbox_sync import FolderChanges
 
 
 class EmailFolderManager:
@@ -22,8 +35,14 @@ class EmailFolderManager:
         "OTHER": "Archive"
     }
     
+    # Headers requested by header-only fetches: the list-view fields, plus the
+    # bulk-mail signals triage can classify on without the body
+    HEADER_FIELDS = ("FROM", "SUBJECT", "DATE", "MESSAGE-ID") + tuple(h.upper() for h in SIGNAL_HEADERS)
+    
     def __init__(self, email_address: str, password: str, 
-                 imap_server: str = "imap.gmail.com", imap_port: int = 993):
+                 imap_server: str = "imap.gmail.com", imap_port: int = 993,
+                 cache: Optional[MessageCache] = None, pool_size: int = 4,
+                 body_max_bytes: Optional[int] = None):
         """
         Initialize the email folder manager.
         
@@ -32,12 +51,40 @@ class EmailFolderManager:
             password: App password for IMAP authentication
             imap_server: IMAP server hostname
             imap_port: IMAP server port (default: 993 for SSL)
+            cache: Local message cache consulted before fetching message data
+            pool_size: Maximum number of concurrent IMAP connections
+            body_max_bytes: Cap on the bytes downloaded per lazily loaded body
+                (None downloads the whole text part)
         """
         self.email_address = email_address
         self.password = password
         self.imap_server = imap_server
         self.imap_port = imap_port
+        self.cache = cache
+        self.cache_account = f"{email_address}|{imap_server}:{imap_port}"
+        self.pool_size = pool_size
+        self.body_max_bytes = body_max_bytes
         self.mail = None
+        self.pool: Optional[IMAPConnectionPool] = None
+        # Folder refresh positions, (uidvalidity, highestmodseq); kept in the cache when there is one
+        self.folder_states: Dict[str, Tuple[int, Optional[int]]] = {}
+    
+    def open_connection(self) -> imaplib.IMAP4:
+        """
+        Open a new logged-in IMAP connection.
+        
+        Used by the connection pool and for dedicated connections such as the
+        one the inbox monitor keeps in IDLE.
+        
+        Returns:
+            Logged-in IMAP4_SSL connection
+            
+        Raises:
+            Exception: If the connection or login fails
+        """
+        conn = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
+        conn.login(self.email_address, self.password)
+        return conn
     
     def connect(self) -> bool:
         """
@@ -47,8 +94,8 @@ class EmailFolderManager:
             True if connection successful, False otherwise
         """
         try:
-            self.mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port)
-            self.mail.login(self.email_address, self.password)
+            self.mail = self.open_connection()
+            self.pool = self._create_pool()
             return True
         except Exception as e:
             print(f"IMAP connection error: {e}")
@@ -56,51 +103,95 @@ class EmailFolderManager:
     
     def disconnect(self):
         """Disconnect from IMAP server."""
-        if self.mail:
+        if self.pool:
+            # Logs out of every pooled connection, including self.mail
+            self.pool.close()
+            self.pool = None
+        elif self.mail:
             try:
                 self.mail.logout()
             except:
                 pass
-            self.mail = None
+        self.mail = None
+    
+    def _create_pool(self) -> IMAPConnectionPool:
+        """Create the connection pool, seeded with the login connection."""
+        return IMAPConnectionPool(self.open_connection, max_size=self.pool_size,
+                                  connections=[self.mail], on_connect=self._prepare_connection)
+    
+    def _prepare_connection(self, conn: PooledConnection):
+        """Enable QRESYNC/CONDSTORE on a new connection, if the server has them."""
+        conn.enable('QRESYNC', 'CONDSTORE')
+    
+    def _execute(self, operation, folder: Optional[str] = None, retries: int = 1):
+        """
+        Run an IMAP operation on a pooled connection.
+        
+        Each call checks out its own connection, so the UI thread and the
+        inbox monitor never interleave commands on one socket. A connection
+        that dropped is replaced and the operation retried.
+        
+        Args:
+            operation: Callable taking a PooledConnection
+            folder: Folder the operation works on
+            retries: Retries after a connection error (0 for non-idempotent operations)
+            
+        Returns:
+            Whatever the operation returns
+        """
+        if self.pool is None:
+            self.pool = self._create_pool()
+        return self.pool.execute(operation, folder=folder, retries=retries)
     
-    def ensure_folders_exist(self) -> bool:
+    def ensure_folders_exist(self, extra_folders: Iterable[str] = ()) -> bool:
         """
         Create triage folders if they don't exist.
         
+        Args:
+            extra_folders: Folders beyond the default mapping (e.g. from triage rules)
+        
         Returns:
             True if successful, False otherwise
         """
         if not self.mail:
             return False
         
+        folders = list(dict.fromkeys(list(self.DEFAULT_FOLDER_MAPPING.values()) + list(extra_folders)))
+        
+        def operation(conn: PooledConnection) -> bool:
+            return self._ensure_folders_exist(conn, folders)
+        
         try:
-            # List existing folders
-            result, folders = self.mail.list()
-            if result != 'OK':
-                return False
-            
-            existing_folders = set()
-            for folder in folders:
-                # Decode folder name
-                folder_str = folder.decode() if isinstance(folder, bytes) else folder
-                # Extract folder name (last part after delimiter)
-                parts = folder_str.split('"')
-                if len(parts) >= 3:
-                    existing_folders.add(parts[-2])
-            
-            # Create missing folders
-            for folder_name in self.DEFAULT_FOLDER_MAPPING.values():
-                if folder_name not in existing_folders:
-                    try:
-                        self.mail.create(folder_name)
-                    except Exception as e:
-                        print(f"Error creating folder {folder_name}: {e}")
-            
-            return True
+            return self._execute(operation)
         except Exception as e:
             print(f"Error ensuring folders exist: {e}")
             return False
     
+    def _ensure_folders_exist(self, conn: PooledConnection, folder_names: List[str]) -> bool:
+        # List existing folders
+        result, folders = conn.list()
+        if result != 'OK':
+            return False
+        
+        existing_folders = set()
+        for folder in folders:
+            # Decode folder name
+            folder_str = folder.decode() if isinstance(folder, bytes) else folder
+            # Extract folder name (last part after delimiter)
+            parts = folder_str.split('"')
+            if len(parts) >= 3:
+                existing_folders.add(parts[-2])
+        
+        # Create missing folders
+        for folder_name in folder_names:
+            if folder_name not in existing_folders:
+                try:
+                    conn.create(folder_name)
+                except imaplib.IMAP4.error as e:
+                    print(f"Error creating folder {folder_name}: {e}")
+        
+        return True
+    
     def decode_mime_header(self, header: str) -> str:
         """
         Decode MIME-encoded email header.
@@ -111,19 +202,60 @@ class EmailFolderManager:
         Returns:
             Decoded string
         """
-        if not header:
-            return ""
+        return decode_header_value(header)
+    
+    def _fetch_batch(self, conn: PooledConnection, uids: List,
+                     message_parts: str) -> Dict[int, Dict[str, object]]:
+        """
+        Fetch several messages with one UID FETCH command.
         
-        decoded_parts = decode_header(header)
-        result = []
+        The whole UID set (e.g. ``1:20`` or ``3,7,9``) is sent in a single
+        command and the interleaved untagged responses are split back up per
+        message, so N messages cost one round trip instead of N.
         
-        for part, encoding in decoded_parts:
-            if isinstance(part, bytes):
-                result.append(part.decode(encoding or 'utf-8', errors='ignore'))
-            else:
-                result.append(part)
+        Args:
+            conn: Connection with the folder selected
+            uids: Message UIDs to fetch
+            message_parts: FETCH item list, e.g. '(BODY.PEEK[])'
+            
+        Returns:
+            Dictionary mapping UID to its FETCH attributes
+        """
+        if not uids:
+            return {}
         
-        return ''.join(result)
+        result, msg_data = conn.uid('FETCH', build_message_set(uids), message_parts)
+        if result != 'OK':
+            return {}
+        
+        messages = {}
+        for _, attributes in parse_fetch_response(msg_data):
+            uid = attributes.get('UID')
+            if uid is not None:
+                messages.setdefault(uid, {}).update(attributes)
+        
+        return messages
+    
+    def _recent_uids(self, conn: PooledConnection, limit: int) -> Optional[List[int]]:
+        """
+        Find the UIDs of the newest messages in the selected folder.
+        
+        Args:
+            conn: Connection with the folder selected
+            limit: Maximum number of UIDs
+            
+        Returns:
+            Up to ``limit`` UIDs, most recent first, or None if the search failed
+        """
+        result, data = conn.uid('SEARCH', None, 'ALL')
+        if result != 'OK':
+            return None
+        
+        # UIDs are assigned in arrival order, so the highest are the newest
+        uids = sorted(int(uid) for uid in (data[0] or b'').split())
+        uids = uids[-limit:] if len(uids) > limit else uids
+        uids.reverse()
+        return uids
     
     def search_emails(self, folder: str = "INBOX", limit: int = 10) -> List[Tuple[str, str, str]]:
         """
@@ -134,50 +266,46 @@ class EmailFolderManager:
             limit: Maximum number of emails to return
             
         Returns:
-            List of tuples: (message_id, subject, sender)
+            List of tuples: (uid, subject, sender)
         """
         if not self.mail:
             return []
         
-        try:
+        def operation(conn: PooledConnection) -> List[Tuple[str, str, str]]:
             # Select folder
-            result, _ = self.mail.select(folder, readonly=True)
-            if result != 'OK':
+            if conn.select_folder(folder, readonly=True) is None:
                 return []
             
-            # Search for all emails
-            result, message_numbers = self.mail.search(None, 'ALL')
-            if result != 'OK':
+            # Get most recent messages (up to limit)
+            uids = self._recent_uids(conn, limit)
+            if not uids:
                 return []
             
-            # Get message IDs
-            msg_ids = message_numbers[0].split()
-            
-            # Get most recent messages (up to limit)
-            msg_ids = msg_ids[-limit:] if len(msg_ids) > limit else msg_ids
-            msg_ids.reverse()  # Most recent first
+            # Fetch just the two headers of all selected messages in a single round trip
+            messages = self._fetch_batch(conn, uids, '(UID BODY.PEEK[HEADER.FIELDS (SUBJECT FROM)])')
             
             emails = []
-            for msg_id in msg_ids:
+            for uid in uids:
                 try:
-                    # Fetch email
-                    result, msg_data = self.mail.fetch(msg_id, '(RFC822)')
-                    if result != 'OK':
+                    raw_email = get_fetch_section(messages.get(uid, {}), 'BODY[HEADER')
+                    if raw_email is None:
                         continue
                     
-                    # Parse email
-                    raw_email = msg_data[0][1]
-                    msg = email.message_from_bytes(raw_email)
+                    # Parse headers only
+                    msg = parse_headers(raw_email)
                     
                     subject = self.decode_mime_header(msg.get('Subject', 'No Subject'))
                     sender = self.decode_mime_header(msg.get('From', 'Unknown'))
                     
-                    emails.append((msg_id.decode(), subject, sender))
+                    emails.append((str(uid), subject, sender))
                 except Exception as e:
-                    print(f"Error fetching email {msg_id}: {e}")
+                    print(f"Error fetching email {uid}: {e}")
                     continue
             
             return emails
+        
+        try:
+            return self._execute(operation, folder)
         except Exception as e:
             print(f"Error searching emails: {e}")
             return []
@@ -187,39 +315,76 @@ class EmailFolderManager:
         Move an email from one folder to another.
         
         Args:
-            msg_id: Message ID to move
+            msg_id: UID of the message to move (the 'id' of fetched emails)
             from_folder: Source folder
             to_folder: Destination folder
             
         Returns:
             True if successful, False otherwise
         """
-        if not self.mail:
-            return False
+        return self.move_many([msg_id], from_folder, to_folder).get(to_folder, False)
+    
+    def move_many(self, uids: List, from_folder: str,
+                  to_folder: Union[str, Dict[str, str]]) -> Dict[str, bool]:
+        """
+        Move several messages, grouped by destination, by UID.
         
-        try:
-            # Select source folder
-            result, _ = self.mail.select(from_folder)
-            if result != 'OK':
-                return False
-            
-            # Copy to destination
-            result, _ = self.mail.copy(msg_id, to_folder)
-            if result != 'OK':
-                return False
+        Uses one ``UID MOVE`` per destination when the server supports MOVE
+        (RFC 6851). Otherwise each destination gets one ``UID COPY`` and one
+        ``UID STORE +FLAGS (\\Deleted)``, and a single expunge runs at the end:
+        ``UID EXPUNGE`` with UIDPLUS, plain EXPUNGE without it. UIDs do not
+        shift when messages are expunged, so the whole batch stays valid.
+        
+        Args:
+            uids: UIDs of the messages to move
+            from_folder: Source folder
+            to_folder: Destination folder, or dictionary mapping each UID to
+                its destination
+        
+        Returns:
+            Dictionary mapping each destination folder to whether its move succeeded
+        """
+        groups: Dict[str, List] = {}
+        for uid in uids:
+            destination = to_folder if isinstance(to_folder, str) else to_folder[uid]
+            groups.setdefault(destination, []).append(uid)
+        
+        if not self.mail or not groups:
+            return {destination: False for destination in groups}
+        
+        def operation(conn: PooledConnection) -> Dict[str, bool]:
+            if conn.select_folder(from_folder, readonly=False) is None:
+                return {destination: False for destination in groups}
             
-            # Mark as deleted in source
-            result, _ = self.mail.store(msg_id, '+FLAGS', '\\Deleted')
-            if result != 'OK':
-                return False
+            use_move = conn.has_capability('MOVE')
+            results = {}
+            deleted = []
+            for destination, group in groups.items():
+                message_set = build_message_set(group)
+                if use_move:
+                    result, _ = conn.uid('MOVE', message_set, destination)
+                else:
+                    result, _ = conn.uid('COPY', message_set, destination)
+                    if result == 'OK':
+                        result, _ = conn.uid('STORE', message_set, '+FLAGS.SILENT', '(\\Deleted)')
+                        if result == 'OK':
+                            deleted.extend(group)
+                results[destination] = result == 'OK'
             
-            # Expunge deleted messages
-            self.mail.expunge()
+            if deleted:
+                if conn.has_capability('UIDPLUS'):
+                    conn.uid('EXPUNGE', build_message_set(deleted))
+                else:
+                    conn.expunge()
             
-            return True
+            return results
+        
+        try:
+            # A repeated COPY could duplicate messages, so never retry
+            return self._execute(operation, from_folder, retries=0)
         except Exception as e:
-            print(f"Error moving email: {e}")
-            return False
+            print(f"Error moving emails: {e}")
+            return {destination: False for destination in groups}
     
     def get_folder_for_category(self, category: str) -> str:
         """
@@ -233,6 +398,18 @@ class EmailFolderManager:
         """
         return self.DEFAULT_FOLDER_MAPPING.get(category, "Archive")
     
+    def get_folder_for_result(self, result) -> str:
+        """
+        Folder a triage result should be moved to.
+        
+        Args:
+            result: EmailTriageResult
+            
+        Returns:
+            The folder set by the matching triage rule, or the category's default folder
+        """
+        return result.folder or self.get_folder_for_category(result.category)
+    
     def get_email_body(self, msg: email.message.Message) -> str:
         """
         Extract email body from message.
@@ -243,87 +420,576 @@ class EmailFolderManager:
         Returns:
             Email body as string
         """
-        body = ""
-        
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition"))
-                
-                # Get text content
-                if content_type == "text/plain" and "attachment" not in content_disposition:
-                    try:
-                        body = part.get_payload(decode=True).decode('utf-8', errors='ignore')
-                        break
-                    except:
-                        pass
+        return extract_text_body(msg)
+    
+    def _has_attachment(self, structure) -> bool:
+        """
+        Check a parsed BODYSTRUCTURE for attachment dispositions.
+        
+        Args:
+            structure: BODYSTRUCTURE as returned by parse_fetch_response
+            
+        Returns:
+            True if any part is marked as an attachment
+        """
+        if not isinstance(structure, list):
+            return False
+        if structure and isinstance(structure[0], str) and structure[0].lower() == 'attachment':
+            return True
+        return any(self._has_attachment(item) for item in structure)
+    
+    def _fetch_text_part(self, conn: PooledConnection, uid: str, part: Optional[BodyPart],
+                         max_bytes: Optional[int]) -> Optional[Tuple[str, bool]]:
+        """
+        Download only the text section of a message.
+        
+        Args:
+            conn: Connection with the folder selected
+            uid: UID of the message
+            part: Text part from an earlier BODYSTRUCTURE (None fetches it first)
+            max_bytes: Partial-fetch cap on the section (None for all of it)
+            
+        Returns:
+            Decoded body ("" if the message has no text part) and whether it
+            is complete (not cut short by ``max_bytes``), or None if the
+            server did not return the structure or section
+        """
+        if part is None:
+            messages = self._fetch_batch(conn, [uid], '(UID BODYSTRUCTURE)')
+            structure = messages.get(int(uid), {}).get('BODYSTRUCTURE')
+            if not isinstance(structure, list):
+                return None
+            part = find_text_part(structure)
+            if part is None:
+                return "", True
+        
+        item = f'BODY.PEEK[{part.section}]'
+        if max_bytes:
+            if part.encoding == 'base64':
+                max_bytes -= max_bytes % 4
+            item += f'<0.{max_bytes}>'
+        messages = self._fetch_batch(conn, [uid], f'(UID {item})')
+        data = get_fetch_item(messages.get(int(uid), {}),
+                              f'BODY[{part.section}]', f'BODY[{part.section}]<0>')
+        if data is None:
+            return None
+        
+        # Less than asked for means the server had no more
+        complete = not max_bytes or len(data) < max_bytes
+        body = decode_body_part(data, part.encoding, part.charset)
+        if part.subtype == 'html':
+            body = html_to_text(body)
+        return body.strip(), complete
+    
+    def load_email_body(self, folder: str, uid: str, max_bytes: Optional[int] = None,
+                        text_part: Optional[BodyPart] = None) -> str:
+        """
+        Download and decode the body of a single message.
+        
+        Used to fill in the body of header-only records on first access. Only
+        the text/plain part (or the text/html part, as a fallback) chosen from
+        the BODYSTRUCTURE is downloaded, so attachments never are.
+        
+        Args:
+            folder: Folder containing the message
+            uid: UID of the message within that folder
+            max_bytes: Download at most this many bytes of the text part
+            text_part: Text part already known from a BODYSTRUCTURE, saving a round trip
+            
+        Returns:
+            Email body as string (empty if unavailable)
+        """
+        return self._load_body(folder, uid, max_bytes, text_part)[0]
+    
+    def _load_body(self, folder: str, uid: str, max_bytes: Optional[int],
+                   text_part: Optional[BodyPart]) -> Tuple[str, bool]:
+        """load_email_body, also telling whether the body is complete (not cut short by max_bytes)."""
+        if not self.mail:
+            return "", False
+        
+        def operation(conn: PooledConnection) -> Tuple[str, bool]:
+            if conn.select_folder(folder, readonly=True) is None:
+                return "", False
+            loaded = self._fetch_text_part(conn, uid, text_part, max_bytes)
+            if loaded is not None:
+                return loaded
+            
+            # The server gave no usable structure; fall back to the whole message
+            messages = self._fetch_batch(conn, [uid], '(BODY.PEEK[])')
+            raw_email = get_fetch_item(messages.get(int(uid), {}), 'BODY[]', 'RFC822')
+            if raw_email is None:
+                return "", False
+            return self.get_email_body(parse_message(raw_email)), True
+        
+        return self._execute(operation, folder)
+    
+    def _message_parts(self, headers_only: bool) -> str:
+        """Build the FETCH item list for full or header-only fetches."""
+        if headers_only:
+            parts = 'RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (%s)]' % (
+                ' '.join(self.HEADER_FIELDS)
+            )
+        else:
+            # PEEK so a fetch never sets \Seen, even on a read-write selection
+            parts = 'BODY.PEEK[]'
+        return '(UID FLAGS ' + parts + ')'
+    
+    def _build_email(self, attributes: Dict[str, object], folder: str,
+                     headers_only: bool, uidvalidity: int) -> Optional[EmailRecord]:
+        """
+        Turn the FETCH attributes of one message into an email record.
+        
+        The 'id' of the record is the message UID, which stays valid across
+        moves and expunges of other messages (together with 'uidvalidity').
+        
+        Args:
+            attributes: Parsed FETCH attributes for the message
+            folder: Folder the message was fetched from (for lazy body loading)
+            headers_only: Whether only headers were fetched
+            uidvalidity: UIDVALIDITY of the folder
+            
+        Returns:
+            EmailRecord, or None if the response had no message data
+        """
+        if headers_only:
+            raw_email = get_fetch_section(attributes, 'BODY[HEADER')
         else:
+            raw_email = get_fetch_item(attributes, 'BODY[]', 'RFC822')
+        uid = attributes.get('UID')
+        if raw_email is None or uid is None:
+            return None
+        
+        # The MIME tree is only needed when the body is extracted here
+        msg = parse_headers(raw_email) if headers_only else parse_message(raw_email)
+        flags = attributes.get('FLAGS') or ()
+        
+        if not headers_only:
+            return EmailRecord(uid, uidvalidity=uidvalidity, folder=folder, flags=flags,
+                               body=self.get_email_body(msg), **message_fields(msg))
+        
+        structure = attributes.get('BODYSTRUCTURE')
+        text_part = find_text_part(structure) if isinstance(structure, list) else None
+        return EmailRecord(
+            uid, uidvalidity=uidvalidity, folder=folder, flags=flags,
+            size=attributes.get('RFC822.SIZE', 0),
+            has_attachments=self._has_attachment(structure),
+            body_loader=self._body_loader(folder, str(uid), uidvalidity, text_part),
+            **message_fields(msg)
+        )
+    
+    def _body_loader(self, folder: str, uid: str, uidvalidity: int,
+                     text_part: Optional[BodyPart] = None) -> Callable[[], str]:
+        """Build the loader that downloads (and caches) a header-only record's body on first access."""
+        def load_body() -> str:
+            body, complete = self._load_body(folder, uid, self.body_max_bytes, text_part)
+            # A body cut short by body_max_bytes is not cached, or it would later pass for the whole body
+            if self.cache and body and complete:
+                self.cache.update_body(self.cache_account, folder, uidvalidity, uid, body)
+            return body
+        
+        return load_body
+    
+    def _build_emails(self, messages: Dict[int, Dict[str, object]], uids: List[int], folder: str,
+                      headers_only: bool, uidvalidity: int) -> List[EmailRecord]:
+        """Build email records for fetched messages, in the order of ``uids``."""
+        emails = []
+        for uid in uids:
+            attributes = messages.get(int(uid))
+            if attributes is None:
+                continue
             try:
-                body = msg.get_payload(decode=True).decode('utf-8', errors='ignore')
-            except:
-                body = str(msg.get_payload())
+                email_dict = self._build_email(attributes, folder, headers_only, uidvalidity)
+                if email_dict is not None:
+                    emails.append(email_dict)
+            except Exception as e:
+                print(f"Error fetching email UID {uid}: {e}")
+        return emails
+    
+    def _fetch_cached(self, conn: PooledConnection, folder: str, uids: List[int],
+                      uidvalidity: int, headers_only: bool) -> Dict[int, EmailRecord]:
+        """
+        Serve messages from the local cache, fetching only what is missing.
+        
+        Cached messages only need a lightweight ``UID FETCH (FLAGS)`` (flags
+        are the only part of a message that can change); message data is
+        downloaded only for cache misses.
+        
+        Args:
+            conn: Connection with the folder selected
+            folder: Selected folder
+            uids: UIDs wanted
+            uidvalidity: UIDVALIDITY of the folder
+            headers_only: Whether bodies may be left for lazy loading
+            
+        Returns:
+            Dictionary mapping UID to email record
+        """
+        self.cache.invalidate_folder(self.cache_account, folder, keep_uidvalidity=uidvalidity)
+        
+        cached = {
+            uid: record
+            for uid, record in self.cache.get_many(self.cache_account, folder, uidvalidity, uids).items()
+            if record['body'] is not None or headers_only
+        }
+        index = self._fetch_batch(conn, list(cached), '(UID FLAGS)')
+        
+        emails = {}
+        changed_flags = {}
+        for uid, row in cached.items():
+            if uid not in index:
+                # Expunged since the search
+                continue
+            flags = list(index[uid].get('FLAGS') or [])
+            if flags != row['flags']:
+                changed_flags[uid] = flags
+            loader = self._body_loader(folder, str(uid), uidvalidity) if row['body'] is None else None
+            emails[uid] = EmailRecord.from_dict(row, flags=flags, folder=folder,
+                                                uidvalidity=uidvalidity, body_loader=loader)
+        self.cache.update_flags(self.cache_account, folder, uidvalidity, changed_flags)
+        
+        missing = [uid for uid in uids if uid not in emails and uid not in cached]
+        messages = self._fetch_batch(conn, missing, self._message_parts(headers_only))
+        fetched = self._build_emails(messages, missing, folder, headers_only, uidvalidity)
+        for email_dict in fetched:
+            emails[int(email_dict['uid'])] = email_dict
         
-        return body.strip()
+        self.cache.put_many(self.cache_account, folder, uidvalidity, fetched)
+        return emails
     
-    def fetch_recent_emails(self, folder: str = "INBOX", limit: int = 10) -> List[dict]:
+    def fetch_recent_emails(self, folder: str = "INBOX", limit: int = 10,
+                            headers_only: bool = False) -> List[EmailRecord]:
         """
         Fetch recent emails with full details.
         
+        With ``headers_only=True`` only the list-view headers, the message size
+        and its BODYSTRUCTURE are downloaded. The returned records load their
+        'body' from the server the first time it is read, so attachments are
+        never transferred for messages nobody opens.
+        
+        When a message cache is configured, messages already cached are read
+        locally and only new ones are downloaded.
+        
         Args:
             folder: Folder to fetch from
             limit: Maximum number of emails
+            headers_only: Skip body download until the body is accessed
             
         Returns:
-            List of email dictionaries
+            List of email records, most recent first; 'id' is the UID
         """
         if not self.mail:
             return []
         
-        try:
+        def operation(conn: PooledConnection) -> List[EmailRecord]:
             # Select folder
-            result, _ = self.mail.select(folder, readonly=True)
-            if result != 'OK':
+            uidvalidity = conn.select_folder(folder, readonly=True)
+            if uidvalidity is None:
                 return []
             
-            # Search for all emails
-            result, message_numbers = self.mail.search(None, 'ALL')
-            if result != 'OK':
+            # Get most recent messages
+            uids = self._recent_uids(conn, limit)
+            if not uids:
                 return []
             
-            # Get message IDs
-            msg_ids = message_numbers[0].split()
+            if self.cache:
+                by_uid = self._fetch_cached(conn, folder, uids, uidvalidity, headers_only)
+                return [by_uid[uid] for uid in uids if uid in by_uid]
             
-            # Get most recent messages
-            msg_ids = msg_ids[-limit:] if len(msg_ids) > limit else msg_ids
-            msg_ids.reverse()
+            # Fetch all selected messages in a single round trip
+            messages = self._fetch_batch(conn, uids, self._message_parts(headers_only))
+            return self._build_emails(messages, uids, folder, headers_only, uidvalidity)
+        
+        try:
+            return self._execute(operation, folder)
+        except Exception as e:
+            print(f"Error fetching recent emails: {e}")
+            return []
+    
+    def search_uids(self, folder: str = "INBOX", since_uid: int = 0) -> Tuple[Optional[int], List[int]]:
+        """
+        List message UIDs in a folder, optionally only those above a known UID.
+        
+        Uses ``UID SEARCH UID <since_uid + 1>:*`` so the response only carries
+        messages that arrived after the last sync.
+        
+        Args:
+            folder: Folder to search
+            since_uid: Highest UID already seen (0 for all messages)
             
-            emails = []
-            for msg_id in msg_ids:
-                try:
-                    # Fetch email
-                    result, msg_data = self.mail.fetch(msg_id, '(RFC822)')
-                    if result != 'OK':
-                        continue
-                    
-                    # Parse email
-                    raw_email = msg_data[0][1]
-                    msg = email.message_from_bytes(raw_email)
-                    
-                    email_dict = {
-                        'id': msg_id.decode(),
-                        'subject': self.decode_mime_header(msg.get('Subject', 'No Subject')),
-                        'sender': self.decode_mime_header(msg.get('From', 'Unknown')),
-                        'date': msg.get('Date', ''),
-                        'body': self.get_email_body(msg),
-                        'message_id': msg.get('Message-ID', '')
-                    }
-                    
-                    emails.append(email_dict)
-                except Exception as e:
-                    print(f"Error fetching email {msg_id}: {e}")
-                    continue
+        Returns:
+            Tuple of (uidvalidity, ascending list of UIDs); uidvalidity is None
+            if the folder could not be searched
+        """
+        if not self.mail:
+            return None, []
+        
+        def operation(conn: PooledConnection) -> Tuple[Optional[int], List[int]]:
+            uidvalidity = conn.select_folder(folder, readonly=True)
+            if uidvalidity is None:
+                return None, []
+            
+            if since_uid:
+                result, data = conn.uid('SEARCH', None, 'UID', f'{since_uid + 1}:*')
+            else:
+                result, data = conn.uid('SEARCH', None, 'ALL')
+            if result != 'OK':
+                return None, []
+            
+            # "n:*" always matches the highest UID, even when it is <= since_uid
+            uids = sorted(int(uid) for uid in (data[0] or b'').split())
+            return uidvalidity, [uid for uid in uids if uid > since_uid]
+        
+        try:
+            return self._execute(operation, folder)
+        except Exception as e:
+            print(f"Error searching UIDs: {e}")
+            return None, []
+    
+    def fetch_emails_by_uid(self, folder: str, uids: List[int],
+                            headers_only: bool = False) -> List[EmailRecord]:
+        """
+        Fetch specific messages by UID with a single UID FETCH.
+        
+        Args:
+            folder: Folder containing the messages
+            uids: Message UIDs to fetch
+            headers_only: Skip body download until the body is accessed
+            
+        Returns:
+            List of email records in the order of ``uids``
+        """
+        if not self.mail or not uids:
+            return []
+        
+        def operation(conn: PooledConnection) -> List[EmailRecord]:
+            uidvalidity = conn.select_folder(folder, readonly=True)
+            if uidvalidity is None:
+                return []
+            
+            messages = self._fetch_batch(conn, uids, self._message_parts(headers_only))
+            emails = self._build_emails(messages, uids, folder, headers_only, uidvalidity)
+            
+            if self.cache:
+                self.cache.put_many(self.cache_account, folder, uidvalidity, emails)
             
             return emails
+        
+        try:
+            return self._execute(operation, folder)
         except Exception as e:
-            print(f"Error fetching recent emails: {e}")
+            print(f"Error fetching emails by UID: {e}")
             return []
+    
+    def iter_emails(self, folder: str = "INBOX", chunk_size: int = 100,
+                    headers_only: bool = False, newest_first: bool = True) -> Iterator[EmailRecord]:
+        """
+        Stream every message of a folder, one chunk of UIDs at a time.
+        
+        Only the UID list of the folder is held up front; messages are fetched
+        ``chunk_size`` at a time with one UID FETCH each and yielded one by one,
+        so memory stays bounded by the chunk size however large the folder is.
+        A pooled connection is borrowed per chunk rather than for the whole
+        iteration, so a slow consumer never ties up a connection.
+        
+        Iteration stops early if the folder's UIDVALIDITY changes part-way
+        through (the remaining UIDs no longer name the same messages).
+        
+        Args:
+            folder: Folder to read
+            chunk_size: Messages per UID FETCH
+            headers_only: Skip body download until the body is accessed
+            newest_first: Yield the most recent messages first
+            
+        Yields:
+            Email records; 'id' is the UID
+        """
+        if not self.mail:
+            return
+        
+        uidvalidity, uids = self.search_uids(folder)
+        if uidvalidity is None:
+            return
+        if newest_first:
+            uids.reverse()
+        
+        def fetch_chunk(chunk: List[int]):
+            def operation(conn: PooledConnection) -> Optional[List[EmailRecord]]:
+                if conn.select_folder(folder, readonly=True) != uidvalidity:
+                    return None
+                if self.cache:
+                    by_uid = self._fetch_cached(conn, folder, chunk, uidvalidity, headers_only)
+                    return [by_uid[uid] for uid in chunk if uid in by_uid]
+                messages = self._fetch_batch(conn, chunk, self._message_parts(headers_only))
+                return self._build_emails(messages, chunk, folder, headers_only, uidvalidity)
+            return self._execute(operation, folder)
+        
+        for start in range(0, len(uids), chunk_size):
+            try:
+                emails = fetch_chunk(uids[start:start + chunk_size])
+            except Exception as e:
+                print(f"Error streaming emails: {e}")
+                return
+            if emails is None:
+                print(f"UIDVALIDITY of {folder} changed; stopping iteration")
+                return
+            yield from emails
+    
+    def iter_raw_messages(self, folder: str = "INBOX",
+                          chunk_size: int = 100) -> Iterator[Tuple[str, bytes]]:
+        """
+        Stream the raw RFC822 bytes of every message in a folder, oldest first.
+        
+        Messages are downloaded ``chunk_size`` at a time, but not parsed, so
+        parsing and triage can be handed to ``BulkProcessor``.
+        
+        Args:
+            folder: Folder to read
+            chunk_size: Messages per UID FETCH
+            
+        Yields:
+            (uid, raw message) pairs
+        """
+        if not self.mail:
+            return
+        
+        uidvalidity, uids = self.search_uids(folder)
+        if uidvalidity is None:
+            return
+        
+        def fetch_chunk(chunk: List[int]):
+            def operation(conn: PooledConnection) -> Optional[Dict[int, Dict[str, object]]]:
+                if conn.select_folder(folder, readonly=True) != uidvalidity:
+                    return None
+                return self._fetch_batch(conn, chunk, '(UID BODY.PEEK[])')
+            return self._execute(operation, folder)
+        
+        for start in range(0, len(uids), chunk_size):
+            chunk = uids[start:start + chunk_size]
+            try:
+                messages = fetch_chunk(chunk)
+            except Exception as e:
+                print(f"Error streaming messages: {e}")
+                return
+            if messages is None:
+                print(f"UIDVALIDITY of {folder} changed; stopping iteration")
+                return
+            for uid in chunk:
+                raw_email = get_fetch_item(messages.get(uid, {}), 'BODY[]', 'RFC822')
+                if raw_email is not None:
+                    yield str(uid), bytes(raw_email)
+    
+    def _get_folder_state(self, folder: str) -> Optional[Tuple[int, Optional[int]]]:
+        if self.cache:
+            return self.cache.get_folder_state(self.cache_account, folder)
+        return self.folder_states.get(folder)
+    
+    def _set_folder_state(self, folder: str, uidvalidity: int, highestmodseq: Optional[int]):
+        if self.cache:
+            self.cache.set_folder_state(self.cache_account, folder, uidvalidity, highestmodseq)
+        else:
+            self.folder_states[folder] = (uidvalidity, highestmodseq)
+    
+    @staticmethod
+    def _flags_by_uid(data: List) -> Dict[int, List[str]]:
+        """Extract {uid: flags} from FETCH response data."""
+        return {
+            attributes['UID']: list(attributes.get('FLAGS') or [])
+            for _, attributes in parse_fetch_response(data or [])
+            if 'UID' in attributes
+        }
+    
+    def _fetch_flags(self, conn: PooledConnection, changedsince: Optional[int] = None) -> Dict[int, List[str]]:
+        """Fetch the flags of every message, or only of those changed since a modseq (CONDSTORE)."""
+        if changedsince is None:
+            result, data = conn.uid('FETCH', '1:*', '(UID FLAGS)')
+        else:
+            result, data = conn.uid('FETCH', '1:*', '(UID FLAGS)', f'(CHANGEDSINCE {changedsince})')
+        if result != 'OK':
+            raise imaplib.IMAP4.error(f"flag fetch failed: {data}")
+        return self._flags_by_uid(data)
+    
+    def _vanished_since(self, conn: PooledConnection, known: List[int]) -> List[int]:
+        """Find which of the known UIDs no longer exist (for servers without QRESYNC)."""
+        if not known:
+            return []
+        result, data = conn.uid('SEARCH', None, 'ALL')
+        if result != 'OK':
+            raise imaplib.IMAP4.error(f"search failed: {data}")
+        present = {int(uid) for uid in (data[0] or b'').split()}
+        return [uid for uid in known if uid not in present]
+    
+    def refresh_folder(self, folder: str) -> Optional[FolderChanges]:
+        """
+        Report flag changes and expunged messages since the previous refresh.
+        
+        With QRESYNC (RFC 7162) one ``EXAMINE folder (QRESYNC (...))`` returns
+        exactly the changed flags and vanished UIDs since the last known
+        HIGHESTMODSEQ. With CONDSTORE alone an unchanged HIGHESTMODSEQ costs
+        one EXAMINE; otherwise ``UID FETCH (CHANGEDSINCE)`` returns the changed
+        flags and expunges are found by comparing cached UIDs with
+        ``UID SEARCH ALL``. Servers with neither get a full flag fetch.
+        
+        Changes are applied to the message cache, and the new position is
+        stored (in the cache when there is one).
+        
+        Args:
+            folder: Folder to refresh
+            
+        Returns:
+            FolderChanges, or None if the folder could not be refreshed
+        """
+        if not self.mail:
+            return None
+        
+        def cached_uids(uidvalidity: int) -> List[int]:
+            return self.cache.uids(self.cache_account, folder, uidvalidity) if self.cache else []
+        
+        def operation(conn: PooledConnection) -> Optional[FolderChanges]:
+            state = self._get_folder_state(folder)
+            qresync = state if state and state[1] and 'QRESYNC' in conn.enabled else None
+            # Always re-select: HIGHESTMODSEQ is only reported by SELECT/EXAMINE
+            uidvalidity = conn.select_folder(folder, readonly=True, force=True, qresync=qresync)
+            if uidvalidity is None:
+                return None
+            modseq = conn.highestmodseq
+            
+            if state is None or state[0] != uidvalidity:
+                flags = self._fetch_flags(conn)
+                vanished = [uid for uid in cached_uids(uidvalidity) if uid not in flags]
+                return FolderChanges(uidvalidity, modseq, flags, vanished, full=True)
+            
+            if qresync is not None:
+                # The server already sent the changes with the EXAMINE response
+                _, fetched = conn.response('FETCH')
+                _, vanished = conn.response('VANISHED')
+                return FolderChanges(uidvalidity, modseq, self._flags_by_uid(fetched),
+                                     parse_vanished(vanished))
+            
+            if modseq and state[1]:
+                if modseq == state[1]:
+                    return FolderChanges(uidvalidity, modseq)
+                flags = self._fetch_flags(conn, changedsince=state[1])
+                return FolderChanges(uidvalidity, modseq, flags,
+                                     self._vanished_since(conn, cached_uids(uidvalidity)))
+            
+            # No CONDSTORE: report every message's flags
+            flags = self._fetch_flags(conn)
+            vanished = [uid for uid in cached_uids(uidvalidity) if uid not in flags]
+            return FolderChanges(uidvalidity, modseq, flags, vanished)
+        
+        try:
+            changes = self._execute(operation, folder)
+        except Exception as e:
+            print(f"Error refreshing folder: {e}")
+            return None
+        if changes is None:
+            return None
+        
+        if self.cache:
+            if changes.full:
+                self.cache.invalidate_folder(self.cache_account, folder, keep_uidvalidity=changes.uidvalidity)
+            self.cache.update_flags(self.cache_account, folder, changes.uidvalidity, changes.flags)
+            self.cache.delete_uids(self.cache_account, folder, changes.uidvalidity, changes.vanished)
+        self._set_folder_state(folder, changes.uidvalidity, changes.highestmodseq)
+        
+        return changes
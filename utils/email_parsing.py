@@ -0,0 +1,242 @@
+"""
+Email Parsing
+
+Header-only and full parsing of raw RFC822 messages.
+
+List views only need a handful of headers, so they use ``parse_headers``,
+which stops at the blank line ending the header block and never builds the
+MIME tree. ``parse_message`` builds the full tree and is used only when a
+body is actually needed.
+"""
+
+import base64
+import binascii
+import codecs
+import email
+import email.message
+import html
+import quopri
+import re
+from email.header import decode_header
+from email.parser import BytesParser
+from email.policy import compat32
+from typing import Dict, Iterator, Optional
+
+
+# Same policy as email.message_from_bytes, so header values are identical
+_HEADER_PARSER = BytesParser(policy=compat32)
+
+# Headers that mark bulk and automated mail; triage can often decide on these
+# alone, before (or without) downloading the body
+SIGNAL_HEADERS = ('List-Unsubscribe', 'List-Id', 'Precedence', 'Auto-Submitted')
+
+_SCRIPT_STYLE = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_LINE_BREAK_TAG = re.compile(r'<\s*(br|/p|/div|/tr|/li|/h\d)\b[^>]*>', re.IGNORECASE)
+_TAG = re.compile(r'<[^>]+>')
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+
+
+def header_block(raw: bytes) -> bytes:
+    """
+    Cut a raw message down to its header block.
+
+    Args:
+        raw: Raw message (or just its headers)
+
+    Returns:
+        The headers including the terminating blank line, or ``raw`` unchanged
+        if it has no body
+    """
+    crlf = raw.find(b'\r\n\r\n')
+    lf = raw.find(b'\n\n')
+    if crlf == -1 and lf == -1:
+        return raw
+    if lf == -1 or (crlf != -1 and crlf < lf):
+        return raw[:crlf + 4]
+    return raw[:lf + 2]
+
+
+def parse_headers(raw: bytes) -> email.message.Message:
+    """
+    Parse only the headers of a raw message.
+
+    The body is neither scanned for MIME boundaries nor decoded, so the cost
+    depends on the header size rather than on the message size.
+
+    Args:
+        raw: Raw message, or a header-only FETCH section
+
+    Returns:
+        Message whose headers are set and whose payload is empty
+    """
+    return _HEADER_PARSER.parsebytes(header_block(raw), headersonly=True)
+
+
+def parse_message(raw: bytes) -> email.message.Message:
+    """
+    Parse a raw message into a full MIME tree.
+
+    Args:
+        raw: Raw message
+
+    Returns:
+        Parsed message
+    """
+    return email.message_from_bytes(raw)
+
+
+def decode_header_value(header: Optional[str]) -> str:
+    """
+    Decode a MIME-encoded (RFC 2047) header value.
+
+    Args:
+        header: Raw header string
+
+    Returns:
+        Decoded string
+    """
+    if not header:
+        return ""
+
+    result = []
+    for part, encoding in decode_header(header):
+        if isinstance(part, bytes):
+            try:
+                result.append(part.decode(encoding or 'utf-8', errors='ignore'))
+            except LookupError:
+                result.append(part.decode('utf-8', errors='ignore'))
+        else:
+            result.append(part)
+    return ''.join(result)
+
+
+def message_fields(msg: email.message.Message) -> Dict[str, str]:
+    """
+    Extract the decoded list-view fields of a parsed message.
+
+    Args:
+        msg: Message from parse_headers or parse_message
+
+    Returns:
+        Dictionary with 'subject', 'sender', 'date', 'message_id' and
+        'headers' (see signal_headers)
+    """
+    return {
+        'subject': decode_header_value(msg.get('Subject', 'No Subject')),
+        'sender': decode_header_value(msg.get('From', 'Unknown')),
+        'date': msg.get('Date', ''),
+        'message_id': msg.get('Message-ID', ''),
+        'headers': signal_headers(msg),
+    }
+
+
+def signal_headers(msg: email.message.Message) -> Dict[str, str]:
+    """
+    Extract the bulk/automated-mail headers of a parsed message.
+
+    Args:
+        msg: Message from parse_headers or parse_message
+
+    Returns:
+        Dictionary mapping the lowercase name of each SIGNAL_HEADERS header
+        present to its value
+    """
+    headers = {}
+    for name in SIGNAL_HEADERS:
+        value = msg.get(name)
+        if value is not None:
+            headers[name.lower()] = decode_header_value(value)
+    return headers
+
+
+def extract_text_body(msg: email.message.Message) -> str:
+    """
+    Extract the text body from a fully parsed message.
+
+    Picks the same part as imap_protocol.find_text_part does for lazily
+    loaded bodies: the first text/plain part that is not an attachment, else
+    the first such text/html part, reduced to text. Parts of attached
+    messages are skipped.
+
+    Args:
+        msg: Message from parse_message
+
+    Returns:
+        Email body as string ("" if there is no text part)
+    """
+    candidates = [
+        part for part in _leaf_parts(msg)
+        if part.get_content_maintype() == 'text' and part.get_content_disposition() != 'attachment'
+    ]
+    for subtype in ('plain', 'html'):
+        for part in candidates:
+            if part.get_content_subtype() == subtype:
+                body = decode_body_part(part.get_payload(decode=True) or b'', None,
+                                        part.get_content_charset())
+                if subtype == 'html':
+                    body = html_to_text(body)
+                return body.strip()
+    return ""
+
+
+def _leaf_parts(msg: email.message.Message) -> Iterator[email.message.Message]:
+    """Yield the non-multipart parts of a message, without descending into attached messages."""
+    if not msg.is_multipart():
+        yield msg
+        return
+    for part in msg.get_payload():
+        if part.get_content_maintype() == 'message':
+            yield part
+        else:
+            yield from _leaf_parts(part)
+
+
+def decode_body_part(data: bytes, encoding: Optional[str], charset: Optional[str]) -> str:
+    """
+    Decode a body section fetched on its own (e.g. with ``BODY.PEEK[1]``).
+
+    The section arrives still in its Content-Transfer-Encoding. It may also be
+    truncated by a partial fetch, so a base64 tail is trimmed to whole quads
+    and characters cut in half are dropped.
+
+    Args:
+        data: Raw section bytes
+        encoding: Content-Transfer-Encoding of the part
+        charset: Charset parameter of the part
+
+    Returns:
+        Decoded text
+    """
+    encoding = (encoding or '').lower()
+    if encoding == 'base64':
+        compact = b''.join(data.split())
+        try:
+            data = base64.b64decode(compact[:len(compact) - len(compact) % 4])
+        except (binascii.Error, ValueError):
+            data = b''
+    elif encoding == 'quoted-printable':
+        data = quopri.decodestring(data)
+
+    charset = charset or 'utf-8'
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = 'utf-8'
+    return data.decode(charset, errors='ignore')
+
+
+def html_to_text(markup: str) -> str:
+    """
+    Reduce an HTML body to readable text.
+
+    Args:
+        markup: HTML source
+
+    Returns:
+        Text with tags, scripts and styles removed and entities unescaped
+    """
+    text = _SCRIPT_STYLE.sub('', markup)
+    text = _LINE_BREAK_TAG.sub('\n', text)
+    text = html.unescape(_TAG.sub('', text))
+    return _BLANK_LINES.sub('\n\n', text).strip()
+
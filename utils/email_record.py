@@ -0,0 +1,191 @@
+"""
+Email Records
+
+Compact email records shared by the folder manager, inbox monitor and
+triage engine.
+"""
+
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class EmailRecord:
+    """
+    One email, stored in ``__slots__`` instead of a per-message dict.
+
+    Senders, folder names and flags repeat across thousands of messages, so
+    they are interned (and flags kept as a shared tuple). The body is either
+    stored directly or loaded on first access through ``body_loader``.
+
+    Records can be read like the dictionaries the app used before
+    (``record['subject']``, ``record.get('body', '')``, ``'size' in record``);
+    'id' is the UID. Optional fields that were never set ('size',
+    'has_attachments', 'headers', 'folder') are absent.
+    """
+
+    __slots__ = ('uid', 'uidvalidity', 'folder', 'subject', 'sender', 'date', 'message_id',
+                 'flags', 'size', 'has_attachments', 'headers', '_body', '_body_loader')
+
+    # Mapping keys, in the order they are listed
+    KEYS = ('id', 'subject', 'sender', 'date', 'message_id', 'uid', 'uidvalidity', 'flags',
+            'size', 'has_attachments', 'headers', 'folder', 'body')
+    _OPTIONAL = frozenset(('size', 'has_attachments', 'headers', 'folder'))
+
+    def __init__(self, uid: str, subject: str = '', sender: str = '', date: str = '',
+                 message_id: str = '', uidvalidity: Optional[int] = None,
+                 flags: Iterable[str] = (), folder: Optional[str] = None,
+                 size: Optional[int] = None, has_attachments: Optional[bool] = None,
+                 headers: Optional[Dict[str, str]] = None,
+                 body: Optional[str] = None, body_loader: Optional[Callable[[], str]] = None):
+        """
+        Initialize the record.
+
+        Args:
+            uid: Message UID (also the record's 'id')
+            subject: Decoded subject
+            sender: Decoded From header
+            date: Date header
+            message_id: Message-ID header
+            uidvalidity: UIDVALIDITY of the folder the UID belongs to
+            flags: IMAP flags
+            folder: Folder the message was fetched from
+            size: RFC822 size in bytes (header-only fetches)
+            has_attachments: Whether the message has attachments (header-only fetches)
+            headers: Bulk/automated-mail signal headers by lowercase name
+                (None if they were not fetched)
+            body: Decoded body, if already known
+            body_loader: Callable returning the body, called at most once on first access
+        """
+        self.uid = str(uid)
+        self.uidvalidity = uidvalidity
+        self.folder = _intern(folder)
+        self.subject = subject
+        self.sender = _intern(sender)
+        self.date = date
+        self.message_id = message_id
+        self.flags = tuple(sys.intern(flag) for flag in flags)
+        self.size = size
+        self.has_attachments = has_attachments
+        self.headers = headers
+        self._body = body
+        self._body_loader = None if body is not None else body_loader
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], **overrides) -> 'EmailRecord':
+        """
+        Build a record from an email dictionary (e.g. a message cache row).
+
+        Args:
+            data: Dictionary with any of the record's keys ('uid' or 'id' required)
+            overrides: Constructor arguments taking precedence over ``data``
+
+        Returns:
+            EmailRecord
+        """
+        kwargs = {key: data[key] for key in cls.KEYS if key in data and key != 'id'}
+        kwargs.setdefault('uid', data.get('id'))
+        kwargs.update(overrides)
+        return cls(**kwargs)
+
+    @property
+    def id(self) -> str:
+        return self.uid
+
+    @property
+    def body_loaded(self) -> bool:
+        """Whether the body has been downloaded (or was supplied up front)."""
+        return self._body is not None
+
+    @property
+    def body(self) -> str:
+        """The decoded body, loading it on first access."""
+        if self._body is None:
+            body = ""
+            if self._body_loader is not None:
+                try:
+                    body = self._body_loader() or ""
+                except Exception as e:
+                    # Leave the loader in place so a later access can retry
+                    print(f"Error loading email body: {e}")
+                    return ""
+            self._body_loader = None
+            self._body = body
+        return self._body
+
+    @body.setter
+    def body(self, value: str):
+        self._body = value
+        self._body_loader = None
+
+    # Read-only mapping interface, for code written against email dictionaries
+
+    def _has(self, key: str) -> bool:
+        if key in self._OPTIONAL:
+            return getattr(self, key) is not None
+        return key in self.KEYS
+
+    def __getitem__(self, key: str) -> Any:
+        if not isinstance(key, str) or not self._has(key):
+            raise KeyError(key)
+        if key == 'flags':
+            return list(self.flags)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._has(key)
+
+    def keys(self) -> List[str]:
+        return [key for key in self.KEYS if self._has(key)]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self, load_body: bool = True) -> Dict[str, Any]:
+        """
+        Convert to a plain email dictionary.
+
+        Args:
+            load_body: Load the body if needed; with False an unloaded body is left out
+
+        Returns:
+            Dictionary with the record's keys
+        """
+        keys = self.keys()
+        if not load_body and not self.body_loaded:
+            keys.remove('body')
+        return {key: self[key] for key in keys}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (EmailRecord, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"EmailRecord(uid={self.uid!r}, folder={self.folder!r}, subject={self.subject!r})"
+
+    def __getstate__(self):
+        # The body loader holds a connection manager and cannot be pickled
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != '_body_loader'}
+
+    def __setstate__(self, state):
+        self._body_loader = None
+        for slot, value in state.items():
+            setattr(self, slot, value)
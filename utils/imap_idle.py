@@ -0,0 +1,180 @@
+"""
+IMAP IDLE
+
+Push notifications for new mail using the IMAP IDLE extension (RFC 2177).
+"""
+
+import imaplib
+import select
+import threading
+import time
+from typing import Optional
+
+
+def get_capabilities(conn) -> set:
+    """
+    Ask the server for its current capabilities.
+
+    Servers often advertise more after LOGIN than in their greeting, so this
+    issues a fresh CAPABILITY command instead of trusting ``conn.capabilities``.
+
+    Args:
+        conn: Logged-in imaplib connection
+
+    Returns:
+        Set of upper-case capability names
+    """
+    result, data = conn.capability()
+    if result != 'OK' or not data or not data[0]:
+        return set(getattr(conn, 'capabilities', ()))
+    return {cap.upper() for cap in data[0].decode(errors='ignore').split()}
+
+
+class _LineReader:
+    """
+    Reads CRLF-terminated lines straight from the socket with a timeout.
+
+    imaplib's buffered file object cannot be read with a timeout without
+    becoming unusable, so IDLE responses are read from the socket directly,
+    using select() (and the SSL pending buffer) to wait for data.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b''
+
+    def _data_pending(self, timeout: float) -> bool:
+        pending = getattr(self.sock, 'pending', None)
+        if pending is not None and pending() > 0:
+            return True
+        readable, _, _ = select.select([self.sock], [], [], max(0.0, timeout))
+        return bool(readable)
+
+    def readline(self, timeout: float) -> Optional[bytes]:
+        """
+        Read one line, waiting at most ``timeout`` seconds.
+
+        Returns:
+            The line without CRLF, or None on timeout
+
+        Raises:
+            imaplib.IMAP4.abort: If the server closed the connection
+        """
+        deadline = time.monotonic() + timeout
+        while b'\r\n' not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._data_pending(remaining):
+                return None
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise imaplib.IMAP4.abort("connection closed during IDLE")
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b'\r\n', 1)
+        return line
+
+
+class IdleSession:
+    """
+    Runs IDLE on a dedicated, logged-in IMAP connection.
+
+    IDLE ties up the connection it runs on, so this must not share a
+    connection with regular folder operations.
+    """
+
+    # RFC 2177: clients should re-issue IDLE at least every 29 minutes
+    MAX_IDLE_SECONDS = 29 * 60
+
+    def __init__(self, conn, folder: str = "INBOX"):
+        """
+        Initialize the IDLE session.
+
+        Args:
+            conn: Dedicated logged-in imaplib connection
+            folder: Folder to watch
+        """
+        self.conn = conn
+        self.folder = folder
+        self.reader = _LineReader(conn.sock)
+        self.selected = False
+
+    def supported(self) -> bool:
+        """Check whether the server advertises IDLE."""
+        return 'IDLE' in get_capabilities(self.conn)
+
+    def _select(self):
+        result, _ = self.conn.select(self.folder, readonly=True)
+        if result != 'OK':
+            raise imaplib.IMAP4.error(f"cannot select {self.folder}")
+        self.selected = True
+
+    def wait(self, timeout: float = MAX_IDLE_SECONDS,
+             stop_event: Optional[threading.Event] = None) -> bool:
+        """
+        IDLE until the server reports a mailbox change or the timeout expires.
+
+        Args:
+            timeout: Maximum seconds to stay in IDLE (capped at 29 minutes)
+            stop_event: Event that ends the wait early when set
+
+        Returns:
+            True if new mail was announced (EXISTS/RECENT), False otherwise
+
+        Raises:
+            imaplib.IMAP4.error: If the server rejects IDLE
+            imaplib.IMAP4.abort: If the connection drops
+        """
+        if not self.selected:
+            self._select()
+
+        tag = self.conn._new_tag()
+        self.conn.send(tag + b' IDLE\r\n')
+
+        # Wait for the continuation request
+        while True:
+            line = self.reader.readline(30)
+            if line is None:
+                raise imaplib.IMAP4.abort("no response to IDLE")
+            if line.startswith(b'+'):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.error(f"IDLE rejected: {line.decode(errors='ignore')}")
+
+        new_mail = self._collect(min(timeout, self.MAX_IDLE_SECONDS), stop_event)
+
+        self.conn.send(b'DONE\r\n')
+        while True:
+            line = self.reader.readline(30)
+            if line is None:
+                raise imaplib.IMAP4.abort("no response to DONE")
+            if line.startswith(tag):
+                if b' OK' not in line:
+                    raise imaplib.IMAP4.error(f"IDLE failed: {line.decode(errors='ignore')}")
+                break
+            new_mail = self._is_new_mail(line) or new_mail
+
+        return new_mail
+
+    def _collect(self, timeout: float, stop_event: Optional[threading.Event]) -> bool:
+        """Read untagged responses until new mail arrives, stop is requested or time runs out."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (stop_event is not None and stop_event.is_set()):
+                return False
+            # Wake up regularly so a stop request is noticed promptly
+            line = self.reader.readline(min(1.0, remaining))
+            if line is None:
+                continue
+            if line.startswith(b'* BYE'):
+                raise imaplib.IMAP4.abort(line.decode(errors='ignore'))
+            if self._is_new_mail(line):
+                return True
+
+    @staticmethod
+    def _is_new_mail(line: bytes) -> bool:
+        parts = line.split()
+        if len(parts) < 3 or parts[0] != b'*' or not parts[1].isdigit():
+            return False
+        if parts[2].upper() == b'RECENT':
+            return int(parts[1]) > 0
+        return parts[2].upper() == b'EXISTS'
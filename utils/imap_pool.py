@@ -0,0 +1,354 @@
+"""
+IMAP Connection Pool
+
+Thread-safe pool of logged-in IMAP connections with keepalive and reconnect.
+"""
+
+import imaplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from .imap_idle import get_capabilities
+
+
+# Errors that mean the connection itself is unusable (as opposed to NO/BAD replies)
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, OSError, EOFError)
+
+
+class PooledConnection:
+    """
+    An IMAP connection plus the state the pool tracks for it.
+
+    Attribute access falls through to the underlying imaplib connection, so
+    ``conn.fetch(...)``, ``conn.uid(...)`` etc. work as usual. Use
+    ``select_folder`` instead of ``select`` to benefit from selection tracking.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.selected_folder: Optional[str] = None
+        self.readonly = True
+        self.uidvalidity: Optional[int] = None
+        self.highestmodseq: Optional[int] = None
+        self.enabled: set = set()
+        self.last_used = time.monotonic()
+        self._capabilities = None
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def select_folder(self, folder: str, readonly: bool = True, force: bool = False,
+                      qresync: Optional[Tuple[int, int]] = None) -> Optional[int]:
+        """
+        Select a folder unless it is already selected in a compatible mode.
+
+        A read-write selection also serves read-only requests (all reads use
+        BODY.PEEK, so they never set flags); a read-write request on a
+        read-only selection re-selects.
+
+        Args:
+            folder: Folder to select
+            readonly: Open with EXAMINE instead of SELECT
+            force: Re-select even if the folder is already selected (to get a
+                fresh HIGHESTMODSEQ)
+            qresync: Known (uidvalidity, modseq) to pass as the QRESYNC select
+                parameter (RFC 7162); implies force. The server then reports
+                changes since that modseq as untagged FETCH and VANISHED
+                responses, readable with ``response()``.
+
+        Returns:
+            UIDVALIDITY of the folder (0 if the server did not report one),
+            or None if the folder could not be selected
+        """
+        if (self.selected_folder == folder and (readonly or not self.readonly)
+                and not force and qresync is None):
+            return self.uidvalidity
+
+        self.selected_folder = None
+        mailbox = folder
+        if qresync is not None:
+            mailbox = '%s (QRESYNC (%d %d))' % (folder, qresync[0], qresync[1])
+        if readonly:
+            result, _ = self.conn.select(mailbox, readonly=True)
+        else:
+            result, _ = self.conn.select(mailbox)
+        if result != 'OK':
+            return None
+
+        uidvalidity = self._response_code('UIDVALIDITY')
+        self.selected_folder = folder
+        self.readonly = readonly
+        self.uidvalidity = uidvalidity or 0
+        # Only reported once CONDSTORE is enabled, and not for NOMODSEQ folders
+        self.highestmodseq = self._response_code('HIGHESTMODSEQ')
+        return self.uidvalidity
+
+    def _response_code(self, name: str) -> Optional[int]:
+        """Read a numeric response code (e.g. UIDVALIDITY) from the last SELECT."""
+        try:
+            _, data = self.conn.response(name)
+            return int(data[0])
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def enable(self, *names: str) -> set:
+        """
+        ENABLE extensions the server advertises (RFC 5161).
+
+        Must be called before any folder is selected.
+
+        Args:
+            names: Extensions to enable, e.g. 'QRESYNC', 'CONDSTORE'
+
+        Returns:
+            Set of extensions enabled on this connection
+        """
+        wanted = [name for name in names if self.has_capability(name) and name not in self.enabled]
+        if not wanted or not self.has_capability('ENABLE'):
+            return self.enabled
+
+        try:
+            result, _ = self.conn.enable(' '.join(wanted))
+        except imaplib.IMAP4.error:
+            return self.enabled
+        if result == 'OK':
+            _, data = self.conn.response('ENABLED')
+            for item in data or []:
+                if item:
+                    self.enabled.update(item.decode(errors='ignore').upper().split())
+            if 'QRESYNC' in self.enabled:
+                # QRESYNC implies CONDSTORE (RFC 7162 section 3.2.3)
+                self.enabled.add('CONDSTORE')
+        return self.enabled
+
+    def invalidate_selection(self):
+        """Forget the selected folder, forcing the next select_folder to re-select."""
+        self.selected_folder = None
+
+    def has_capability(self, name: str) -> bool:
+        """Check a server capability (queried once per connection after login)."""
+        if self._capabilities is None:
+            self._capabilities = get_capabilities(self.conn)
+        return name.upper() in self._capabilities
+
+    def noop(self) -> bool:
+        """Send NOOP; returns False if the connection is dead."""
+        try:
+            result, _ = self.conn.noop()
+            self.last_used = time.monotonic()
+            return result == 'OK'
+        except CONNECTION_ERRORS:
+            return False
+
+    def logout(self):
+        """Log out, ignoring errors."""
+        try:
+            self.conn.logout()
+        except Exception:
+            pass
+
+
+class IMAPConnectionPool:
+    """
+    Pool of IMAP connections shared by the UI thread and background workers.
+
+    Each connection is used by one thread at a time (checkout/checkin).
+    Connections are created on demand up to ``max_size``; idle ones get a NOOP
+    every ``keepalive_interval`` seconds so servers don't drop them, and dead
+    ones are replaced transparently.
+    """
+
+    def __init__(self, factory: Callable[[], imaplib.IMAP4], max_size: int = 4,
+                 keepalive_interval: Optional[float] = 240, stale_after: float = 60,
+                 connections: Optional[List[imaplib.IMAP4]] = None,
+                 on_connect: Optional[Callable[[PooledConnection], None]] = None):
+        """
+        Initialize the pool.
+
+        Args:
+            factory: Callable returning a new logged-in connection
+            max_size: Maximum number of open connections
+            keepalive_interval: Seconds between NOOPs on idle connections (None disables)
+            stale_after: Idle seconds after which a connection is health-checked on checkout
+            connections: Already-open connections to seed the pool with
+            on_connect: Called with every new connection (seeded ones included)
+                before first use, e.g. to ENABLE extensions
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.keepalive_interval = keepalive_interval
+        self.stale_after = stale_after
+        self.on_connect = on_connect
+        self._idle: List[PooledConnection] = [self._wrap(c) for c in connections or []]
+        self._size = len(self._idle)
+        self._condition = threading.Condition()
+        self._closed = threading.Event()
+        self._keepalive_thread = None
+
+        if keepalive_interval:
+            self._keepalive_thread = threading.Thread(target=self._keepalive_loop, daemon=True)
+            self._keepalive_thread.start()
+
+    def checkout(self, folder: Optional[str] = None, timeout: float = 30) -> PooledConnection:
+        """
+        Take a connection out of the pool.
+
+        Prefers an idle connection that already has ``folder`` selected, then
+        any idle connection, then opens a new one if below ``max_size``;
+        otherwise waits for a checkin.
+
+        Args:
+            folder: Folder the caller is about to use
+            timeout: Seconds to wait for a free connection
+
+        Returns:
+            PooledConnection (must be returned with checkin)
+
+        Raises:
+            TimeoutError: If no connection became available in time
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed.is_set():
+                    raise imaplib.IMAP4.abort("connection pool is closed")
+                if self._idle:
+                    pooled = next((c for c in self._idle if c.selected_folder == folder), self._idle[-1])
+                    self._idle.remove(pooled)
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    pooled = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("no IMAP connection available")
+                self._condition.wait(remaining)
+
+        if pooled is None:
+            return self._open()
+
+        # Connections idle for a while may have been dropped by the server
+        if time.monotonic() - pooled.last_used > self.stale_after and not pooled.noop():
+            pooled.logout()
+            return self._open()
+        return pooled
+
+    def _wrap(self, conn) -> PooledConnection:
+        pooled = PooledConnection(conn)
+        if self.on_connect is not None:
+            try:
+                self.on_connect(pooled)
+            except Exception:
+                pooled.logout()
+                raise
+        return pooled
+
+    def _open(self) -> PooledConnection:
+        """Open a new connection for a slot already reserved in _size."""
+        try:
+            return self._wrap(self.factory())
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def checkin(self, pooled: PooledConnection, discard: bool = False):
+        """
+        Return a connection to the pool.
+
+        Args:
+            pooled: Connection from checkout
+            discard: Close it instead (e.g. after a connection error)
+        """
+        if discard or self._closed.is_set():
+            pooled.logout()
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            return
+
+        pooled.last_used = time.monotonic()
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, folder: Optional[str] = None):
+        """
+        Context manager around checkout/checkin.
+
+        Connection errors discard the connection instead of returning it.
+        """
+        pooled = self.checkout(folder)
+        try:
+            yield pooled
+        except CONNECTION_ERRORS:
+            self.checkin(pooled, discard=True)
+            raise
+        except BaseException:
+            self.checkin(pooled)
+            raise
+        else:
+            self.checkin(pooled)
+
+    def execute(self, operation: Callable[[PooledConnection], object],
+                folder: Optional[str] = None, retries: int = 1):
+        """
+        Run an operation on a pooled connection, reconnecting on failure.
+
+        If the connection dies mid-operation it is discarded and the operation
+        is retried on a fresh connection, up to ``retries`` times. Pass
+        ``retries=0`` for operations that are unsafe to repeat.
+
+        Args:
+            operation: Callable taking a PooledConnection
+            folder: Folder the operation works on (used to pick a connection)
+            retries: Number of retries after a connection error
+
+        Returns:
+            Whatever the operation returns
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.connection(folder) as pooled:
+                    return operation(pooled)
+            except CONNECTION_ERRORS as e:
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                print(f"IMAP connection lost ({e}), reconnecting")
+
+    def _keepalive_loop(self):
+        """Send NOOP on connections that have been idle for a keepalive interval."""
+        while not self._closed.wait(min(self.keepalive_interval, 30)):
+            now = time.monotonic()
+            with self._condition:
+                due = [c for c in self._idle if now - c.last_used >= self.keepalive_interval]
+                for pooled in due:
+                    self._idle.remove(pooled)
+
+            for pooled in due:
+                if pooled.noop():
+                    self.checkin(pooled)
+                else:
+                    self.checkin(pooled, discard=True)
+
+    def size(self) -> int:
+        """Number of open connections (idle and checked out)."""
+        with self._condition:
+            return self._size
+
+    def close(self):
+        """Log out of all idle connections and stop the keepalive thread."""
+        self._closed.set()
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            pooled.logout()
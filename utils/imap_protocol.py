@@ -0,0 +1,338 @@
+"""
+IMAP Protocol Helpers
+
+Message-set construction and FETCH response parsing for batched IMAP commands.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+_LITERAL_SUFFIX = re.compile(rb'\{(\d+)\}$')
+_NUMBER = re.compile(rb'^\d+$')
+_ATOM_END = b' ()"{'
+_OPEN = object()
+_CLOSE = object()
+
+
+class Literal(bytes):
+    """Raw bytes delivered as an IMAP literal ({n} syntax)."""
+
+
+def build_message_set(msg_ids: Iterable[Union[str, bytes, int]]) -> str:
+    """
+    Build a compact IMAP message set from a list of ids.
+
+    Consecutive ids are collapsed into ranges, e.g. [1, 2, 3, 7] -> "1:3,7".
+
+    Args:
+        msg_ids: Sequence numbers or UIDs
+
+    Returns:
+        Message set string usable in FETCH/STORE/COPY commands
+    """
+    numbers = sorted({int(m.decode() if isinstance(m, bytes) else m) for m in msg_ids})
+    if not numbers:
+        return ""
+
+    ranges = []
+    start = prev = numbers[0]
+    for number in numbers[1:]:
+        if number == prev + 1:
+            prev = number
+            continue
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        start = prev = number
+    ranges.append(f"{start}:{prev}" if start != prev else str(start))
+
+    return ','.join(ranges)
+
+
+def parse_uid_set(text: Union[str, bytes]) -> List[int]:
+    """
+    Expand a UID set such as "41,43:45" into [41, 43, 44, 45].
+
+    Args:
+        text: UID set without '*'
+
+    Returns:
+        Ascending list of UIDs
+    """
+    if isinstance(text, bytes):
+        text = text.decode()
+    uids = set()
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if ':' in part:
+            lo, hi = sorted(int(n) for n in part.split(':'))
+            uids.update(range(lo, hi + 1))
+        else:
+            uids.add(int(part))
+    return sorted(uids)
+
+
+def parse_vanished(data: List) -> List[int]:
+    """
+    Collect the UIDs reported by untagged VANISHED responses (RFC 7162).
+
+    Args:
+        data: Data of the 'VANISHED' untagged responses, e.g.
+            [b'(EARLIER) 41,43:116']
+
+    Returns:
+        Ascending list of expunged UIDs
+    """
+    uids = set()
+    for item in data or []:
+        if not item:
+            continue
+        if isinstance(item, bytes):
+            item = item.decode()
+        if item.upper().startswith('(EARLIER)'):
+            item = item[len('(EARLIER)'):]
+        uids.update(parse_uid_set(item))
+    return sorted(uids)
+
+
+def _tokenize(text: bytes, tokens: List):
+    """
+    Split a response fragment into tokens.
+
+    Produces open/close markers for parentheses, quoted strings (as str),
+    numbers (as int), NIL (as None) and atoms (as str). Atoms may contain
+    bracketed sections, so ``BODY[HEADER.FIELDS (FROM)]<0>`` stays one token.
+    """
+    i = 0
+    length = len(text)
+    while i < length:
+        ch = text[i:i + 1]
+        if ch in (b' ', b'\r', b'\n'):
+            i += 1
+        elif ch == b'(':
+            tokens.append(_OPEN)
+            i += 1
+        elif ch == b')':
+            tokens.append(_CLOSE)
+            i += 1
+        elif ch == b'"':
+            i += 1
+            chunk = bytearray()
+            while i < length and text[i:i + 1] != b'"':
+                if text[i:i + 1] == b'\\':
+                    i += 1
+                chunk += text[i:i + 1]
+                i += 1
+            i += 1
+            tokens.append(chunk.decode('utf-8', errors='replace'))
+        else:
+            start = i
+            depth = 0
+            while i < length:
+                ch = text[i:i + 1]
+                if ch == b'[':
+                    depth += 1
+                elif ch == b']':
+                    depth -= 1
+                elif depth == 0 and ch in _ATOM_END:
+                    break
+                i += 1
+            atom = text[start:i]
+            if _NUMBER.match(atom):
+                tokens.append(int(atom))
+            elif atom.upper() == b'NIL':
+                tokens.append(None)
+            else:
+                tokens.append(atom.decode('utf-8', errors='replace'))
+
+
+def _tokenize_fetch_data(data: List) -> List:
+    """Turn the imaplib FETCH data list into a flat token stream."""
+    tokens = []
+    for item in data:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            prefix, literal = item[0], item[1]
+            prefix = _LITERAL_SUFFIX.sub(b'', prefix)
+            _tokenize(prefix, tokens)
+            tokens.append(Literal(literal))
+        else:
+            _tokenize(item, tokens)
+    return tokens
+
+
+def _parse_list(tokens: List, pos: int) -> Tuple[list, int]:
+    """Parse a parenthesised list starting just after its '(' token."""
+    items = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token is _CLOSE:
+            return items, pos + 1
+        if token is _OPEN:
+            sub, pos = _parse_list(tokens, pos + 1)
+            items.append(sub)
+            continue
+        items.append(token)
+        pos += 1
+    return items, pos
+
+
+def parse_fetch_response(data: List) -> List[Tuple[int, Dict[str, object]]]:
+    """
+    Parse the data returned by ``imaplib.IMAP4.fetch`` for a multi-message set.
+
+    A batched FETCH returns the untagged responses of every message interleaved
+    in one list, with literals split into (prefix, bytes) tuples. This walks the
+    whole list once and regroups it per message.
+
+    Args:
+        data: Second element of the (typ, data) pair returned by fetch()
+
+    Returns:
+        List of (sequence_number, attributes) in server order. Attribute names
+        are upper-cased (e.g. 'RFC822', 'UID', 'BODY[HEADER.FIELDS (FROM)]');
+        literals are returned as bytes, lists as Python lists.
+    """
+    tokens = _tokenize_fetch_data(data)
+    responses = []
+    pos = 0
+    while pos < len(tokens):
+        token = tokens[pos]
+        if not isinstance(token, int) or pos + 1 >= len(tokens) or tokens[pos + 1] is not _OPEN:
+            pos += 1
+            continue
+
+        items, pos = _parse_list(tokens, pos + 2)
+        attributes = {}
+        for i in range(0, len(items) - 1, 2):
+            key = items[i]
+            if isinstance(key, str):
+                attributes[key.upper()] = items[i + 1]
+        responses.append((token, attributes))
+
+    return responses
+
+
+def get_fetch_item(attributes: Dict[str, object], *names: str) -> Optional[object]:
+    """
+    Look up a FETCH attribute, trying several spellings.
+
+    Servers echo sections differently (``BODY[]`` for ``BODY.PEEK[]``, with or
+    without a partial-fetch origin), so callers pass every acceptable name.
+    """
+    for name in names:
+        if name in attributes:
+            return attributes[name]
+    return None
+
+
+def get_fetch_section(attributes: Dict[str, object], prefix: str) -> Optional[object]:
+    """
+    Look up a body section by prefix, e.g. ``BODY[HEADER.FIELDS``.
+
+    Useful when the server rewrites the field list it echoes back (quoting or
+    reordering header names).
+    """
+    for name, value in attributes.items():
+        if name.startswith(prefix):
+            return value
+    return None
+
+
+class BodyPart:
+    """A leaf part of a parsed BODYSTRUCTURE, addressable as ``BODY[section]``."""
+
+    def __init__(self, section: str, maintype: str, subtype: str, params: Dict[str, str],
+                 encoding: str, size: int, disposition: Optional[str] = None):
+        self.section = section
+        self.maintype = maintype
+        self.subtype = subtype
+        self.params = params
+        self.encoding = encoding
+        self.size = size
+        self.disposition = disposition
+
+    @property
+    def content_type(self) -> str:
+        return f"{self.maintype}/{self.subtype}"
+
+    @property
+    def charset(self) -> Optional[str]:
+        return self.params.get('charset')
+
+
+def _lower(value) -> str:
+    return value.lower() if isinstance(value, str) else ''
+
+
+def _body_part(section: str, fields: list) -> BodyPart:
+    """Build a BodyPart from the fields of a single-part BODYSTRUCTURE."""
+    params = fields[2] if len(fields) > 2 and isinstance(fields[2], list) else []
+    size = fields[6] if len(fields) > 6 and isinstance(fields[6], int) else 0
+    # Extension data follows the basic fields (and the line count of text parts);
+    # the disposition is the first list in it starting with a string
+    disposition = next(
+        (_lower(item[0]) for item in fields[7:]
+         if isinstance(item, list) and item and isinstance(item[0], str)),
+        None
+    )
+    return BodyPart(
+        section,
+        _lower(fields[0]),
+        _lower(fields[1]) if len(fields) > 1 else '',
+        {_lower(k): v for k, v in zip(params[::2], params[1::2])},
+        _lower(fields[5]) if len(fields) > 5 else '',
+        size,
+        disposition,
+    )
+
+
+def iter_body_parts(structure: list, prefix: str = '') -> Iterator[BodyPart]:
+    """
+    Walk a parsed BODYSTRUCTURE depth first, yielding its leaf parts.
+
+    Parts of attached messages (message/rfc822) are not descended into.
+
+    Args:
+        structure: BODYSTRUCTURE as returned by parse_fetch_response
+        prefix: Section of ``structure`` itself ('' for the whole message)
+
+    Yields:
+        BodyPart for every leaf, with its IMAP section number ("1", "2.1", ...)
+    """
+    if not isinstance(structure, list) or not structure:
+        return
+    if not isinstance(structure[0], list):
+        # A single-part message body is section 1
+        yield _body_part(prefix or '1', structure)
+        return
+    number = 0
+    for child in structure:
+        if not isinstance(child, list):
+            break
+        number += 1
+        yield from iter_body_parts(child, f"{prefix}.{number}" if prefix else str(number))
+
+
+def find_text_part(structure: list) -> Optional[BodyPart]:
+    """
+    Pick the part holding the readable body of a message.
+
+    Args:
+        structure: BODYSTRUCTURE as returned by parse_fetch_response
+
+    Returns:
+        The first text/plain part that is not an attachment, else the first
+        such text/html part, else None
+    """
+    candidates = [
+        part for part in iter_body_parts(structure)
+        if part.maintype == 'text' and part.disposition != 'attachment'
+    ]
+    for subtype in ('plain', 'html'):
+        for part in candidates:
+            if part.subtype == subtype:
+                return part
+    return None
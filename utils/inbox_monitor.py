@@ -4,25 +4,40 @@ Inbox Monitor
 Background service that monitors inbox for new emails.
 """
 
+import imaplib
 import threading
 import time
 from typing import List, Dict, Callable, Optional
 from datetime import datetime
 
+from .email_record import EmailRecord
+from .imap_idle import IdleSession
+from .mailbox_sync import MailboxSync
+
 
 class InboxMonitor:
     """Background service that monitors inbox for new emails."""
     
-    def __init__(self, folder_manager, check_interval_seconds: int = 300):
+    def __init__(self, folder_manager, check_interval_seconds: int = 300, folder: str = "INBOX",
+                 use_idle: bool = False):
         """
         Initialize the inbox monitor.
         
         Args:
             folder_manager: EmailFolderManager instance
             check_interval_seconds: Interval between checks (default: 300 = 5 minutes)
+            folder: Folder to monitor
+            use_idle: Wait for IMAP IDLE push notifications instead of polling
+                (falls back to polling if the server does not support IDLE)
         """
         self.folder_manager = folder_manager
         self.check_interval_seconds = check_interval_seconds
+        self.folder = folder
+        self.use_idle = use_idle
+        self.idle_timeout_seconds = IdleSession.MAX_IDLE_SECONDS
+        self.mode = "polling"
+        self._stop_event = threading.Event()
+        self.sync = MailboxSync(folder_manager, initial_limit=20)
         self.is_running = False
         self.monitor_thread = None
         self.seen_message_ids = set()
@@ -30,7 +45,7 @@ class InboxMonitor:
         self.new_emails_callback = None
         self.lock = threading.Lock()
     
-    def set_new_emails_callback(self, callback: Callable[[List[Dict]], None]):
+    def set_new_emails_callback(self, callback: Callable[[List[EmailRecord]], None]):
         """
         Register callback for when new emails are detected.
         
@@ -39,22 +54,27 @@ class InboxMonitor:
         """
         self.new_emails_callback = callback
     
-    def check_for_new_emails(self) -> List[Dict]:
+    def check_for_new_emails(self) -> List[EmailRecord]:
         """
         Poll IMAP and fetch new emails.
         
+        Only messages with a UID above the last one seen are downloaded, so a
+        poll costs O(new messages) and bursts of mail are never truncated.
+        Their bodies are fetched only when first read (e.g. by triage rules
+        that the headers alone cannot decide).
+        
         Returns:
-            List of new email dictionaries
+            List of new email records
         """
         try:
-            # Fetch recent emails
-            all_emails = self.folder_manager.fetch_recent_emails("INBOX", limit=20)
+            # Fetch emails that arrived since the last check
+            all_emails = self.sync.sync(self.folder)
             
             # Filter out emails we've already seen
             new_emails = []
             with self.lock:
                 for email_data in all_emails:
-                    msg_id = email_data.get('message_id', email_data.get('id'))
+                    msg_id = email_data.message_id or email_data.id
                     if msg_id and msg_id not in self.seen_message_ids:
                         new_emails.append(email_data)
                         self.seen_message_ids.add(msg_id)
@@ -66,21 +86,97 @@ class InboxMonitor:
             print(f"Error checking for new emails: {e}")
             return []
     
+    def _notify_new_emails(self):
+        """Check for new emails and pass them to the callback."""
+        new_emails = self.check_for_new_emails()
+        if new_emails and self.new_emails_callback:
+            self.new_emails_callback(new_emails)
+    
+    def _open_idle_session(self) -> Optional[IdleSession]:
+        """
+        Open a dedicated connection for IDLE.
+        
+        Returns:
+            IdleSession, or None if IDLE is unavailable
+        """
+        try:
+            conn = self.folder_manager.open_connection()
+        except Exception as e:
+            print(f"Error opening IDLE connection: {e}")
+            return None
+        
+        session = IdleSession(conn, self.folder)
+        try:
+            if session.supported():
+                return session
+        except Exception as e:
+            print(f"Error checking IDLE support: {e}")
+        
+        self._close_idle_session(session)
+        return None
+    
+    def _close_idle_session(self, session: Optional[IdleSession]):
+        """Log out of an IDLE connection, ignoring errors."""
+        if session:
+            try:
+                session.conn.logout()
+            except Exception:
+                pass
+    
+    def _idle_loop(self):
+        """
+        Wait for IDLE notifications until stopped.
+        
+        Returns early (so the caller can fall back to polling) if the server
+        does not support IDLE or the IDLE connection cannot be re-established.
+        """
+        session = self._open_idle_session()
+        if session is None:
+            print("IMAP IDLE not available, falling back to polling")
+            return
+        
+        self.mode = "idle"
+        try:
+            # Catch up on anything that arrived before IDLE started
+            self._notify_new_emails()
+            
+            while self.is_running:
+                try:
+                    # Re-issued every idle_timeout_seconds (~29 minutes)
+                    if session.wait(self.idle_timeout_seconds, self._stop_event):
+                        self._notify_new_emails()
+                except (imaplib.IMAP4.abort, OSError) as e:
+                    print(f"IDLE connection lost: {e}")
+                    self._close_idle_session(session)
+                    session = None
+                    self._stop_event.wait(10)  # Wait a bit before reconnecting
+                    if not self.is_running:
+                        return
+                    session = self._open_idle_session()
+                    if session is None:
+                        return
+                    self._notify_new_emails()
+                except imaplib.IMAP4.error as e:
+                    print(f"IDLE rejected by server, falling back to polling: {e}")
+                    return
+        finally:
+            self._close_idle_session(session)
+            self.mode = "polling"
+    
     def _monitor_loop(self):
         """Background thread loop that checks for new emails."""
+        if self.use_idle:
+            self._idle_loop()
+        
         while self.is_running:
             try:
                 # Check for new emails
-                new_emails = self.check_for_new_emails()
-                
-                # Call callback if new emails found
-                if new_emails and self.new_emails_callback:
-                    self.new_emails_callback(new_emails)
+                self._notify_new_emails()
                 
                 # Sleep for interval
                 sleep_count = 0
                 while self.is_running and sleep_count < self.check_interval_seconds:
-                    time.sleep(1)
+                    self._stop_event.wait(1)
                     sleep_count += 1
             except Exception as e:
                 print(f"Error in monitor loop: {e}")
@@ -92,12 +188,14 @@ class InboxMonitor:
             return
         
         self.is_running = True
+        self._stop_event.clear()
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
     
     def stop(self):
         """Stop the monitoring service."""
         self.is_running = False
+        self._stop_event.set()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
             self.monitor_thread = None
@@ -112,6 +210,7 @@ class InboxMonitor:
         with self.lock:
             return {
                 'running': self.is_running,
+                'mode': self.mode,
                 'last_check_time': self.last_check_time,
                 'emails_seen_count': len(self.seen_message_ids),
                 'check_interval_seconds': self.check_interval_seconds
@@ -130,3 +229,4 @@ class InboxMonitor:
         """Reset the seen messages cache."""
         with self.lock:
             self.seen_message_ids.clear()
+        self.sync.reset(self.folder)
@@ -0,0 +1,116 @@
+"""
+Keyword Matcher
+
+Keyword and pattern rules compiled once, then matched against a text in a
+single lowercase pass plus at most one regex scan.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+_REGEX_SYNTAX = set('.^$*+?{}[]\\|()')
+
+
+def _is_literal(pattern: str) -> bool:
+    """Whether a regex pattern only matches its own text."""
+    return not _REGEX_SYNTAX.intersection(pattern)
+
+
+class KeywordMatcher:
+    """
+    Finds which rule groups (categories) occur in a text.
+
+    Keywords match case-insensitively anywhere in the text, like
+    ``keyword.lower() in text.lower()``; patterns are regular expressions
+    matched with ``re.IGNORECASE``. Patterns that are plain text (e.g.
+    ``'verification code'``) are treated as keywords.
+
+    At construction, keywords are lowercased and grouped, and every real
+    regex of every group is combined into one alternation with a named group
+    per rule. Matching then lowercases the text once, runs substring searches
+    (which CPython performs far faster than a regex alternation can step
+    through the text) and scans the text with the combined regex at most once,
+    only for groups no keyword has already decided.
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]],
+                 patterns: Optional[Dict[str, Iterable[str]]] = None):
+        """
+        Compile the rules.
+
+        Args:
+            keywords: Group name -> keywords
+            patterns: Group name -> regex patterns
+        """
+        literals: Dict[str, List[str]] = {}
+        regexes: List[Tuple[str, str]] = []
+        for group, words in keywords.items():
+            literals.setdefault(group, []).extend(word.lower() for word in words)
+        for group, group_patterns in (patterns or {}).items():
+            for pattern in group_patterns:
+                if _is_literal(pattern):
+                    literals.setdefault(group, []).append(pattern.lower())
+                else:
+                    regexes.append((group, pattern))
+
+        # Deduplicate, keeping the rule order
+        self._literals: Dict[str, Tuple[str, ...]] = {
+            group: tuple(dict.fromkeys(words)) for group, words in literals.items()
+        }
+        self.groups: FrozenSet[str] = frozenset(self._literals) | {group for group, _ in regexes}
+
+        self._regex_groups: Dict[str, str] = {}
+        alternatives = []
+        for index, (group, pattern) in enumerate(regexes):
+            name = f"r{index}"
+            self._regex_groups[name] = group
+            alternatives.append(f"(?P<{name}>{pattern})")
+        self._regex = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+
+    def search(self, text: str, groups: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Find the groups with at least one matching rule.
+
+        Args:
+            text: Text to search
+            groups: Only consider these groups (default: all)
+
+        Returns:
+            Set of matching group names
+        """
+        wanted = self.groups if groups is None else self.groups.intersection(groups)
+        text_lower = text.lower()
+
+        found = {
+            group for group in wanted
+            if any(word in text_lower for word in self._literals.get(group, ()))
+        }
+
+        pending = {name for name, group in self._regex_groups.items()
+                   if group in wanted and group not in found}
+        if pending and text:
+            match = self._regex.search(text)
+            while match and pending:
+                group = self._regex_groups[match.lastgroup]
+                if group not in found:
+                    found.add(group)
+                    pending = {name for name in pending if self._regex_groups[name] != group}
+                if not pending:
+                    break
+                # Resume at the next position so overlapping matches are seen too
+                match = self._regex.search(text, match.start() + 1)
+
+        return found
+
+    def matches(self, text: str, group: str) -> bool:
+        """
+        Check a single group.
+
+        Args:
+            text: Text to search
+            group: Group name
+
+        Returns:
+            True if any rule of the group matches
+        """
+        return group in self.search(text, (group,))
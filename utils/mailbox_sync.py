@@ -0,0 +1,153 @@
+"""
+Mailbox Sync
+
+Incremental UID-based synchronisation of IMAP folders.
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from .email_record import EmailRecord
+
+
+class FolderSyncState:
+    """Sync position of one folder: its UIDVALIDITY and the highest UID seen."""
+
+    def __init__(self, uidvalidity: int, last_uid: int = 0):
+        self.uidvalidity = uidvalidity
+        self.last_uid = last_uid
+
+
+class FolderChanges:
+    """
+    Changes to a folder since its previous refresh.
+
+    ``flags`` maps the UID of each message whose flags (may have) changed to
+    its current flags; ``vanished`` lists UIDs expunged since the previous
+    refresh. ``full`` is set when there was no usable previous state (first
+    refresh or UIDVALIDITY change): anything cached for the folder is then
+    suspect and ``flags`` covers every message.
+    """
+
+    def __init__(self, uidvalidity: int, highestmodseq: Optional[int] = None,
+                 flags: Optional[Dict[int, List[str]]] = None,
+                 vanished: Optional[List[int]] = None, full: bool = False):
+        self.uidvalidity = uidvalidity
+        self.highestmodseq = highestmodseq
+        self.flags = flags or {}
+        self.vanished = vanished or []
+        self.full = full
+
+    def is_empty(self) -> bool:
+        """True if nothing changed."""
+        return not (self.flags or self.vanished or self.full)
+
+
+class MailboxSync:
+    """
+    Tracks UIDVALIDITY and the highest seen UID per folder.
+
+    Each sync asks the server only for ``UID <last_uid + 1>:*``, so a poll costs
+    O(new messages) and every message that arrived since the previous poll is
+    returned, however many there are. If the folder's UIDVALIDITY changes the
+    stored position is meaningless and the folder is synced from scratch.
+
+    Only headers are fetched by default: bodies are downloaded when first
+    read, and triage decided from headers never reads them.
+    """
+
+    def __init__(self, folder_manager, initial_limit: int = 20, batch_size: int = 100,
+                 headers_only: bool = True):
+        """
+        Initialize the sync engine.
+
+        Args:
+            folder_manager: EmailFolderManager instance
+            initial_limit: Messages to return on the first sync of a folder
+            batch_size: Maximum messages per UID FETCH when catching up
+            headers_only: Fetch headers only, loading bodies on first access
+        """
+        self.folder_manager = folder_manager
+        self.initial_limit = initial_limit
+        self.batch_size = batch_size
+        self.headers_only = headers_only
+        self.states: Dict[str, FolderSyncState] = {}
+        self.lock = threading.Lock()
+
+    def get_state(self, folder: str) -> Optional[FolderSyncState]:
+        """
+        Get the sync position of a folder.
+
+        Args:
+            folder: Folder name
+
+        Returns:
+            FolderSyncState, or None if the folder was never synced
+        """
+        with self.lock:
+            return self.states.get(folder)
+
+    def sync(self, folder: str = "INBOX") -> List[EmailRecord]:
+        """
+        Fetch messages that arrived since the last sync of a folder.
+
+        The first sync (or the first after a UIDVALIDITY change) returns the
+        most recent ``initial_limit`` messages and records the folder's highest
+        UID as the starting point.
+
+        Args:
+            folder: Folder to sync
+
+        Returns:
+            List of new email records, oldest first
+        """
+        state = self.get_state(folder)
+        since_uid = state.last_uid if state else 0
+
+        uidvalidity, uids = self.folder_manager.search_uids(folder, since_uid)
+        if uidvalidity is None:
+            return []
+
+        if state is not None and state.uidvalidity != uidvalidity:
+            # UIDs were renumbered; nothing we stored about this folder is valid
+            state = None
+            uidvalidity, uids = self.folder_manager.search_uids(folder, 0)
+            if uidvalidity is None:
+                return []
+
+        if state is None and self.initial_limit is not None:
+            # First sync: only the newest messages count as new
+            to_fetch = uids[-self.initial_limit:] if self.initial_limit else []
+            skipped = uids[:len(uids) - len(to_fetch)]
+            last_uid = skipped[-1] if skipped else 0
+        else:
+            to_fetch = uids
+            last_uid = since_uid if state else 0
+
+        new_emails = []
+        for start in range(0, len(to_fetch), self.batch_size):
+            batch = to_fetch[start:start + self.batch_size]
+            fetched = self.folder_manager.fetch_emails_by_uid(folder, batch, self.headers_only)
+            if not fetched:
+                # Leave the rest for the next poll rather than skipping past it
+                break
+            new_emails.extend(fetched)
+            last_uid = batch[-1]
+
+        with self.lock:
+            self.states[folder] = FolderSyncState(uidvalidity, last_uid)
+
+        return new_emails
+
+    def reset(self, folder: Optional[str] = None):
+        """
+        Forget the sync position of one folder, or of all folders.
+
+        Args:
+            folder: Folder to reset (None resets every folder)
+        """
+        with self.lock:
+            if folder is None:
+                self.states.clear()
+            else:
+                self.states.pop(folder, None)
@@ -1,62 +1,175 @@
 """
 Email Triage Engine
 
-Rule-based email classification system.
+Rule-based email classification system. The rules themselves live in
+triage_rules (built-in defaults, or data/triage_rules.json); an optional
+learned model (triage_classifier) can decide the messages it is confident
+about first.
 """
 
-from pydantic import BaseModel
-from typing import List, Dict
+from pydantic import BaseModel, ConfigDict
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import re
+import time
+
+from .contact_index import ContactIndex
+from .email_record import EmailRecord
+from .triage_cache import TriageCache, content_key
+from .triage_rules import BODY_WINDOW, RuleSet, RuleSource, TriageRule, default_rule_set
+
+if TYPE_CHECKING:
+    from .triage_classifier import TriageClassifier
 
 
 class EmailTriageResult(BaseModel):
-    """Pydantic model for triage output."""
+    """Pydantic model for triage output (immutable, so results can be shared)."""
+    model_config = ConfigDict(frozen=True)
+    
     category: str
     action: str
     justification: str
+    folder: Optional[str] = None
+
+
+# The results of the built-in rules, validated once at import. TriageTask.run
+# returns shared instances like these (one per rule outcome, see _result_for)
+# to keep model construction out of the per-message path.
+OTP_RESULT = EmailTriageResult(
+    category="OTP_RECEIPT",
+    action="Move to Receipts",
+    justification="Contains OTP or verification code",
+    folder="Receipts"
+)
+RECEIPT_RESULT = EmailTriageResult(
+    category="OTP_RECEIPT",
+    action="Move to Receipts",
+    justification="Appears to be a receipt or order confirmation",
+    folder="Receipts"
+)
+URGENT_RESULT = EmailTriageResult(
+    category="URGENT",
+    action="Move to Urgent",
+    justification="From known contact with urgent keywords",
+    folder="Urgent"
+)
+URGENT_KEYWORDS_RESULT = EmailTriageResult(
+    category="IMPORTANT",
+    action="Move to Important",
+    justification="Contains urgent keywords",
+    folder="Important"
+)
+KNOWN_CONTACT_RESULT = EmailTriageResult(
+    category="IMPORTANT",
+    action="Move to Important",
+    justification="From known contact",
+    folder="Important"
+)
+NEWSLETTER_RESULT = EmailTriageResult(
+    category="NEWSLETTER",
+    action="Move to Newsletters",
+    justification="Appears to be a newsletter or subscription",
+    folder="Newsletters"
+)
+PROMOTIONAL_RESULT = EmailTriageResult(
+    category="PROMOTIONAL",
+    action="Move to Promotions",
+    justification="Contains promotional keywords",
+    folder="Promotions"
+)
+OTHER_RESULT = EmailTriageResult(
+    category="OTHER",
+    action="Move to Archive",
+    justification="General email, no specific category matched",
+    folder="Archive"
+)
+
+_RESULTS: Dict[Tuple, EmailTriageResult] = {
+    (r.category, r.action, r.justification, r.folder): r
+    for r in (OTP_RESULT, RECEIPT_RESULT, URGENT_RESULT, URGENT_KEYWORDS_RESULT,
+              KNOWN_CONTACT_RESULT, NEWSLETTER_RESULT, PROMOTIONAL_RESULT, OTHER_RESULT)
+}
+
+
+def _result_for(rule: TriageRule) -> EmailTriageResult:
+    """The shared result of a rule outcome, created on first use."""
+    result = _RESULTS.get(rule.key)
+    if result is None:
+        result = _RESULTS.setdefault(rule.key, EmailTriageResult(
+            category=rule.category,
+            action=rule.action,
+            justification=rule.justification,
+            folder=rule.folder
+        ))
+    return result
+
+
+def _learned_result(folder: str, rules: RuleSet) -> EmailTriageResult:
+    """The shared result for a classifier prediction, categorized like the rule for that folder."""
+    rule = next((r for r in rules.rules + [rules.default] if r.folder == folder), None)
+    key = (rule.category if rule else "OTHER", f"Move to {folder}",
+           f"Similar to the mail in your {folder} folder", folder)
+    result = _RESULTS.get(key)
+    if result is None:
+        result = _RESULTS.setdefault(key, EmailTriageResult(
+            category=key[0],
+            action=key[1],
+            justification=key[2],
+            folder=folder
+        ))
+    return result
 
 
 class TriageTask:
     """Rule-based email classification."""
     
-    # Keywords for different categories
-    URGENT_KEYWORDS = [
-        'urgent', 'asap', 'immediately', 'critical', 'emergency', 
-        'important', 'deadline', 'action required', 'time sensitive'
-    ]
-    
-    NEWSLETTER_KEYWORDS = [
-        'unsubscribe', 'newsletter', 'weekly digest', 'subscription',
-        'update from', 'mailing list', 'email preferences'
-    ]
-    
-    PROMOTIONAL_KEYWORDS = [
-        'sale', 'discount', 'offer', 'deal', 'promotion', 'coupon',
-        'free shipping', 'limited time', '% off', 'buy now', 'shop now'
-    ]
-    
-    RECEIPT_KEYWORDS = [
-        'receipt', 'order confirmation', 'invoice', 'payment',
-        'transaction', 'purchase', 'your order', 'order number',
-        'tracking number', 'shipped', 'delivery'
-    ]
-    
-    OTP_PATTERNS = [
-        r'\b\d{4,6}\b',  # 4-6 digit codes
-        r'verification code',
-        r'one-time password',
-        r'OTP',
-        r'security code'
-    ]
-    
-    def __init__(self, known_contacts: List[str]):
+    def __init__(self, known_contacts: Union[Iterable[str], ContactIndex], cache: Optional[TriageCache] = None,
+                 rules: Optional[RuleSource] = None, classifier: Optional['TriageClassifier'] = None,
+                 max_body_chars: Optional[int] = None, body_window: int = BODY_WINDOW):
         """
         Initialize triage task.
         
         Args:
-            known_contacts: List of known contact email addresses (lowercase)
+            known_contacts: Known contact addresses, domains ('@company.com')
+                and subdomain wildcards ('@*.company.com'), or a ContactIndex
+            cache: Result cache for run_batch, may be shared between tasks
+            rules: Rule file to classify with, reloaded when it changes
+                (default: the built-in rules)
+            classifier: Learned model consulted before the keyword rules;
+                messages it is not confident about fall back to the rules
+            max_body_chars: Body characters searched for keywords at most
+                (default: the whole body)
+            body_window: Body characters searched per step; the scan stops
+                once the deciding rule is certain
         """
-        self.known_contacts = set(c.lower() for c in known_contacts)
+        if not isinstance(known_contacts, ContactIndex):
+            known_contacts = ContactIndex(known_contacts)
+        self.known_contacts = known_contacts
+        self.cache = cache
+        self.rule_source = rules
+        self.classifier = classifier
+        self.max_body_chars = max_body_chars
+        self.body_window = body_window
+        # Messages decided from headers alone vs. ones whose body was needed
+        self.header_decisions = 0
+        self.body_decisions = 0
+        self.learned_decisions = 0
+    
+    @property
+    def rules(self) -> RuleSet:
+        """The compiled rules in effect (picks up rule file changes)."""
+        if self.rule_source is None:
+            return default_rule_set()
+        return self.rule_source.current()
+    
+    @property
+    def rules_version(self) -> str:
+        """Fingerprint of everything a result depends on besides the message."""
+        version = f"{self.rules.version}-{self.known_contacts.digest}"
+        if self.max_body_chars is not None:
+            version += f"-b{self.max_body_chars}"
+        if self.classifier is not None:
+            version += f"-{self.classifier.fingerprint}"
+        return version
     
     def _extract_email_address(self, sender: str) -> str:
         """
@@ -117,81 +230,211 @@ class TriageTask:
                 return True
         return False
     
-    def run(self, email_data: Dict) -> EmailTriageResult:
+    def _headers(self, email_data: Union[EmailRecord, Dict]) -> Dict[str, str]:
+        """
+        Header values for header conditions, by lowercase name.
+        
+        Args:
+            email_data: Email record, or dictionary optionally carrying 'headers'
+            
+        Returns:
+            Dictionary of headers ('subject' and 'from' always included)
+        """
+        headers = {'subject': email_data.get('subject', ''), 'from': email_data.get('sender', '')}
+        for name, value in (email_data.get('headers') or {}).items():
+            headers[name.lower()] = value
+        return headers
+    
+    def _header_values(self, email_data: Union[EmailRecord, Dict], rules: RuleSet) -> Optional[Dict[str, str]]:
+        """Headers for rule evaluation; None for a record whose signal headers weren't fetched."""
+        if not rules.header_conditions:
+            return None
+        if isinstance(email_data, EmailRecord) and email_data.headers is None:
+            return None
+        return self._headers(email_data)
+    
+    def run(self, email_data: Union[EmailRecord, Dict]) -> EmailTriageResult:
         """
         Classify email into category.
         
+        With a trained classifier, see ``_run_learned``; otherwise the rules
+        decide.
+        
         Args:
-            email_data: Dictionary with 'subject', 'sender', 'body'
+            email_data: EmailRecord, or dictionary with 'subject', 'sender', 'body'
             
         Returns:
             EmailTriageResult with category, action, and justification
         """
-        subject = email_data.get('subject', '')
+        if self.classifier is not None and self.classifier.ready:
+            return self._run_learned([email_data])[0]
+        return self._run_rules(email_data)
+    
+    def _run_rules(self, email_data: Union[EmailRecord, Dict]) -> EmailTriageResult:
+        """
+        Classify email with the rules.
+        
+        A header-only EmailRecord (body not loaded yet) is first classified
+        from its sender, signal headers and subject; its body is loaded only
+        when a rule that could still apply depends on body keywords. Bodies
+        are scanned in windows, up to ``max_body_chars``, until the outcome
+        is certain.
+        
+        Args:
+            email_data: EmailRecord, or dictionary with 'subject', 'sender', 'body'
+            
+        Returns:
+            EmailTriageResult with category, action, and justification
+        """
+        rules = self.rules
         sender = email_data.get('sender', '')
-        body = email_data.get('body', '')
-        
-        combined_text = f"{subject} {body}"
-        
-        # Check for OTP/receipts first (highest priority)
-        if self._matches_pattern(combined_text, self.OTP_PATTERNS):
-            return EmailTriageResult(
-                category="OTP_RECEIPT",
-                action="Move to Receipts",
-                justification="Contains OTP or verification code"
-            )
-        
-        if self._contains_keywords(combined_text, self.RECEIPT_KEYWORDS):
-            return EmailTriageResult(
-                category="OTP_RECEIPT",
-                action="Move to Receipts",
-                justification="Appears to be a receipt or order confirmation"
-            )
-        
-        # Check for urgent emails
-        is_from_known = self._is_from_known_contact(sender)
-        has_urgent_keywords = self._contains_keywords(combined_text, self.URGENT_KEYWORDS)
-        
-        if is_from_known and has_urgent_keywords:
-            return EmailTriageResult(
-                category="URGENT",
-                action="Move to Urgent",
-                justification="From known contact with urgent keywords"
-            )
-        
-        if has_urgent_keywords:
-            return EmailTriageResult(
-                category="IMPORTANT",
-                action="Move to Important",
-                justification="Contains urgent keywords"
-            )
-        
-        if is_from_known:
-            return EmailTriageResult(
-                category="IMPORTANT",
-                action="Move to Important",
-                justification="From known contact"
-            )
-        
-        # Check for newsletters
-        if self._contains_keywords(combined_text, self.NEWSLETTER_KEYWORDS):
-            return EmailTriageResult(
-                category="NEWSLETTER",
-                action="Move to Newsletters",
-                justification="Appears to be a newsletter or subscription"
-            )
-        
-        # Check for promotional emails
-        if self._contains_keywords(combined_text, self.PROMOTIONAL_KEYWORDS):
-            return EmailTriageResult(
-                category="PROMOTIONAL",
-                action="Move to Promotions",
-                justification="Contains promotional keywords"
-            )
-        
-        # Default: archive
-        return EmailTriageResult(
-            category="OTHER",
-            action="Move to Archive",
-            justification="General email, no specific category matched"
-        )
+        address = self._extract_email_address(sender)
+        is_known = address in self.known_contacts
+        
+        if isinstance(email_data, EmailRecord):
+            subject = email_data.subject
+            if not email_data.body_loaded:
+                # Header conditions are undecided if the signal headers weren't fetched
+                headers = self._header_values(email_data, rules)
+                rule = rules.evaluate_headers(subject, address, is_known, headers)
+                if rule is not None:
+                    self.header_decisions += 1
+                    return _result_for(rule)
+            body = email_data.body
+        else:
+            subject = email_data.get('subject', '')
+            body = email_data.get('body', '')
+        
+        self.body_decisions += 1
+        headers = self._headers(email_data) if rules.header_conditions else None
+        rule = rules.evaluate_scan(subject, body or '', address, is_known, headers,
+                                   self.body_window, self.max_body_chars)
+        return _result_for(rule)
+    
+    def _run_learned(self, emails: List[Union[EmailRecord, Dict]]) -> List[EmailTriageResult]:
+        """
+        Classify emails with the classifier, scoring them as one batch.
+        
+        Rules decided by sender and headers alone (e.g. mailing lists) still
+        come first; keyword rules are only used for messages the classifier
+        is not confident about. Header-only records are scored without their
+        body, which is downloaded only if they fall back to the rules.
+        
+        Args:
+            emails: Email records or dictionaries
+            
+        Returns:
+            Results, in input order
+        """
+        rules = self.rules
+        results: List[Optional[EmailTriageResult]] = [None] * len(emails)
+        pending = []
+        for index, email_data in enumerate(emails):
+            address = self._extract_email_address(email_data.get('sender', ''))
+            rule = rules.evaluate_headers(email_data.get('subject', ''), address,
+                                          address in self.known_contacts,
+                                          self._header_values(email_data, rules))
+            if rule is not None and rule is not rules.default and not rules.uses_text(rule):
+                self.header_decisions += 1
+                results[index] = _result_for(rule)
+            else:
+                pending.append(index)
+        
+        predictions = self.classifier.predict([emails[index] for index in pending]) if pending else []
+        for index, prediction in zip(pending, predictions):
+            if prediction is None:
+                results[index] = self._run_rules(emails[index])
+            else:
+                self.learned_decisions += 1
+                results[index] = _learned_result(prediction[0], rules)
+        return results
+    
+    def run_stream(self, emails: Iterable[Union[EmailRecord, Dict]]
+                   ) -> Iterator[Tuple[Union[EmailRecord, Dict], EmailTriageResult]]:
+        """
+        Classify emails lazily, e.g. from ``EmailFolderManager.iter_emails``.
+        
+        Args:
+            emails: Iterable of email records or dictionaries
+            
+        Yields:
+            (email_data, result) pairs, in input order
+        """
+        for email_data in emails:
+            yield email_data, self.run(email_data)
+    
+    def _cache_key(self, email_data: Union[EmailRecord, Dict]) -> Tuple[str, str]:
+        """
+        Result cache key: rule-set version and Message-ID (or content hash).
+        
+        A record without Message-ID is keyed by folder, UIDVALIDITY and UID
+        when it has them, so the key does not need its body.
+        
+        Args:
+            email_data: Email record or dictionary
+            
+        Returns:
+            Cache key
+        """
+        message_id = email_data.get('message_id', '')
+        if message_id:
+            return self.rules_version, content_key(message_id)
+        if isinstance(email_data, EmailRecord) and email_data.uidvalidity is not None:
+            return self.rules_version, (f"uid:{email_data.folder or ''}:"
+                                        f"{email_data.uidvalidity}:{email_data.uid}")
+        return self.rules_version, content_key('', email_data.get('subject', ''),
+                                               email_data.get('sender', ''), email_data.get('body', ''))
+    
+    def run_batch(self, emails: Iterable[Union[EmailRecord, Dict]]) -> List[EmailTriageResult]:
+        """
+        Classify emails, reusing cached results for messages seen before.
+        
+        Messages are identified by Message-ID, by UID for records without
+        one, or by a hash of subject, sender and body, so a header-only record
+        is answered from the cache without loading its body. With a trained
+        classifier, the messages missing from the cache are scored together.
+        
+        Args:
+            emails: Iterable of email records or dictionaries
+            
+        Returns:
+            Results, in input order
+        """
+        if self.classifier is not None and self.classifier.ready:
+            return self._run_learned_batch(list(emails))
+        if self.cache is None:
+            return [self.run(email_data) for email_data in emails]
+        
+        results = []
+        for email_data in emails:
+            key = self._cache_key(email_data)
+            result = self.cache.get(key)
+            if result is None:
+                start = time.perf_counter()
+                result = self.run(email_data)
+                self.cache.put(key, result, time.perf_counter() - start)
+            results.append(result)
+        return results
+    
+    def _run_learned_batch(self, emails: List[Union[EmailRecord, Dict]]) -> List[EmailTriageResult]:
+        """run_batch with a classifier: the cache misses are scored together."""
+        if self.cache is None:
+            return self._run_learned(emails)
+        
+        results: List[Optional[EmailTriageResult]] = []
+        misses = []
+        for index, email_data in enumerate(emails):
+            key = self._cache_key(email_data)
+            result = self.cache.get(key)
+            if result is None:
+                misses.append((index, key))
+            results.append(result)
+        
+        if misses:
+            start = time.perf_counter()
+            computed = self._run_learned([emails[index] for index, _ in misses])
+            seconds = (time.perf_counter() - start) / len(misses)
+            for (index, key), result in zip(misses, computed):
+                self.cache.put(key, result, seconds)
+                results[index] = result
+        return results
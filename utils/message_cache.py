@@ -0,0 +1,332 @@
+"""
+Message Cache
+
+Persistent local cache of parsed messages backed by SQLite.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .email_record import EmailRecord
+
+
+def get_cache_file_path() -> str:
+    """Get the path to the default message cache database."""
+    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(current_dir, "data", "message_cache.sqlite3")
+
+
+class MessageCache:
+    """
+    Local store of parsed messages keyed by (account, folder, UIDVALIDITY, UID).
+
+    A (folder, UIDVALIDITY, UID) triple identifies a message permanently, so
+    cached headers and bodies never go stale; only flags change, and callers
+    refresh those from the server. The cache is bounded by ``max_bytes`` and
+    evicts the least recently read messages first.
+    """
+
+    # Evict down to this fraction of max_bytes so eviction does not run on every insert
+    EVICTION_TARGET = 0.9
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 50 * 1024 * 1024):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite file path (default: data/message_cache.sqlite3),
+                or ":memory:" for a throwaway cache
+            max_bytes: Upper bound on the cached text size
+        """
+        self.path = path or get_cache_file_path()
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                uid INTEGER NOT NULL,
+                message_id TEXT,
+                subject TEXT,
+                sender TEXT,
+                date TEXT,
+                body TEXT,
+                flags TEXT,
+                size INTEGER,
+                has_attachments INTEGER,
+                headers TEXT,
+                stored_bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (account, folder, uidvalidity, uid)
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_last_access ON messages (last_access);
+            CREATE TABLE IF NOT EXISTS folder_state (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                highestmodseq INTEGER,
+                PRIMARY KEY (account, folder)
+            );
+        """)
+        columns = {row[1] for row in self.db.execute("PRAGMA table_info(messages)")}
+        if 'headers' not in columns:
+            # Caches created before signal headers were stored; NULL reads as "not fetched"
+            self.db.execute("ALTER TABLE messages ADD COLUMN headers TEXT")
+        self.db.commit()
+
+    @staticmethod
+    def _stored_bytes(record: Dict) -> int:
+        return sum(
+            len(record.get(key) or '')
+            for key in ('message_id', 'subject', 'sender', 'date', 'body')
+        )
+
+    def get_many(self, account: str, folder: str, uidvalidity: int,
+                 uids: Iterable[int]) -> Dict[int, Dict]:
+        """
+        Look up cached messages.
+
+        Args:
+            account: Account identifier
+            folder: Folder name
+            uidvalidity: UIDVALIDITY of the folder
+            uids: UIDs to look up
+
+        Returns:
+            Dictionary mapping UID to cached record; 'body' is None when only
+            the headers were cached
+        """
+        uids = [int(uid) for uid in uids]
+        if not uids:
+            return {}
+
+        records = {}
+        with self.lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(uids), 500):
+                chunk = uids[start:start + 500]
+                rows = self.db.execute(
+                    "SELECT uid, message_id, subject, sender, date, body, flags, size, has_attachments, "
+                    "headers FROM messages WHERE account = ? AND folder = ? AND uidvalidity = ? "
+                    "AND uid IN (%s)" % ','.join('?' * len(chunk)),
+                    [account, folder, uidvalidity] + chunk
+                ).fetchall()
+                for uid, message_id, subject, sender, date, body, flags, size, attachments, headers in rows:
+                    record = {
+                        'uid': str(uid),
+                        'uidvalidity': uidvalidity,
+                        'message_id': message_id,
+                        'subject': subject,
+                        'sender': sender,
+                        'date': date,
+                        'body': body,
+                        'flags': json.loads(flags) if flags else [],
+                    }
+                    if size is not None:
+                        # Only known for messages first seen by a header-only fetch
+                        record['size'] = size
+                        record['has_attachments'] = bool(attachments)
+                    if headers is not None:
+                        record['headers'] = json.loads(headers)
+                    records[uid] = record
+
+            if records:
+                now = time.time()
+                self.db.executemany(
+                    "UPDATE messages SET last_access = ? WHERE account = ? AND folder = ? "
+                    "AND uidvalidity = ? AND uid = ?",
+                    [(now, account, folder, uidvalidity, uid) for uid in records]
+                )
+                self.db.commit()
+
+        return records
+
+    def put_many(self, account: str, folder: str, uidvalidity: int, records: List[Union[EmailRecord, Dict]]):
+        """
+        Store parsed messages.
+
+        Records need a 'uid'; a missing or unloaded 'body' is stored as NULL
+        and keeps any body cached earlier.
+
+        Args:
+            account: Account identifier
+            folder: Folder name
+            uidvalidity: UIDVALIDITY of the folder
+            records: Email records (or dictionaries) to store
+        """
+        now = time.time()
+        rows = []
+        for record in records:
+            if record.get('uid') is None:
+                continue
+            # Don't trigger lazy body loading just to fill the cache
+            row = record.to_dict(load_body=False) if isinstance(record, EmailRecord) else dict(record)
+            body = row.get('body')
+            rows.append((
+                account, folder, uidvalidity, int(record['uid']),
+                row.get('message_id'), row.get('subject'), row.get('sender'), row.get('date'),
+                body, json.dumps(row.get('flags') or []), row.get('size'),
+                int(row['has_attachments']) if 'has_attachments' in row else None,
+                json.dumps(row['headers']) if row.get('headers') is not None else None,
+                self._stored_bytes(row), now
+            ))
+        if not rows:
+            return
+
+        with self.lock:
+            self.db.executemany(
+                "INSERT INTO messages (account, folder, uidvalidity, uid, message_id, subject, "
+                "sender, date, body, flags, size, has_attachments, headers, stored_bytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (account, folder, uidvalidity, uid) DO UPDATE SET "
+                "message_id = excluded.message_id, subject = excluded.subject, "
+                "sender = excluded.sender, date = excluded.date, "
+                "body = COALESCE(excluded.body, messages.body), flags = excluded.flags, "
+                "size = COALESCE(excluded.size, messages.size), "
+                "has_attachments = COALESCE(excluded.has_attachments, messages.has_attachments), "
+                "headers = COALESCE(excluded.headers, messages.headers), "
+                "stored_bytes = MAX(excluded.stored_bytes, messages.stored_bytes), "
+                "last_access = excluded.last_access",
+                rows
+            )
+            self._evict()
+            self.db.commit()
+
+    def update_body(self, account: str, folder: str, uidvalidity: int, uid: int, body: str):
+        """Store the body of a message whose headers are already cached."""
+        with self.lock:
+            self.db.execute(
+                "UPDATE messages SET body = ?, stored_bytes = stored_bytes + ?, last_access = ? "
+                "WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid = ? AND body IS NULL",
+                (body, len(body), time.time(), account, folder, uidvalidity, int(uid))
+            )
+            self._evict()
+            self.db.commit()
+
+    def update_flags(self, account: str, folder: str, uidvalidity: int, flags: Dict[int, List[str]]):
+        """
+        Refresh cached flags.
+
+        Args:
+            flags: Dictionary mapping UID to its current flags
+        """
+        if not flags:
+            return
+        with self.lock:
+            self.db.executemany(
+                "UPDATE messages SET flags = ? WHERE account = ? AND folder = ? "
+                "AND uidvalidity = ? AND uid = ?",
+                [(json.dumps(f), account, folder, uidvalidity, int(uid)) for uid, f in flags.items()]
+            )
+            self.db.commit()
+
+    def uids(self, account: str, folder: str, uidvalidity: int) -> List[int]:
+        """UIDs of the cached messages of a folder, ascending."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT uid FROM messages WHERE account = ? AND folder = ? AND uidvalidity = ? "
+                "ORDER BY uid",
+                (account, folder, uidvalidity)
+            ).fetchall()
+        return [uid for uid, in rows]
+
+    def delete_uids(self, account: str, folder: str, uidvalidity: int, uids: Iterable[int]):
+        """Drop messages that were expunged on the server."""
+        rows = [(account, folder, uidvalidity, int(uid)) for uid in uids]
+        if not rows:
+            return
+        with self.lock:
+            self.db.executemany(
+                "DELETE FROM messages WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid = ?",
+                rows
+            )
+            self.db.commit()
+
+    def get_folder_state(self, account: str, folder: str) -> Optional[Tuple[int, Optional[int]]]:
+        """
+        Get the sync position recorded by the last folder refresh.
+
+        Returns:
+            Tuple of (uidvalidity, highestmodseq), or None if never refreshed
+        """
+        with self.lock:
+            row = self.db.execute(
+                "SELECT uidvalidity, highestmodseq FROM folder_state WHERE account = ? AND folder = ?",
+                (account, folder)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set_folder_state(self, account: str, folder: str, uidvalidity: int,
+                         highestmodseq: Optional[int]):
+        """Record the sync position of a folder after a refresh."""
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO folder_state (account, folder, uidvalidity, highestmodseq) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (account, folder) DO UPDATE SET "
+                "uidvalidity = excluded.uidvalidity, highestmodseq = excluded.highestmodseq",
+                (account, folder, uidvalidity, highestmodseq)
+            )
+            self.db.commit()
+
+    def invalidate_folder(self, account: str, folder: str, keep_uidvalidity: Optional[int] = None):
+        """
+        Drop cached messages of a folder.
+
+        Args:
+            account: Account identifier
+            folder: Folder name
+            keep_uidvalidity: Keep entries with this UIDVALIDITY (drop the rest)
+        """
+        with self.lock:
+            if keep_uidvalidity is None:
+                self.db.execute(
+                    "DELETE FROM messages WHERE account = ? AND folder = ?", (account, folder)
+                )
+                self.db.execute(
+                    "DELETE FROM folder_state WHERE account = ? AND folder = ?", (account, folder)
+                )
+            else:
+                self.db.execute(
+                    "DELETE FROM messages WHERE account = ? AND folder = ? AND uidvalidity != ?",
+                    (account, folder, keep_uidvalidity)
+                )
+            self.db.commit()
+
+    def total_bytes(self) -> int:
+        """Total size of the cached text."""
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM messages").fetchone()[0]
+
+    def _evict(self):
+        """Delete least recently read messages until the cache fits. Caller holds the lock."""
+        total = self.db.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM messages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * self.EVICTION_TARGET)
+        cursor = self.db.execute(
+            "SELECT rowid, stored_bytes FROM messages ORDER BY last_access ASC"
+        )
+        evict = []
+        for rowid, stored in cursor:
+            if total <= target:
+                break
+            evict.append((rowid,))
+            total -= stored
+        self.db.executemany("DELETE FROM messages WHERE rowid = ?", evict)
+
+    def close(self):
+        """Close the database."""
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,121 @@
+"""
+Triage Cache
+
+In-memory LRU cache of triage results, so messages that are still pending
+are not reclassified on every Streamlit rerun.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+
+def content_key(message_id: str, subject: str = '', sender: str = '', body: str = '') -> str:
+    """
+    Identify a message for the triage cache.
+
+    Args:
+        message_id: Message-ID header (used when present)
+        subject: Subject, hashed when there is no Message-ID
+        sender: Sender, hashed when there is no Message-ID
+        body: Body, hashed when there is no Message-ID
+
+    Returns:
+        Cache key
+    """
+    if message_id:
+        return f"mid:{message_id}"
+    digest = hashlib.sha1()
+    for part in (subject, sender, body):
+        digest.update(part.encode('utf-8', 'surrogatepass'))
+        digest.update(b'\0')
+    return f"sha1:{digest.hexdigest()}"
+
+
+class TriageCache:
+    """
+    LRU cache of triage results.
+
+    Keys combine the triage rule-set version with the message key, so a
+    cache shared by several ``TriageTask`` instances never returns a result
+    computed with different keywords or known contacts. Hits and misses are
+    counted, and the time each miss took to classify is used to estimate the
+    time the hits saved.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Results kept before the least recently used are dropped
+        """
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, object]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._miss_seconds = 0.0
+
+    def get(self, key: Hashable) -> Optional[object]:
+        """
+        Look up a result, counting the hit or miss.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached result, or None
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Hashable, result: object, seconds: float = 0.0):
+        """
+        Store a result.
+
+        Args:
+            key: Cache key
+            result: Triage result
+            seconds: Time it took to compute the result
+        """
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            self._miss_seconds += seconds
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all results (the counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        """
+        Cache statistics for monitoring.
+
+        Returns:
+            Dictionary with 'hits', 'misses', 'hit_rate', 'entries' and
+            'time_saved' (seconds, estimated from the average miss)
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            average_miss = self._miss_seconds / self.misses if self.misses else 0.0
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'time_saved': self.hits * average_miss,
+            }
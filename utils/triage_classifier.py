@@ -0,0 +1,341 @@
+"""
+Triage Classifier
+
+Optional learned backend for TriageTask: a multinomial naive Bayes model
+over hashed bag-of-words features, trained from the mail already sorted
+into the triage folders and updated incrementally as mail is moved.
+
+Requires NumPy; without it ``classifier_available()`` is False and triage
+uses the rules alone.
+"""
+
+import itertools
+import os
+import re
+import threading
+import uuid
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .email_record import EmailRecord
+
+# Runs of two or more letters, digits or non-ASCII characters, matched on
+# the UTF-8 bytes (notably faster than a str pattern). Digits are hashed as
+# 0, so "2024" and "90210" count as "0000" and "00000": a number's length is
+# a feature, a particular number is not
+TOKEN_PATTERN = re.compile(rb"[^\x00-/:-@\[-`{-\x7f]{2,}")
+DIGIT_PATTERN = re.compile(rb"[0-9]")
+ADDRESS_PATTERN = re.compile(r'<(.+?)>')
+
+
+def classifier_available() -> bool:
+    """Whether NumPy is installed, so a TriageClassifier can be used."""
+    return np is not None
+
+
+def get_model_file_path() -> str:
+    """Get the path to the saved classifier model."""
+    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(current_dir, "data", "triage_model.npz")
+
+
+class TriageClassifier:
+    """
+    Naive Bayes over hashed bag-of-words features, labelled by folder.
+
+    Each message becomes the hashed buckets of its subject and (the start
+    of its) body words, its sender address and domain, and the signal
+    headers it carries. Per-folder bucket counts are the whole model, so
+    learning one message is a handful of increments and a move between
+    folders can be undone from the old folder's counts.
+
+    Scoring a batch gathers the per-folder log-probabilities of every
+    feature of every message in one indexing operation and sums them per
+    message with ``np.add.reduceat``: the product of the sparse
+    message-by-feature matrix with the model, without needing SciPy.
+    """
+
+    # Messages a folder needs before the model predicts it
+    MIN_EXAMPLES = 5
+    # Distinct tokens whose bucket is remembered instead of rehashed
+    MAX_MEMO = 200000
+
+    def __init__(self, dim: int = 1 << 16, min_confidence: float = 0.9,
+                 max_body_chars: int = 2000, alpha: float = 0.1):
+        """
+        Initialize an empty model.
+
+        Args:
+            dim: Number of hash buckets
+            min_confidence: Posterior probability below which predict() abstains
+            max_body_chars: Body characters turned into features
+            alpha: Additive smoothing of the bucket counts
+
+        Raises:
+            ImportError: If NumPy is not installed
+        """
+        if np is None:
+            raise ImportError("NumPy is required for the triage classifier")
+        self.dim = dim
+        self.min_confidence = min_confidence
+        self.max_body_chars = max_body_chars
+        self.alpha = alpha
+        self.labels: List[str] = []
+        self._label_index: Dict[str, int] = {}
+        self._counts = np.zeros((0, dim))
+        self._examples = np.zeros(0)
+        # Bumped on every change
+        self.version = 0
+        # Tells apart models whose counters happen to match (e.g. a retrained model)
+        self.model_id = uuid.uuid4().hex[:12]
+        self._log_probs = None
+        self._log_priors = None
+        self._scored_version = -1
+        self._memo: Dict[bytes, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """Whether at least two folders have enough examples to predict."""
+        return int((self._examples >= self.MIN_EXAMPLES).sum()) >= 2
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies this model in this state; part of TriageTask cache keys."""
+        return f"{self.model_id}.{self.version}"
+
+    def examples(self) -> Dict[str, int]:
+        """Messages learned per folder."""
+        return {label: int(count) for label, count in zip(self.labels, self._examples)}
+
+    def _bucket(self, token: bytes) -> int:
+        index = self._memo.get(token)
+        if index is None:
+            index = zlib.crc32(DIGIT_PATTERN.sub(b'0', token)) % self.dim
+            if len(self._memo) < self.MAX_MEMO:
+                self._memo[token] = index
+        return index
+
+    def _buckets(self, tokens: List[bytes]) -> List[int]:
+        # Memoized tokens are looked up without a Python-level loop
+        buckets = list(map(self._memo.get, tokens))
+        if None in buckets:
+            bucket = self._bucket
+            buckets = [index if index is not None else bucket(token)
+                       for index, token in zip(buckets, tokens)]
+        return buckets
+
+    def features(self, email_data: Union[EmailRecord, Dict], load_body: bool = True) -> List[int]:
+        """
+        Hash buckets of a message's features (one entry per occurrence).
+
+        Args:
+            email_data: Email record or dictionary with 'subject', 'sender', 'body'
+            load_body: Whether a header-only record's body may be downloaded;
+                if not, it is featurized from subject, sender and headers
+
+        Returns:
+            List of bucket indices
+        """
+        sender = (email_data.get('sender') or '').lower()
+        match = ADDRESS_PATTERN.search(sender)
+        address = match.group(1) if match else sender.strip()
+        if not load_body and isinstance(email_data, EmailRecord) and not email_data.body_loaded:
+            body = ''
+        else:
+            body = (email_data.get('body') or '')[:self.max_body_chars]
+        text = f"{email_data.get('subject') or ''} {body}".lower()
+
+        buckets = self._buckets(TOKEN_PATTERN.findall(text.encode('utf-8', 'surrogatepass')))
+        extra = []
+        if address:
+            extra += [f"from:{address}", f"domain:{address.rpartition('@')[2]}"]
+        extra += [f"header:{name.lower()}" for name in email_data.get('headers') or ()]
+        for token in extra:
+            buckets.append(self._bucket(token.encode('utf-8', 'surrogatepass')))
+        return buckets
+
+    def _row(self, label: str) -> int:
+        index = self._label_index.get(label)
+        if index is None:
+            index = len(self.labels)
+            self.labels.append(label)
+            self._label_index[label] = index
+            self._counts = np.vstack([self._counts, np.zeros((1, self.dim))])
+            self._examples = np.append(self._examples, 0.0)
+        return index
+
+    def learn(self, emails: Iterable[Union[EmailRecord, Dict]], labels: Iterable[Optional[str]],
+              previous: Optional[Iterable[Optional[str]]] = None):
+        """
+        Add labelled messages to the model.
+
+        Args:
+            emails: Email records or dictionaries (bodies are loaded)
+            labels: Folder of each message, or None to only remove it from
+                its previous folder (e.g. moved back to the inbox)
+            previous: Folder each message was learned under before (e.g. the
+                folder it was moved out of), whose counts are removed
+        """
+        emails = list(emails)
+        labels = list(labels)
+        previous = list(previous) if previous is not None else [None] * len(emails)
+        feature_lists = [self.features(email_data) for email_data in emails]
+
+        with self._lock:
+            for buckets, label, old in zip(feature_lists, labels, previous):
+                if old == label:
+                    continue
+                if old in self._label_index:
+                    row = self._label_index[old]
+                    np.subtract.at(self._counts[row], buckets, 1.0)
+                    np.maximum(self._counts[row], 0.0, out=self._counts[row])
+                    self._examples[row] = max(self._examples[row] - 1, 0.0)
+                if label is None:
+                    continue
+                row = self._row(label)
+                np.add.at(self._counts[row], buckets, 1.0)
+                self._examples[row] += 1
+            self.version += 1
+
+    def learn_folders(self, folder_manager, folders: Iterable[str], per_folder: int = 500) -> Dict[str, int]:
+        """
+        Train from the mail already sorted into folders.
+
+        Args:
+            folder_manager: Connected EmailFolderManager
+            folders: Folders to learn (each is a label)
+            per_folder: Newest messages learned per folder
+
+        Returns:
+            Dictionary mapping folder to messages learned
+        """
+        learned = {}
+        for folder in folders:
+            # Header-only records; learn() downloads just the text part of each
+            emails = list(itertools.islice(folder_manager.iter_emails(folder, headers_only=True), per_folder))
+            self.learn(emails, [folder] * len(emails))
+            learned[folder] = len(emails)
+        return learned
+
+    def _model(self) -> Tuple:
+        """Log-probabilities per bucket and folder, recomputed after changes. Caller holds the lock."""
+        if self._scored_version != self.version:
+            smoothed = self._counts + self.alpha
+            # (buckets, folders), so each feature's row is contiguous to gather
+            self._log_probs = np.ascontiguousarray(
+                np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).T, dtype=np.float32)
+            self._log_priors = np.log((self._examples + 1) / (self._examples.sum() + len(self.labels)))
+            self._scored_version = self.version
+        return self.labels, self._log_probs, self._log_priors, self._examples >= self.MIN_EXAMPLES
+
+    def scores(self, emails: Sequence[Union[EmailRecord, Dict]]) -> 'np.ndarray':
+        """
+        Posterior probability of each folder for each message.
+
+        Bodies of header-only records are not downloaded: those are scored on
+        subject, sender and headers, which predict() is usually less sure of.
+
+        Args:
+            emails: Email records or dictionaries
+
+        Returns:
+            Array of shape (messages, folders); folders with too few examples get 0
+        """
+        feature_lists = [self.features(email_data, load_body=False) for email_data in emails]
+        with self._lock:
+            labels, log_probs, log_priors, usable = self._model()
+        if not usable.any():
+            return np.zeros((len(feature_lists), len(labels)))
+
+        lengths = np.fromiter((len(buckets) for buckets in feature_lists), dtype=np.intp,
+                              count=len(feature_lists))
+        flat = np.fromiter(itertools.chain.from_iterable(feature_lists), dtype=np.intp,
+                           count=int(lengths.sum()))
+        # (features of all messages, folders), summed per message
+        joint = np.zeros((len(feature_lists), len(labels)))
+        nonempty = lengths > 0
+        if nonempty.any():
+            starts = np.cumsum(lengths) - lengths
+            joint[nonempty] = np.add.reduceat(log_probs[flat], starts[nonempty], axis=0)
+        joint += log_priors
+        joint[:, ~usable] = -np.inf
+
+        joint -= joint.max(axis=1, keepdims=True)
+        probabilities = np.exp(joint)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
+
+    def predict(self, emails: Sequence[Union[EmailRecord, Dict]]) -> List[Optional[Tuple[str, float]]]:
+        """
+        Most likely folder of each message, where the model is confident.
+
+        Args:
+            emails: Email records or dictionaries
+
+        Returns:
+            (folder, probability) per message, or None where the model abstains
+        """
+        if not self.ready:
+            return [None] * len(emails)
+        probabilities = self.scores(emails)
+        best = probabilities.argmax(axis=1)
+        confidence = probabilities[np.arange(len(best)), best]
+        return [
+            (self.labels[index], float(p)) if p >= self.min_confidence else None
+            for index, p in zip(best.tolist(), confidence.tolist())
+        ]
+
+    def save(self, path: Optional[str] = None):
+        """
+        Save the model (atomically).
+
+        Args:
+            path: Model file (default: data/triage_model.npz)
+        """
+        path = path or get_model_file_path()
+        with self._lock:
+            state = dict(labels=np.array(self.labels, dtype=str), counts=self._counts,
+                         examples=self._examples, dim=self.dim, version=self.version)
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            temp_path = path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                np.savez_compressed(f, **state)
+            os.replace(temp_path, path)
+        except IOError as e:
+            print(f"Error saving triage model: {e}")
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, **kwargs) -> Optional['TriageClassifier']:
+        """
+        Load a saved model.
+
+        Args:
+            path: Model file (default: data/triage_model.npz)
+            **kwargs: Settings passed to the constructor (besides dim)
+
+        Returns:
+            TriageClassifier, or None if NumPy is missing or there is no
+            readable model
+        """
+        path = path or get_model_file_path()
+        if np is None or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as state:
+                classifier = cls(dim=int(state['dim']), **kwargs)
+                classifier.labels = [str(label) for label in state['labels']]
+                classifier._counts = state['counts'].astype(float)
+                classifier._examples = state['examples'].astype(float)
+                classifier.version = int(state['version'])
+        except (IOError, KeyError, ValueError) as e:
+            print(f"Error loading triage model: {e}")
+            return None
+        classifier._label_index = {label: i for i, label in enumerate(classifier.labels)}
+        return classifier
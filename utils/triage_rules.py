@@ -0,0 +1,730 @@
+"""
+Triage Rules
+
+Declarative triage rules loaded from data/triage_rules.json, compiled into a
+decision table and reloaded when the file changes.
+
+Rule file format::
+
+    {
+      "rules": [
+        {
+          "name": "receipt",
+          "priority": 20,
+          "keywords": ["receipt", "invoice"],
+          "patterns": ["order #\\\\d+"],
+          "senders": ["$known_contacts", "@shop.example.com", "billing@example.com"],
+          "headers": {"List-Unsubscribe": true, "Precedence": "bulk|list"},
+          "category": "OTP_RECEIPT",
+          "action": "Move to Receipts",
+          "justification": "Appears to be a receipt or order confirmation",
+          "folder": "Receipts"
+        }
+      ],
+      "default": {"category": "OTHER", "action": "Move to Archive",
+                  "justification": "...", "folder": "Archive"}
+    }
+
+A rule applies when all of its conditions hold; rules are tried in
+ascending priority and the first that applies decides (``default`` if none
+does). Conditions:
+
+- ``keywords`` / ``patterns``: subject or body contains any keyword
+  (case-insensitive) or matches any regex (``re.IGNORECASE``); the two lists
+  form a single condition
+- ``senders``: the sender address is any of the listed addresses, is at a
+  listed ``@domain`` or a subdomain of a listed ``@*.domain``, or is a
+  known contact (``$known_contacts``); see contact_index
+- ``headers``: every listed header is present (``true``), absent
+  (``false``) or matches the regex; header-only fetches include
+  Subject, From and email_parsing.SIGNAL_HEADERS
+
+Messages whose body has not been downloaded yet are first tried with
+``RuleSet.evaluate_headers``, which decides on sender, headers and subject
+alone when no higher-priority rule could still be swayed by the body. With
+the default rules that is rare, as the OTP rule's digit pattern could match
+almost any body; a rule file made with ``header_rules_first`` lets bulk
+mail be filed from its headers alone.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from .contact_index import ContactIndex, normalize_entry
+from .keyword_matcher import KeywordMatcher
+
+# Bump when the compiled classes change, so stale disk caches are ignored
+COMPILED_FORMAT = 3
+
+# Body characters searched per step by RuleSet.evaluate_scan, and re-read
+# from the previous step so matches spanning a window cut are found
+BODY_WINDOW = 16384
+WINDOW_OVERLAP = 256
+
+KNOWN_CONTACTS = '$known_contacts'
+
+DEFAULT_RULES: Dict[str, Any] = {
+    "rules": [
+        {
+            "name": "otp",
+            "priority": 10,
+            "patterns": [r"\b\d{4,6}\b", "verification code", "one-time password", "OTP",
+                         "security code"],
+            "category": "OTP_RECEIPT",
+            "action": "Move to Receipts",
+            "justification": "Contains OTP or verification code",
+            "folder": "Receipts",
+        },
+        {
+            "name": "receipt",
+            "priority": 20,
+            "keywords": ["receipt", "order confirmation", "invoice", "payment", "transaction",
+                         "purchase", "your order", "order number", "tracking number", "shipped",
+                         "delivery"],
+            "category": "OTP_RECEIPT",
+            "action": "Move to Receipts",
+            "justification": "Appears to be a receipt or order confirmation",
+            "folder": "Receipts",
+        },
+        {
+            "name": "urgent_known",
+            "priority": 30,
+            "keywords": ["urgent", "asap", "immediately", "critical", "emergency", "important",
+                         "deadline", "action required", "time sensitive"],
+            "senders": [KNOWN_CONTACTS],
+            "category": "URGENT",
+            "action": "Move to Urgent",
+            "justification": "From known contact with urgent keywords",
+            "folder": "Urgent",
+        },
+        {
+            "name": "urgent",
+            "priority": 40,
+            "keywords": ["urgent", "asap", "immediately", "critical", "emergency", "important",
+                         "deadline", "action required", "time sensitive"],
+            "category": "IMPORTANT",
+            "action": "Move to Important",
+            "justification": "Contains urgent keywords",
+            "folder": "Important",
+        },
+        {
+            "name": "known_contact",
+            "priority": 50,
+            "senders": [KNOWN_CONTACTS],
+            "category": "IMPORTANT",
+            "action": "Move to Important",
+            "justification": "From known contact",
+            "folder": "Important",
+        },
+        # Bulk mail, recognised from headers alone (see SIGNAL_HEADERS). Below
+        # the OTP, receipt and urgent rules so those still win on bulk mail;
+        # header_rules_first() moves them ahead, for rule files that want it
+        {
+            "name": "mailing_list",
+            "priority": 55,
+            "headers": {"List-Id": True},
+            "category": "NEWSLETTER",
+            "action": "Move to Newsletters",
+            "justification": "Sent through a mailing list",
+            "folder": "Newsletters",
+        },
+        {
+            "name": "bulk_unsubscribe",
+            "priority": 56,
+            "headers": {"List-Unsubscribe": True},
+            "category": "NEWSLETTER",
+            "action": "Move to Newsletters",
+            "justification": "Bulk mail with an unsubscribe link",
+            "folder": "Newsletters",
+        },
+        {
+            "name": "bulk_precedence",
+            "priority": 57,
+            "headers": {"Precedence": r"^\s*(bulk|list|junk)\b"},
+            "category": "NEWSLETTER",
+            "action": "Move to Newsletters",
+            "justification": "Marked as bulk mail",
+            "folder": "Newsletters",
+        },
+        {
+            "name": "auto_reply",
+            "priority": 58,
+            "headers": {"Auto-Submitted": r"^\s*auto-replied"},
+            "category": "OTHER",
+            "action": "Move to Archive",
+            "justification": "Automatic reply",
+            "folder": "Archive",
+        },
+        {
+            "name": "newsletter",
+            "priority": 60,
+            "keywords": ["unsubscribe", "newsletter", "weekly digest", "subscription",
+                         "update from", "mailing list", "email preferences"],
+            "category": "NEWSLETTER",
+            "action": "Move to Newsletters",
+            "justification": "Appears to be a newsletter or subscription",
+            "folder": "Newsletters",
+        },
+        {
+            "name": "promotional",
+            "priority": 70,
+            "keywords": ["sale", "discount", "offer", "deal", "promotion", "coupon",
+                         "free shipping", "limited time", "% off", "buy now", "shop now"],
+            "category": "PROMOTIONAL",
+            "action": "Move to Promotions",
+            "justification": "Contains promotional keywords",
+            "folder": "Promotions",
+        },
+    ],
+    "default": {
+        "category": "OTHER",
+        "action": "Move to Archive",
+        "justification": "General email, no specific category matched",
+        "folder": "Archive",
+    },
+}
+
+
+class RuleError(ValueError):
+    """The rule file is malformed."""
+
+
+# Backreferences (\\1) and conditionals ((?(1)...)) by group number; the
+# numbers shift once KeywordMatcher wraps every pattern in a named group
+_GROUP_NUMBER_PATTERN = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d')
+
+
+def get_rules_file_path() -> str:
+    """Get the path to the triage rules JSON file."""
+    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(current_dir, "data", "triage_rules.json")
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SenderCondition:
+    """Sender is a listed address, in a listed domain (or wildcard), or a known contact."""
+
+    def __init__(self, senders: Iterable[str]):
+        senders = [s.lower().strip() for s in senders]
+        self.known_contacts = KNOWN_CONTACTS in senders
+        self.index = ContactIndex(s for s in senders if s != KNOWN_CONTACTS)
+
+    def matches(self, address: str, is_known: bool) -> bool:
+        return (self.known_contacts and is_known) or address in self.index
+
+
+class HeaderCondition:
+    """A header is present, absent, or matches a regex (case-insensitive)."""
+
+    def __init__(self, name: str, expected):
+        self.name = name.lower()
+        self.expected = expected
+        self.regex = re.compile(expected, re.IGNORECASE) if isinstance(expected, str) else None
+
+    def matches(self, headers: Mapping[str, str]) -> bool:
+        value = headers.get(self.name)
+        if self.regex is None:
+            return (value is not None) == bool(self.expected)
+        return value is not None and self.regex.search(value) is not None
+
+
+class TriageRule:
+    """One rule's name, priority and outcome (its conditions live in the RuleSet)."""
+
+    def __init__(self, spec: Dict[str, Any], digest: str):
+        self.name = spec['name']
+        self.priority = spec.get('priority', 0)
+        self.category = spec['category']
+        self.action = spec['action']
+        self.justification = spec.get('justification', '')
+        self.folder = spec.get('folder')
+        self.digest = digest
+        # Result identity, used to share one result object per outcome
+        self.key = (self.category, self.action, self.justification, self.folder)
+
+    def __repr__(self) -> str:
+        return f"TriageRule({self.name!r}, priority={self.priority})"
+
+
+def _validate(data: Dict[str, Any]):
+    if not isinstance(data, dict) or not isinstance(data.get('rules'), list):
+        raise RuleError("rule file must be an object with a 'rules' list")
+    names = set()
+    patterns = []
+    for spec in data['rules']:
+        if not isinstance(spec, dict):
+            raise RuleError(f"rule must be an object: {spec!r}")
+        for field in ('name', 'category', 'action'):
+            if not isinstance(spec.get(field), str):
+                raise RuleError(f"rule {spec.get('name', '?')!r} needs a string '{field}'")
+        if spec['name'] in names:
+            raise RuleError(f"duplicate rule name {spec['name']!r}")
+        names.add(spec['name'])
+        if not isinstance(spec.get('priority', 0), (int, float)):
+            raise RuleError(f"rule {spec['name']!r}: 'priority' must be a number")
+        for field in ('keywords', 'patterns', 'senders'):
+            value = spec.get(field, [])
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise RuleError(f"rule {spec['name']!r}: '{field}' must be a list of strings")
+        for sender in spec.get('senders', []):
+            if sender.strip().lower() != KNOWN_CONTACTS and normalize_entry(sender) is None:
+                raise RuleError(f"rule {spec['name']!r}: bad sender {sender!r}")
+        for pattern in spec.get('patterns', []):
+            if _GROUP_NUMBER_PATTERN.search(pattern):
+                raise RuleError(f"rule {spec['name']!r}: pattern {pattern!r} refers to a group by number; "
+                                f"use a named group, (?P<name>...) and (?P=name)")
+            try:
+                # Checked as KeywordMatcher embeds it, which rejects e.g. inline global flags
+                re.compile(f"(?P<r0>{pattern})", re.IGNORECASE)
+            except re.error as e:
+                raise RuleError(f"rule {spec['name']!r}: bad pattern {pattern!r}: {e}")
+            patterns.append(pattern)
+        headers = spec.get('headers', {})
+        if not isinstance(headers, dict):
+            raise RuleError(f"rule {spec['name']!r}: 'headers' must be an object")
+        for name, expected in headers.items():
+            if not isinstance(expected, (bool, str)):
+                raise RuleError(f"rule {spec['name']!r}: header {name!r} needs true, false or a regex")
+            if isinstance(expected, str):
+                try:
+                    re.compile(expected)
+                except re.error as e:
+                    raise RuleError(f"rule {spec['name']!r}: bad header pattern {expected!r}: {e}")
+        if not (spec.get('keywords') or spec.get('patterns') or spec.get('senders') or headers):
+            raise RuleError(f"rule {spec['name']!r} has no conditions")
+    try:
+        # Patterns valid on their own can still clash once combined (e.g. repeated group names)
+        KeywordMatcher({}, {'patterns': patterns})
+    except re.error as e:
+        raise RuleError(f"patterns cannot be combined: {e}")
+    default = data.get('default', DEFAULT_RULES['default'])
+    if not isinstance(default, dict) or not all(isinstance(default.get(f), str) for f in ('category', 'action')):
+        raise RuleError("'default' needs a string 'category' and 'action'")
+
+
+class RuleSet:
+    """
+    Rules compiled into a decision table.
+
+    Every distinct condition (a rule's keyword/pattern list, sender list or
+    header test) gets one bit; a rule requires the bits of its conditions.
+    Classifying a message computes the bits that hold — all text conditions
+    in one ``KeywordMatcher.search`` — and returns the first rule, by
+    priority, whose bits are all set.
+    """
+
+    def __init__(self, data: Dict[str, Any], previous: Optional['RuleSet'] = None):
+        """
+        Validate and compile rules.
+
+        Args:
+            data: Parsed rule file
+            previous: Rule set compiled from an earlier version of the file;
+                unchanged rules and an unchanged keyword matcher are reused
+
+        Raises:
+            RuleError: If the rules are malformed
+        """
+        _validate(data)
+        self.version = _digest(data)[:16]
+        reused = {rule.digest: rule for rule in previous.rules} if previous else {}
+
+        conditions: Dict[str, int] = {}
+        text_groups: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {}
+        self.sender_conditions: List[Tuple[int, SenderCondition]] = []
+        self.header_conditions: List[Tuple[int, HeaderCondition]] = []
+        previous_senders = dict(previous._sender_by_key) if previous else {}
+        previous_headers = dict(previous._header_by_key) if previous else {}
+        self._sender_by_key: Dict[str, SenderCondition] = {}
+        self._header_by_key: Dict[str, HeaderCondition] = {}
+
+        def bit(key: str) -> Tuple[int, bool]:
+            if key in conditions:
+                return conditions[key], False
+            conditions[key] = 1 << len(conditions)
+            return conditions[key], True
+
+        self.rules: List[TriageRule] = []
+        self._table: List[Tuple[int, TriageRule]] = []
+        for spec in sorted(data['rules'], key=lambda s: s.get('priority', 0)):
+            digest = _digest(spec)
+            rule = reused.get(digest) or TriageRule(spec, digest)
+            mask = 0
+
+            keywords, patterns = tuple(spec.get('keywords', ())), tuple(spec.get('patterns', ()))
+            if keywords or patterns:
+                key = 'text:' + _digest([keywords, patterns])
+                value, new = bit(key)
+                if new:
+                    text_groups[key] = (keywords, patterns)
+                mask |= value
+
+            if spec.get('senders'):
+                key = 'senders:' + _digest(sorted(spec['senders']))
+                value, new = bit(key)
+                if new:
+                    condition = previous_senders.get(key) or SenderCondition(spec['senders'])
+                    self._sender_by_key[key] = condition
+                    self.sender_conditions.append((value, condition))
+                mask |= value
+
+            for name, expected in spec.get('headers', {}).items():
+                key = 'header:' + _digest([name.lower(), expected])
+                value, new = bit(key)
+                if new:
+                    condition = previous_headers.get(key) or HeaderCondition(name, expected)
+                    self._header_by_key[key] = condition
+                    self.header_conditions.append((value, condition))
+                mask |= value
+
+            self.rules.append(rule)
+            self._table.append((mask, rule))
+
+        default = data.get('default', DEFAULT_RULES['default'])
+        self.default = TriageRule(dict(default, name='default'), _digest(default))
+        self._text_bits = {key: conditions[key] for key in text_groups}
+        self._all_text_bits = sum(self._text_bits.values())
+        self._text_rules = frozenset(id(rule) for mask, rule in self._table if mask & self._all_text_bits)
+        self._all_header_bits = sum(value for value, _ in self.header_conditions)
+
+        # The combined matcher is the costly part; rebuild it only if the text conditions changed
+        text_key = _digest(sorted(text_groups))
+        if previous is not None and previous._text_key == text_key:
+            self.matcher = previous.matcher
+        else:
+            self.matcher = KeywordMatcher(
+                keywords={key: words for key, (words, _) in text_groups.items()},
+                patterns={key: patterns for key, (_, patterns) in text_groups.items()},
+            )
+        self._text_key = text_key
+
+    @property
+    def folders(self) -> FrozenSet[str]:
+        """Every folder a rule (or the default) moves mail to."""
+        return frozenset(rule.folder for rule in self.rules + [self.default] if rule.folder)
+
+    def uses_text(self, rule: TriageRule) -> bool:
+        """Whether a rule of this set has a keyword/pattern condition."""
+        return id(rule) in self._text_rules
+
+    def _bits(self, text: str, address: str, is_known: bool,
+              headers: Optional[Mapping[str, str]]) -> int:
+        """Bits of the conditions that hold (headers=None counts as no headers)."""
+        bits = 0
+        for key in self.matcher.search(text):
+            bits |= self._text_bits[key]
+        for value, condition in self.sender_conditions:
+            if condition.matches(address, is_known):
+                bits |= value
+        if headers:
+            for value, condition in self.header_conditions:
+                if condition.matches(headers):
+                    bits |= value
+        else:
+            # Only "header is absent" conditions can hold
+            for value, condition in self.header_conditions:
+                if condition.matches({}):
+                    bits |= value
+        return bits
+
+    def evaluate(self, text: str, address: str, is_known: bool,
+                 headers: Optional[Mapping[str, str]] = None) -> TriageRule:
+        """
+        Find the rule deciding a message.
+
+        Args:
+            text: Subject and body
+            address: Sender address (lowercase)
+            is_known: Whether the sender is a known contact
+            headers: Header values by lowercase name
+
+        Returns:
+            The first matching rule, or the default rule
+        """
+        bits = self._bits(text, address, is_known, headers)
+        for mask, rule in self._table:
+            if mask & bits == mask:
+                return rule
+        return self.default
+
+    def _decide(self, bits: int, undecided: int) -> Optional[TriageRule]:
+        """
+        Walk the table with some text conditions still undecided.
+
+        Returns:
+            The first rule that could apply if it is certain, the default if
+            no rule can apply, or None if an undecided condition matters
+        """
+        possible = bits | undecided
+        for mask, rule in self._table:
+            if mask & possible != mask:
+                continue
+            if mask & undecided:
+                return None
+            return rule
+        return self.default
+
+    def evaluate_headers(self, subject: str, address: str, is_known: bool,
+                         headers: Optional[Mapping[str, str]]) -> Optional[TriageRule]:
+        """
+        Decide a message without its body, where that is certain.
+
+        Sender and header conditions are known up front; a keyword/pattern
+        condition is known to hold if the subject matches, and is otherwise
+        undecided until the body is seen. Rules are walked in priority order
+        as usual, but the walk stops without a decision at the first rule that
+        could still apply and depends on an undecided condition.
+
+        Args:
+            subject: Subject
+            address: Sender address (lowercase)
+            is_known: Whether the sender is a known contact
+            headers: Header values by lowercase name, or None if they were
+                not fetched (header conditions are then undecided too)
+
+        Returns:
+            The deciding rule, or None if the body is needed
+        """
+        bits = self._bits(subject, address, is_known, headers)
+        undecided = self._all_text_bits & ~bits
+        if headers is None:
+            undecided |= self._all_header_bits
+        return self._decide(bits, undecided)
+
+    def evaluate_scan(self, subject: str, body: str, address: str, is_known: bool,
+                      headers: Optional[Mapping[str, str]] = None, window: int = BODY_WINDOW,
+                      max_body_chars: Optional[int] = None) -> TriageRule:
+        """
+        Find the deciding rule, scanning the body only as far as needed.
+
+        Subject, sender and headers are checked first. The body is then
+        searched in windows of about ``window`` characters, for the keyword
+        and pattern conditions still undecided, and the scan stops as soon as
+        the first rule that could apply is certain. Windows are cut at
+        whitespace and overlap by ``WINDOW_OVERLAP`` characters, so matches
+        are not lost at the cuts.
+
+        Without ``max_body_chars`` the outcome is that of ``evaluate``; with
+        it, text past the cap is treated as not matching.
+
+        Args:
+            subject: Subject
+            body: Body
+            address: Sender address (lowercase)
+            is_known: Whether the sender is a known contact
+            headers: Header values by lowercase name
+            window: Characters searched per step
+            max_body_chars: Body characters searched at most (default: all)
+
+        Returns:
+            The first matching rule, or the default rule
+        """
+        bits = self._bits(subject, address, is_known, headers)
+        undecided = self._all_text_bits & ~bits
+        rule = self._decide(bits, undecided)
+        limit = len(body) if max_body_chars is None else min(len(body), max_body_chars)
+        start = 0
+        while rule is None and start < limit:
+            stop = _word_end(body, min(start + window, limit), limit)
+            last = stop >= limit
+            if last and limit < len(body):
+                # Don't let the cap cut a word (or number) short
+                cut = max(body.rfind(' ', start, stop), body.rfind('\n', start, stop))
+                if cut > start:
+                    stop = cut
+            pending = [key for key, value in self._text_bits.items() if value & undecided]
+            for key in self.matcher.search(body[start:stop], pending):
+                bits |= self._text_bits[key]
+            undecided = self._all_text_bits & ~bits
+            rule = self._decide(bits, undecided)
+            if last:
+                break
+            start = _word_start(body, max(stop - WINDOW_OVERLAP, start + 1))
+        if rule is None:
+            # Scanned up to the cap: undecided conditions did not match
+            rule = self._decide(bits, 0)
+        return rule
+
+
+def _word_end(text: str, index: int, limit: int) -> int:
+    """Move a window end forward to whitespace (at most 256 characters), so no word is cut."""
+    bound = min(index + 256, limit)
+    while index < bound and not text[index].isspace():
+        index += 1
+    return index
+
+
+def _word_start(text: str, index: int) -> int:
+    """Move a window start forward past the word it falls into (at most 256 characters)."""
+    if index == 0 or text[index - 1].isspace():
+        return index
+    bound = min(index + 256, len(text))
+    while index < bound and not text[index].isspace():
+        index += 1
+    return index
+
+
+def header_rules_first(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Rule file contents with the header-only rules moved ahead of all others.
+
+    Bulk mail is then filed by its headers before its body is downloaded,
+    but a mailing-list message carrying e.g. a verification code is filed
+    as a newsletter rather than a receipt.
+
+    Args:
+        data: Rule file contents (e.g. DEFAULT_RULES)
+
+    Returns:
+        A copy, with the header-only rules' priorities below every other rule's
+    """
+    data = copy.deepcopy(data)
+    rules = data['rules']
+    header_only = [rule for rule in rules if rule.get('headers')
+                   and not (rule.get('keywords') or rule.get('patterns') or rule.get('senders'))]
+    if header_only:
+        first = min(rule.get('priority', 0) for rule in rules)
+        ordered = sorted(header_only, key=lambda rule: rule.get('priority', 0))
+        for offset, rule in enumerate(ordered):
+            rule['priority'] = first - len(ordered) + offset
+    return data
+
+
+_default_rule_set: Optional[RuleSet] = None
+
+
+def default_rule_set() -> RuleSet:
+    """The built-in rules (DEFAULT_RULES), compiled once per process."""
+    global _default_rule_set
+    if _default_rule_set is None:
+        _default_rule_set = RuleSet(DEFAULT_RULES)
+    return _default_rule_set
+
+
+class RuleSource:
+    """
+    A rule file, recompiled when it changes.
+
+    ``current()`` checks the file's modification time at most once every
+    ``check_interval`` seconds, so it can be called per message. A changed
+    file is recompiled incrementally from the previous rule set; a broken
+    one is reported and the previous rules stay in effect. The compiled rule
+    set is pickled next to the file, keyed by a hash of the file contents,
+    so a restart skips validation and compilation.
+
+    A missing rule file is created from DEFAULT_RULES.
+    """
+
+    def __init__(self, path: Optional[str] = None, cache_path: Optional[str] = None,
+                 check_interval: float = 1.0):
+        """
+        Initialize the source and load the rules.
+
+        Args:
+            path: Rule file (default: data/triage_rules.json)
+            cache_path: Compiled rule cache (default: the rule file with a .cache suffix;
+                empty string disables it)
+            check_interval: Seconds between modification checks
+        """
+        self.path = path or get_rules_file_path()
+        self.cache_path = self.path + '.cache' if cache_path is None else cache_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._rule_set: RuleSet = default_rule_set()
+        self.last_error: Optional[str] = None
+        self.reloads = 0
+
+        if not os.path.exists(self.path):
+            self._write_defaults()
+        self._reload()
+        # The file was just read; the first current() call needn't stat it again
+        self._checked = time.monotonic()
+
+    def _write_defaults(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(DEFAULT_RULES, f, indent=2)
+        except IOError as e:
+            print(f"Error creating rules file: {e}")
+
+    def current(self) -> RuleSet:
+        """
+        The rules in effect, reloading the file if it changed.
+
+        Returns:
+            Compiled rule set
+        """
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                if now - self._checked >= self.check_interval:
+                    self._checked = now
+                    self._reload()
+        return self._rule_set
+
+    def _reload(self):
+        """Recompile if the file's modification time or size changed."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                source = f.read()
+            source_hash = hashlib.sha1(source).hexdigest()
+            rule_set = self._load_cached(source_hash)
+            if rule_set is None:
+                rule_set = RuleSet(json.loads(source.decode('utf-8')), previous=self._rule_set)
+                self._save_cached(source_hash, rule_set)
+        except (ValueError, IOError, re.error) as e:
+            # ValueError covers RuleError, JSON and decoding errors; re.error
+            # anything validation missed
+            self.last_error = str(e)
+            print(f"Error loading triage rules: {e}")
+        else:
+            if self._stamp is not None:
+                self.reloads += 1
+            self._rule_set = rule_set
+            self.last_error = None
+        self._stamp = stamp
+
+    def _load_cached(self, source_hash: str) -> Optional[RuleSet]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except Exception:
+            # Unreadable or from an incompatible version; recompile
+            return None
+        if cached.get('format') != COMPILED_FORMAT or cached.get('source') != source_hash:
+            return None
+        return cached.get('rule_set')
+
+    def _save_cached(self, source_hash: str, rule_set: RuleSet):
+        if not self.cache_path:
+            return
+        try:
+            temp_path = self.cache_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                pickle.dump({'format': COMPILED_FORMAT, 'source': source_hash, 'rule_set': rule_set}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.cache_path)
+        except (IOError, pickle.PicklingError) as e:
+            print(f"Error caching compiled triage rules: {e}")